@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Show, apply or report a plan file (see plan_executor.py)
+Usage:
+  python3 materialize_prices.py --full --plan plans/prices.jsonl   # scripts with --plan write one
+  python3 apply_plan.py show plans/prices.jsonl --workers 8
+  python3 apply_plan.py apply plans/prices.jsonl --workers 8
+  python3 apply_plan.py report plans/prices.jsonl
+
+apply shards each phase of the plan by document path over --workers
+processes, each with its own Firestore client and up to --concurrency
+batches in flight, then merges the shard results into a per-shard report.
+Throughput grows with the workers until Firestore pushes back. An
+interrupted or partly failed apply is resumed by running it again with the
+same --workers. --max-ops caps the total rate (split evenly over the
+workers), e.g. for a new collection that should follow the 500/50/5 rule.
+"""
+
+import argparse
+import sys
+from collections import Counter
+from plan_executor import (DEFAULT_CONCURRENCY, apply_plan, iter_records, merge_results, print_report,
+                           read_plan, results_dir_for, shard_of)
+
+def show_plan(plan_path, workers, limit):
+    header, trailer = read_plan(plan_path)
+    print(f"📋 {plan_path}: {header['plan']}")
+    print(f"   {trailer['writes']:,} writes, sha256 {trailer['sha256'][:16]}")
+    collections = Counter()
+    kinds = Counter()
+    shards = Counter()
+    shown = 0
+    for record in iter_records(plan_path):
+        collections[(record['phase'], record['path'].rsplit('/', 2)[-2])] += 1
+        kinds[record['kind']] += 1
+        shards[shard_of(record['path'], workers)] += 1
+        if shown < limit:
+            print(f"   {record['phase']} {record['kind']:<6} {record['path']}")
+            shown += 1
+    for (phase, collection), n in sorted(collections.items()):
+        print(f"   phase {phase}: {n:>10,} writes to {collection}")
+    print(f"   kinds: {', '.join(f'{kind} {n:,}' for kind, n in kinds.most_common())}")
+    if shards:
+        print(f"   over {workers} workers: {min(shards.values()):,} to {max(shards.values()):,} writes per shard")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply a plan file from several processes')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    show_parser = subparsers.add_parser('show', help='Check a plan and summarize its writes')
+    show_parser.add_argument('--show', type=int, default=10, help='Writes to print (default 10)')
+
+    apply_parser = subparsers.add_parser('apply', help='Apply or resume a plan')
+    apply_parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                              help=f'Batches in flight per worker (default {DEFAULT_CONCURRENCY})')
+    apply_parser.add_argument('--max-ops', type=int, help='Cap on writes/sec over all workers')
+    apply_parser.add_argument('--restart', action='store_true', help='Forget earlier progress and apply everything again')
+    apply_parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+
+    subparsers.add_parser('report', help='Per-shard results of the last apply')
+
+    for sub in (show_parser, apply_parser):
+        sub.add_argument('--workers', type=int, default=4, help='Worker processes (default 4)')
+    for sub in subparsers.choices.values():
+        sub.add_argument('plan', help='Plan file')
+    args = parser.parse_args()
+
+    ok = True
+    try:
+        if args.command == 'show':
+            show_plan(args.plan, args.workers, args.show)
+        elif args.command == 'report':
+            merged = merge_results(results_dir_for(args.plan))
+            if not merged:
+                print(f"No results for {args.plan} yet")
+            print_report(merged)
+        else:
+            print(f"⚙️  Applying {args.plan} with {args.workers} workers\n")
+            merged = apply_plan(args.plan, args.workers, args.key, args.concurrency, args.max_ops, args.restart)
+            print_report(merged)
+            states = [state for states in merged.values() for state in states]
+            finished = all(not state['failed'] and state['writes'] is not None for state in states)
+            unsure = sum(len(state['ambiguous']) for state in states)
+            ok = finished and not unsure
+            print(f"\n{'='*60}")
+            if not finished:
+                print("❌ Not fully applied; run the same command again to resume")
+            elif unsure:
+                print(f"⚠️  Applied, except {unsure:,} writes that may or may not have landed (listed above)")
+            else:
+                print("✅ Plan applied")
+            print(f"{'='*60}")
+    except ValueError as e:
+        print(f"❌ {e}")
+        ok = False
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted - run again with the same --workers to resume")
+        ok = False
+    if not ok:
+        sys.exit(1)
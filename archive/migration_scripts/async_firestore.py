@@ -0,0 +1,57 @@
+"""
+asyncio helpers for running independent Firestore reads/writes concurrently
+Usage: from async_firestore import gather_limited, get_docs
+
+All helpers take an AsyncClient (see firebase_app.get_async_db) and cap the
+number of in-flight RPCs with a semaphore, so a script's total latency is set
+by its slowest dependency chain instead of the sum of every call.
+"""
+
+import asyncio
+
+# Max RPCs in flight per script (override with --concurrency)
+DEFAULT_CONCURRENCY = 20
+
+# Firestore get_all() accepts at most this many references per request
+GET_ALL_CHUNK = 100
+
+async def gather_limited(coros, limit=DEFAULT_CONCURRENCY):
+    """
+    Await coroutines concurrently, at most `limit` at a time
+
+    limit: a number, or an asyncio.Semaphore shared with other gathers so
+    they count against one cap (nested gathers must not both hold it)
+    Returns results in the same order as `coros`.
+    """
+    semaphore = limit if isinstance(limit, asyncio.Semaphore) else asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+async def query_get(query):
+    """Run a query (or collection) and return its list of snapshots"""
+    return [doc async for doc in query.stream()]
+
+async def get_docs(db, refs, limit=DEFAULT_CONCURRENCY):
+    """
+    Fetch many documents with batched get_all() calls run concurrently
+
+    limit: as in gather_limited(); pass a shared Semaphore when fetching
+    for several callers at once
+    Returns: dict {doc_id: snapshot}, including non-existent snapshots
+    """
+    refs = list(refs)
+    chunks = [refs[i:i + GET_ALL_CHUNK] for i in range(0, len(refs), GET_ALL_CHUNK)]
+
+    async def fetch(chunk):
+        return [doc async for doc in db.get_all(chunk)]
+
+    results = await gather_limited((fetch(chunk) for chunk in chunks), limit)
+    return {doc.id: doc for chunk_docs in results for doc in chunk_docs}
+
+def run(coro):
+    """Entry point for scripts: run a coroutine to completion"""
+    return asyncio.run(coro)
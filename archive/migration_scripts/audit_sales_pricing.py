@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Audit sale subtotals, bulk pricing and discounts against the price rules
+Usage:
+  python3 audit_sales_pricing.py --days 365                  # live project, last year of sales
+  python3 audit_sales_pricing.py --dump backups/2025-06-01   # a backup_firestore.py export, offline
+  python3 audit_sales_pricing.py --days 90 --report audit.csv --tolerance 0.5
+
+Sales, products and subcategories are each read once (projected to the
+pricing fields) and sale items are flattened into one table, joined with
+the product's categoryCode/priceOverride and the subcategory's
+defaultPrice/bulkPricing. Bulk tiers (pricing.py rules) are then applied
+with column operations, so no sale is looked at on its own.
+
+Checks (a difference above --tolerance is reported):
+  line_subtotal   item subtotal != quantity * unitPrice
+  subtotal        sale subtotal != sum of quantity * tier price
+  total           total != subtotal - discount
+  discount        discount < 0 or larger than the subtotal
+Warnings (prices legitimately change over time):
+  price_drift     unitPrice != the product's current base price
+  unknown_product item barcode not in products (bulk tiers can't be checked)
+
+Tiers come from the snapshot's bulkPricing, not the one in force at the
+time of the sale: audit a dump taken in the period, or a short --days
+window, after changing tier prices.
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from backup_firestore import iter_dump_docs
+from build_catalog import load_subcategories
+from firebase_app import get_db
+from firestore_scan import iter_docs
+from pricing import BULK_ELIGIBLE_CODES, BULK_TIERS
+
+SALE_FIELDS = ['items', 'subtotal', 'discount', 'total', 'status', 'createdAt']
+PRODUCT_FIELDS = ['categoryCode', 'priceOverride']
+
+ERROR_CHECKS = ['line_subtotal', 'subtotal', 'total', 'discount']
+WARNING_CHECKS = ['price_drift', 'unknown_product']
+
+DEFAULT_TOLERANCE = 0.01
+
+def load_live(db, since):
+    """(sales, products, subcategories) as [(id, dict)] lists read from Firestore"""
+    query = db.collection('sales')
+    if since is not None:
+        query = query.where('createdAt', '>=', since)
+    sales = [(s.id, s.to_dict()) for s in query.select(SALE_FIELDS).stream()]
+    products = [(s.id, s.to_dict()) for s in iter_docs(db.collection('products').select(PRODUCT_FIELDS), 1000)]
+    return sales, products, list(load_subcategories(db).items())
+
+def load_dump(directory, since):
+    """Same as load_live, from a backup_firestore.py export"""
+    sales = [
+        (sale_id, data) for sale_id, data in iter_dump_docs(directory, 'sales')
+        if since is None or (data.get('createdAt') is not None and data['createdAt'] >= since)
+    ]
+    products = list(iter_dump_docs(directory, 'products'))
+    subcategories = [(data.get('code') or code, data) for code, data in iter_dump_docs(directory, 'subcategories', group=True)]
+    return sales, products, subcategories
+
+def build_frames(sales, products, subcategories):
+    """
+    Columnar tables: items (one row per sale line), sales, products and
+    pricing (one row per subcategory, one column per bulk tier)
+    """
+    item_columns = {'saleId': [], 'barcode': [], 'quantity': [], 'unitPrice': [], 'lineSubtotal': []}
+    sale_columns = {'saleId': [], 'status': [], 'createdAt': [], 'subtotal': [], 'discount': [], 'total': []}
+    for sale_id, sale in sales:
+        for item in sale.get('items') or []:
+            item_columns['saleId'].append(sale_id)
+            item_columns['barcode'].append(item.get('barcode'))
+            item_columns['quantity'].append(item.get('quantity'))
+            item_columns['unitPrice'].append(item.get('unitPrice'))
+            item_columns['lineSubtotal'].append(item.get('subtotal'))
+        sale_columns['saleId'].append(sale_id)
+        sale_columns['status'].append(sale.get('status'))
+        sale_columns['createdAt'].append(sale.get('createdAt'))
+        sale_columns['subtotal'].append(sale.get('subtotal'))
+        sale_columns['discount'].append(sale.get('discount') or 0)
+        sale_columns['total'].append(sale.get('total'))
+
+    items = pd.DataFrame(item_columns).astype({'saleId': object, 'barcode': object})
+    for column in ['quantity', 'unitPrice', 'lineSubtotal']:
+        items[column] = pd.to_numeric(items[column], errors='coerce')
+    sales_frame = pd.DataFrame(sale_columns).astype({'saleId': object}).set_index('saleId')
+    for column in ['subtotal', 'discount', 'total']:
+        sales_frame[column] = pd.to_numeric(sales_frame[column], errors='coerce')
+
+    products_frame = pd.DataFrame({
+        'barcode': [barcode for barcode, _ in products],
+        'categoryCode': [data.get('categoryCode') for _, data in products],
+        'priceOverride': pd.to_numeric(pd.Series([data.get('priceOverride') for _, data in products], dtype=object), errors='coerce'),
+    })
+
+    pricing_columns = {'categoryCode': [], 'defaultPrice': [], 'hasBulkPricing': []}
+    pricing_columns.update({key: [] for _, key in BULK_TIERS})
+    for code, data in subcategories:
+        bulk_pricing = data.get('bulkPricing') or {}
+        pricing_columns['categoryCode'].append(code)
+        pricing_columns['defaultPrice'].append(data.get('defaultPrice'))
+        pricing_columns['hasBulkPricing'].append(bool(bulk_pricing))
+        for _, key in BULK_TIERS:
+            pricing_columns[key].append(bulk_pricing.get(key))
+    pricing = pd.DataFrame(pricing_columns).drop_duplicates('categoryCode')
+    for column in ['defaultPrice'] + [key for _, key in BULK_TIERS]:
+        pricing[column] = pd.to_numeric(pricing[column], errors='coerce')
+
+    return items, sales_frame, products_frame, pricing
+
+def price_items(items, products, pricing):
+    """Items joined with pricing, plus expectedUnitPrice/expectedLine/currentBasePrice"""
+    items = items.merge(products, on='barcode', how='left', indicator='productMatch')
+    items['knownProduct'] = items.pop('productMatch') == 'both'
+    items = items.merge(pricing, on='categoryCode', how='left')
+
+    # Same as pricing.sale_subtotal: tiers depend on the sale's total eligible quantity
+    eligible = items['categoryCode'].isin(BULK_ELIGIBLE_CODES) & items['hasBulkPricing'].eq(True)
+    items['bulkQty'] = items['quantity'].where(eligible, 0).groupby(items['saleId']).transform('sum')
+    conditions = [eligible & (items['bulkQty'] >= min_qty) & items[key].notna() for min_qty, key in BULK_TIERS]
+    items['expectedUnitPrice'] = np.select(conditions, [items[key] for _, key in BULK_TIERS], default=items['unitPrice'])
+    items['expectedLine'] = items['quantity'] * items['expectedUnitPrice']
+    items['currentBasePrice'] = items['priceOverride'].fillna(items['defaultPrice'])
+    return items
+
+def violations(check, frame, expected, actual, bad):
+    """Rows for one check: saleId, check, barcode, expected, actual, difference"""
+    rows = frame.loc[bad]
+    return pd.DataFrame({
+        'saleId': rows['saleId'] if 'saleId' in rows else rows.index,
+        'check': check,
+        'barcode': rows['barcode'] if 'barcode' in rows else None,
+        'expected': expected[bad],
+        'actual': actual[bad],
+    }).assign(difference=lambda df: (df['actual'] - df['expected']).round(2))
+
+def audit(items, sales, products, pricing, tolerance):
+    """DataFrame of every violation and warning, worst difference first"""
+    items = price_items(items, products, pricing)
+
+    def off(actual, expected):
+        return actual.isna() | ((actual - expected).abs() > tolerance)
+
+    found = []
+    expected_line = items['quantity'] * items['unitPrice']
+    found.append(violations('line_subtotal', items, expected_line, items['lineSubtotal'], off(items['lineSubtotal'], expected_line)))
+
+    expected_subtotal = items.groupby('saleId')['expectedLine'].sum(min_count=1).reindex(sales.index).fillna(0)
+    found.append(violations('subtotal', sales, expected_subtotal, sales['subtotal'], off(sales['subtotal'], expected_subtotal)))
+
+    expected_total = sales['subtotal'] - sales['discount']
+    found.append(violations('total', sales, expected_total, sales['total'], off(sales['total'], expected_total)))
+
+    bad_discount = (sales['discount'] < 0) | (sales['discount'] > sales['subtotal'] + tolerance)
+    found.append(violations('discount', sales, sales['subtotal'].clip(lower=0), sales['discount'], bad_discount))
+
+    drift = items['knownProduct'] & items['currentBasePrice'].notna() & off(items['unitPrice'], items['currentBasePrice'])
+    found.append(violations('price_drift', items, items['currentBasePrice'], items['unitPrice'], drift))
+    found.append(violations('unknown_product', items, items['unitPrice'], items['unitPrice'], ~items['knownProduct']))
+
+    found = [frame for frame in found if len(frame)]
+    if found:
+        report = pd.concat(found, ignore_index=True)
+    else:
+        report = pd.DataFrame(columns=['saleId', 'check', 'barcode', 'expected', 'actual', 'difference'], dtype=object)
+    report = report.join(sales[['status', 'createdAt']], on='saleId')
+    return report.sort_values('difference', key=lambda d: d.abs(), ascending=False, na_position='first', ignore_index=True)
+
+def write_report(report, path):
+    if path.endswith('.json'):
+        with open(path, 'w') as f:
+            json.dump(json.loads(report.to_json(orient='records', date_format='iso')), f, indent=2, ensure_ascii=False)
+    else:
+        report.to_csv(path, index=False)
+
+def audit_sales_pricing(args):
+    since = datetime.now(timezone.utc) - timedelta(days=args.days) if args.days else None
+    window = f"last {args.days} days" if args.days else "all sales"
+    source = args.dump or 'Firestore'
+    print(f"🧾 Auditing sale pricing ({window}) from {source}\n")
+
+    started = time.perf_counter()
+    if args.dump:
+        sales, products, subcategories = load_dump(args.dump, since)
+    else:
+        sales, products, subcategories = load_live(get_db(args.key), since)
+    loaded = time.perf_counter()
+
+    items, sales_frame, products_frame, pricing = build_frames(sales, products, subcategories)
+    report = audit(items, sales_frame, products_frame, pricing, args.tolerance)
+    audited = time.perf_counter()
+
+    errors = report[report['check'].isin(ERROR_CHECKS)]
+    shown = errors.head(args.show)
+    if len(shown):
+        print(f"❌ Largest mismatches (showing {len(shown)} of {len(errors):,}):")
+        for row in shown.itertuples():
+            barcode = f" {row.barcode}" if isinstance(row.barcode, str) else ""
+            print(f"   {row.saleId} {row.check}{barcode}: expected {row.expected:.2f}, got {row.actual:.2f}")
+        print()
+
+    if args.report:
+        write_report(report, args.report)
+
+    print(f"{'='*60}")
+    print(f"🧾 Sales audited: {len(sales_frame):,} ({len(items):,} items)")
+    print(f"⏱️  Loaded in {loaded - started:.1f}s, audited in {audited - loaded:.1f}s")
+    counts = report['check'].value_counts()
+    for check in ERROR_CHECKS:
+        print(f"{'❌' if counts.get(check) else '✅'} {check}: {counts.get(check, 0):,}")
+    for check in WARNING_CHECKS:
+        print(f"⚠️  {check}: {counts.get(check, 0):,}")
+    if args.report:
+        print(f"📝 Report written to {args.report}")
+    print(f"{'='*60}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check sale subtotals, bulk tiers and discounts against the price rules')
+    parser.add_argument('--days', type=int, help='Only sales created in the last N days (default: all)')
+    parser.add_argument('--dump', help='Read a backup_firestore.py export directory instead of Firestore')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f'Allowed difference in quetzales (default {DEFAULT_TOLERANCE})')
+    parser.add_argument('--report', help='Write every violation/warning to this .csv or .json file')
+    parser.add_argument('--show', type=int, default=20, help='Mismatches to print (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    try:
+        audit_sales_pricing(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Local streaming backup and restore of the whole Firestore database
+Usage:
+  python3 backup_firestore.py export backups/2025-06-01
+  python3 backup_firestore.py restore backups/2025-06-01 --key stagingServiceAccountKey.json
+
+Export writes one gzip'd JSON Lines file per collection (and per
+subcollection group, e.g. categories/*/subcategories) plus a manifest.json.
+Collections are exported in parallel, each paging through its documents with
+a cursor, so memory stays at one page per collection. Records are
+{"path": ..., "data": ...} with keys sorted, so dumps diff cleanly.
+
+Restore replays a dump into the target project through a BulkWriter with
+retry. It refuses to write to production unless --allow-prod is given.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from firebase_app import PROD_PROJECT_ID, get_app, get_db
+from bulk_writes import RateReporter, open_bulk_writer
+from firestore_json import MANIFEST, decode_doc, dumps_record, encode_doc
+from firestore_scan import iter_pages
+
+# Subcollections exported as collection groups (one file each)
+SUBCOLLECTION_GROUPS = ['subcategories', 'pendingCashShards', 'pendingSales']
+
+def dump_filename(name, group=False):
+    return f'group__{name}.jsonl.gz' if group else f'{name}.jsonl.gz'
+
+def iter_dump(path):
+    """Yield records from one .jsonl.gz dump file"""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def iter_dump_docs(directory, name, group=False):
+    """Yield (document id, decoded data) from a collection's dump in `directory`"""
+    for record in iter_dump(os.path.join(directory, dump_filename(name, group))):
+        path, data = decode_doc(record)
+        yield path.rsplit('/', 1)[1], data
+
+def export_query(query, out_path, page_size, reporter, lock, skip_top_level=False):
+    """Stream one collection/group to a .jsonl.gz file; returns docs written"""
+    count = 0
+    with gzip.open(out_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+        for page in iter_pages(query, page_size):
+            for snapshot in page:
+                # A group query also matches a top-level collection with the same id
+                if skip_top_level and snapshot.reference.path.count('/') == 1:
+                    continue
+                f.write(dumps_record(encode_doc(snapshot)))
+                f.write('\n')
+                count += 1
+            with lock:
+                reporter.add(len(page))
+    return count
+
+def export_database(args):
+    db = get_db(args.key)
+    os.makedirs(args.dir, exist_ok=True)
+
+    groups = SUBCOLLECTION_GROUPS + (args.group or [])
+    if args.only:
+        collections = [name for name in args.only if name not in groups]
+        groups = [name for name in groups if name in args.only]
+    else:
+        collections = [collection.id for collection in db.collections()]
+
+    jobs = {}
+    for name in collections:
+        jobs[dump_filename(name)] = (db.collection(name), False)
+    for name in groups:
+        jobs[dump_filename(name, group=True)] = (db.collection_group(name), True)
+
+    print(f"📦 Exporting {len(jobs)} collections/groups from '{get_app().project_id}' → {args.dir}\n")
+
+    reporter = RateReporter('exported')
+    lock = threading.Lock()
+    counts = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(export_query, query, os.path.join(args.dir, filename),
+                            args.page_size, reporter, lock, is_group): filename
+            for filename, (query, is_group) in jobs.items()
+        }
+        for future in as_completed(futures):
+            filename = futures[future]
+            counts[filename] = future.result()
+            print(f"   ✅ {filename}: {counts[filename]:,} docs")
+
+    with open(os.path.join(args.dir, MANIFEST), 'w') as f:
+        json.dump({
+            'projectId': get_app().project_id,
+            'exportedAt': datetime.now(timezone.utc).isoformat(),
+            'files': dict(sorted(counts.items())),
+        }, f, indent=2)
+
+    print(f"\n✅ Export complete: {reporter.summary()}")
+
+def restore_database(args):
+    with open(os.path.join(args.dir, MANIFEST)) as f:
+        manifest = json.load(f)
+
+    project_id = get_app(args.key).project_id
+    if project_id == PROD_PROJECT_ID and not args.allow_prod:
+        print(f"❌ Refusing to restore into production project '{project_id}'")
+        print("   Pass --key with a staging service account, or --allow-prod to override")
+        return
+
+    db = get_db(args.key)
+    filenames = list(manifest['files'])
+    if args.only:
+        wanted = {dump_filename(name) for name in args.only} | {dump_filename(name, group=True) for name in args.only}
+        filenames = [name for name in filenames if name in wanted]
+
+    print(f"♻️  Restoring {manifest['projectId']} dump from {manifest['exportedAt']} → '{project_id}'\n")
+
+    bulk_writer, failures = open_bulk_writer(db, max_ops_per_second=args.max_ops)
+    reporter = RateReporter('restored')
+    for filename in filenames:
+        count = 0
+        for record in iter_dump(os.path.join(args.dir, filename)):
+            path, data = decode_doc(record, db)
+            bulk_writer.set(db.document(path), data)
+            count += 1
+            reporter.add()
+        print(f"   ↗️  {filename}: {count:,} docs queued")
+
+    bulk_writer.close()
+
+    print(f"\n{'='*60}")
+    print(f"✅ Restore complete: {reporter.summary()}")
+    if failures:
+        print(f"❌ Failed writes: {len(failures)}")
+        for path, message in failures[:10]:
+            print(f"   {path}: {message}")
+    print(f"{'='*60}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export/restore Firestore to local gzip JSON Lines')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Dump every collection to DIR')
+    export_parser.add_argument('dir')
+    export_parser.add_argument('--group', action='append', help='Extra subcollection group to export (repeatable)')
+    export_parser.add_argument('--workers', type=int, default=8, help='Collections exported in parallel (default 8)')
+    export_parser.add_argument('--page-size', type=int, default=1000, help='Documents per cursor page (default 1000)')
+
+    restore_parser = subparsers.add_parser('restore', help='Replay a dump from DIR into the target project')
+    restore_parser.add_argument('dir')
+    restore_parser.add_argument('--max-ops', type=int, default=5000, help='Max writes/sec after ramp-up (default 5000)')
+    restore_parser.add_argument('--allow-prod', action='store_true', help='Allow restoring into the production project')
+
+    for sub in (export_parser, restore_parser):
+        sub.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+        sub.add_argument('--only', action='append', help='Limit to this collection/group (repeatable)')
+
+    args = parser.parse_args()
+    try:
+        if args.command == 'export':
+            export_database(args)
+        else:
+            restore_database(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Build the denormalized catalog read model: one document per subcategory
+Usage:
+  python3 build_catalog.py                     # categories with changes since the last build
+  python3 build_catalog.py --full              # every category (also picks up deleted products)
+  python3 build_catalog.py --category CUA-2030 --dry-run
+
+A catalog page would otherwise read every product document of a
+subcategory. catalog/{code}_{n} holds the listing fields of all active
+products with categoryCode == code, so a page load is one query returning
+1-2 documents:
+  {categoryCode, primaryCategory, subcategoryName, chunk,
+   products: [{barcode, name, price, priceTiers?, imageUrl, inStore,
+               inWarehouse, displayOrder}],
+   barcodes, contentHash, updatedAt}
+Stock is exposed as in-stock flags only (catalog docs are publicly readable).
+
+Products are split into chunks that stay under Firestore's 1 MiB document
+limit, sized with Firestore's own storage-size rules. A chunk is only
+written when its contentHash changes, and surplus chunks are deleted.
+
+Incremental runs rebuild the categories of products/subcategories whose
+updatedAt is newer than the previous build (plus the category a moved
+product was listed under). Deletions don't bump updatedAt, so run --full
+periodically.
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from firebase_app import get_db
+from firestore_scan import iter_docs
+from pricing import base_price, is_bulk_eligible, price_tiers
+from write_executor import WriteExecutor, delete, print_failures, set_doc
+
+CATALOG_COLLECTION = 'catalog'
+BUILD_STATE_DOC = 'catalogMeta/build'
+
+# Firestore's limit is 1 MiB per document; leave room for the other fields
+CHUNK_BUDGET_BYTES = 900 * 1024
+
+# The next incremental run re-checks this much before the previous start (clock skew)
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+def storage_size(value):
+    """Stored size of a field value per Firestore's storage size rules"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 1
+    if isinstance(value, list):
+        return sum(storage_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(len(key.encode('utf-8')) + 1 + storage_size(item) for key, item in value.items())
+    return 8
+
+def chunk_id(code, n):
+    return f'{code}_{n}'
+
+def catalog_entry(product, subcategory):
+    """Listing fields for one product"""
+    images = product.get('images') or []
+    entry = {
+        'barcode': product['barcode'],
+        'name': product.get('name'),
+        'price': base_price(product, subcategory),
+        'imageUrl': images[0] if images else product.get('primaryImageUrl'),
+        'inStore': (product.get('stockStore') or 0) > 0,
+        'inWarehouse': (product.get('stockWarehouse') or 0) > 0,
+        'displayOrder': product.get('displayOrder', 0),
+    }
+    bulk_pricing = (subcategory or {}).get('bulkPricing')
+    if is_bulk_eligible(product.get('categoryCode'), bulk_pricing):
+        entry['priceTiers'] = price_tiers(bulk_pricing)
+    return entry
+
+def split_chunks(entries):
+    """Consecutive runs of entries whose products + barcodes fit CHUNK_BUDGET_BYTES"""
+    chunks = [[]]
+    used = 0
+    for entry in entries:
+        size = storage_size(entry) + storage_size(entry['barcode'])
+        if chunks[-1] and used + size > CHUNK_BUDGET_BYTES:
+            chunks.append([])
+            used = 0
+        chunks[-1].append(entry)
+        used += size
+    return chunks
+
+def content_hash(entries):
+    return hashlib.sha1(json.dumps(entries, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+def load_subcategories(db):
+    """{code: subcategory dict (with primaryCategory)} from every categories/*/subcategories"""
+    subcategories = {}
+    for snapshot in db.collection_group('subcategories').stream():
+        data = snapshot.to_dict()
+        data['primaryCategory'] = snapshot.reference.parent.parent.id
+        subcategories[data.get('code') or snapshot.id] = data
+    return subcategories
+
+def load_existing_chunks(db):
+    """{code: {chunk doc id: {'contentHash', 'barcodes'}}} (one read per chunk)"""
+    existing = {}
+    query = db.collection(CATALOG_COLLECTION).select(['categoryCode', 'contentHash', 'barcodes'])
+    for snapshot in iter_docs(query):
+        data = snapshot.to_dict()
+        existing.setdefault(data['categoryCode'], {})[snapshot.id] = data
+    return existing
+
+def changed_codes(db, since, subcategories, existing):
+    """Category codes touched since the watermark"""
+    listed_under = {
+        barcode: code
+        for code, chunks in existing.items()
+        for chunk in chunks.values()
+        for barcode in chunk.get('barcodes', [])
+    }
+    codes = set()
+    products = db.collection('products').where('updatedAt', '>', since).select(['categoryCode'])
+    for snapshot in products.stream():
+        code = snapshot.to_dict().get('categoryCode')
+        if code:
+            codes.add(code)
+        # A product moved to another subcategory must leave its old chunk too
+        if snapshot.id in listed_under:
+            codes.add(listed_under[snapshot.id])
+    for code, subcategory in subcategories.items():
+        updated_at = subcategory.get('updatedAt')
+        if updated_at is not None and updated_at > since:
+            codes.add(code)
+    return codes
+
+def products_by_code(db, codes=None):
+    """{code: [product dict]}; all products in one scan, or one query per code"""
+    grouped = {}
+    if codes is None:
+        for snapshot in iter_docs(db.collection('products'), 1000):
+            product = snapshot.to_dict()
+            if product.get('categoryCode'):
+                grouped.setdefault(product['categoryCode'], []).append(product)
+    else:
+        for code in codes:
+            grouped[code] = [s.to_dict() for s in db.collection('products').where('categoryCode', '==', code).stream()]
+    return grouped
+
+def build_category(db, code, products, subcategory, existing_chunks):
+    """Writes needed for one category: (writes, chunks written, chunks unchanged, chunks deleted)"""
+    active = [product for product in products if product.get('isActive', True) and product.get('barcode')]
+    entries = sorted(
+        (catalog_entry(product, subcategory) for product in active),
+        key=lambda e: (e['displayOrder'] or 0, e['name'] or '', e['barcode']),
+    )
+    chunks = split_chunks(entries) if entries else []
+
+    writes = []
+    written = unchanged = 0
+    wanted_ids = set()
+    for n, chunk in enumerate(chunks):
+        doc_id = chunk_id(code, n)
+        wanted_ids.add(doc_id)
+        digest = content_hash(chunk)
+        if existing_chunks.get(doc_id, {}).get('contentHash') == digest:
+            unchanged += 1
+            continue
+        writes.append(set_doc(db.collection(CATALOG_COLLECTION).document(doc_id), {
+            'categoryCode': code,
+            'primaryCategory': (subcategory or {}).get('primaryCategory'),
+            'subcategoryName': (subcategory or {}).get('subcategoryName') or (subcategory or {}).get('name'),
+            'chunk': n,
+            'products': chunk,
+            'barcodes': [entry['barcode'] for entry in chunk],
+            'contentHash': digest,
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        }))
+        written += 1
+
+    surplus = [doc_id for doc_id in existing_chunks if doc_id not in wanted_ids]
+    writes.extend(delete(db.collection(CATALOG_COLLECTION).document(doc_id)) for doc_id in surplus)
+    return writes, written, unchanged, len(surplus)
+
+def build_catalog(args):
+    db = get_db(args.key)
+    started = datetime.now(timezone.utc)
+    state_ref = db.document(BUILD_STATE_DOC)
+
+    subcategories = load_subcategories(db)
+    existing = load_existing_chunks(db)
+
+    if args.category:
+        codes = set(args.category)
+        scope = ', '.join(sorted(codes))
+    elif args.full:
+        codes = None
+        scope = 'all categories'
+    else:
+        state = state_ref.get()
+        last_build = state.to_dict().get('lastBuildStartedAt') if state.exists else None
+        if last_build is None:
+            codes = None
+            scope = 'all categories (no previous build)'
+        else:
+            codes = changed_codes(db, last_build - WATERMARK_OVERLAP, subcategories, existing)
+            scope = f'{len(codes)} categories changed since {last_build:%Y-%m-%d %H:%M}'
+
+    mode = 'DRY RUN' if args.dry_run else 'LIVE'
+    print(f"📚 Building catalog [{mode}]: {scope}\n")
+
+    grouped = products_by_code(db, codes)
+    if codes is None:
+        # Categories that only exist in the catalog lost all their products
+        codes = set(grouped) | set(existing)
+
+    totals = {'written': 0, 'unchanged': 0, 'deleted': 0, 'products': 0}
+    all_writes = []
+    for code in sorted(codes):
+        products = grouped.get(code, [])
+        writes, written, unchanged, deleted = build_category(db, code, products, subcategories.get(code), existing.get(code, {}))
+        all_writes.extend(writes)
+        totals['written'] += written
+        totals['unchanged'] += unchanged
+        totals['deleted'] += deleted
+        totals['products'] += len(products)
+        if written or deleted:
+            print(f"   📝 {code}: {len(products)} products, {written} chunk(s) written, {deleted} deleted")
+
+    failures = []
+    if all_writes and not args.dry_run:
+        with WriteExecutor(db) as executor:
+            executor.submit(all_writes)
+        failures = executor.failures
+
+    # Only advance the watermark when everything landed
+    if not args.dry_run and not args.category and not failures:
+        state_ref.set({'lastBuildStartedAt': started, 'updatedAt': firestore.SERVER_TIMESTAMP}, merge=True)
+
+    print(f"\n{'='*60}")
+    print(f"📚 Categories: {len(codes)} ({totals['products']:,} products)")
+    print(f"📝 Chunks {'to write' if args.dry_run else 'written'}: {totals['written']}")
+    print(f"✅ Chunks unchanged: {totals['unchanged']}")
+    print(f"🗑️  Chunks {'to delete' if args.dry_run else 'deleted'}: {totals['deleted']}")
+    print_failures(failures)
+    print(f"{'='*60}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build catalog/{code}_{n} listing documents')
+    parser.add_argument('--full', action='store_true', help='Rebuild every category, not just changed ones')
+    parser.add_argument('--category', action='append', help='Rebuild only this subcategory code (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help="Compute chunks but don't write")
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    try:
+        build_catalog(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
@@ -0,0 +1,68 @@
+"""
+Helpers for high-volume writes through Firestore's BulkWriter
+Usage: from bulk_writes import open_bulk_writer, RateReporter
+
+BulkWriter sends batches in parallel from a thread pool and ramps traffic
+following Firestore's 500/50/5 rule (start at 500 ops/s, +50% every 5 min).
+"""
+
+import time
+from google.cloud.firestore_v1.bulk_writer import BulkRetry, BulkWriterOptions, SendMode
+
+# Cap for the 500/50/5 ramp; Firestore keeps ramping past this only if we let it
+DEFAULT_MAX_OPS_PER_SECOND = 5000
+
+# Attempts per document before a write is reported as failed
+DEFAULT_MAX_ATTEMPTS = 10
+
+def open_bulk_writer(db, max_ops_per_second=DEFAULT_MAX_OPS_PER_SECOND, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Create a parallel BulkWriter with exponential retry
+
+    Returns: (bulk_writer, failures) where failures is a list that collects
+    (document_path, error_message) for writes that exhausted their retries.
+    """
+    options = BulkWriterOptions(
+        initial_ops_per_second=min(500, max_ops_per_second),
+        max_ops_per_second=max_ops_per_second,
+        mode=SendMode.parallel,
+        retry=BulkRetry.exponential,
+    )
+    bulk_writer = db.bulk_writer(options)
+    failures = []
+
+    def on_error(error, _writer):
+        if error.attempts < max_attempts:
+            return True
+        failures.append((error.operation.reference.path, error.message))
+        return False
+
+    bulk_writer.on_write_error(on_error)
+    return bulk_writer, failures
+
+class RateReporter:
+    """Counts processed documents and prints docs/sec at most every `interval` seconds"""
+
+    def __init__(self, label, interval=5.0):
+        self.label = label
+        self.interval = interval
+        self.count = 0
+        self.started = time.perf_counter()
+        self._last_print = self.started
+
+    def add(self, n=1):
+        self.count += n
+        now = time.perf_counter()
+        if now - self._last_print >= self.interval:
+            self._last_print = now
+            print(f"   ⏱️  {self.label}: {self.count:,} docs ({self.rate():,.0f} docs/s)")
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return f"{self.count:,} docs in {self.elapsed():.1f}s ({self.rate():,.0f} docs/s)"
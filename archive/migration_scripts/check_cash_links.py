@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Check every link between deposits, sales and pendingCash over the full history
+Usage:
+  python3 check_cash_links.py
+  python3 check_cash_links.py --dump backups/2025-06-01 --report cash_links.jsonl
+
+check_deposits_flow.py shows the latest sales/deposits; this validates all
+of them. deposits and pendingCash (small; shards and pendingSales are
+summed per source) are loaded into hash maps keyed by sale ID, then sales
+are streamed once and probed against them, so each collection is read
+exactly once and only referenced sales are kept.
+
+Deposits
+  deposit_missing_sale       saleIds lists a sale that doesn't exist
+  deposit_duplicate_sale     the same sale listed twice in one deposit
+  sale_in_multiple_deposits  a sale listed by more than one deposit
+  sale_not_linked_back       a listed sale's depositId is not this deposit
+  cash_received_mismatch     cashReceived != sum of the listed sales' totals
+  net_amount_mismatch        amount != cashReceived - expenses
+Sales
+  sale_missing_deposit       depositId points to a deposit that doesn't exist
+  sale_not_in_deposit        depositId's deposit doesn't list the sale
+  deposited_non_cash_sale    depositId set on a sale not paid in efectivo
+  untracked_cash_sale        efectivo cash collected, but neither pending nor deposited
+pendingCash
+  pending_missing_sale       a pending sale (root saleIds or pendingSales) doesn't exist
+  pending_already_deposited  a pending sale is already in a deposit
+  pending_in_multiple_sources
+  pending_wrong_source       the sale's cash belongs to another source
+  pending_amount_mismatch    amount (root + shards) != sum of its sales' totals
+
+Exits 1 if anything is found.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter, defaultdict
+from backup_firestore import dump_filename, iter_dump, iter_dump_docs
+from firebase_app import get_db
+from firestore_json import decode_doc
+from firestore_scan import iter_docs
+from pending_cash import PENDING_SALES, SHARDS, read_pending_cash, summarize
+
+SALE_FIELDS = ['saleType', 'paymentMethod', 'deliveryMethod', 'deliveryStatus', 'status', 'total', 'depositId']
+DEPOSIT_FIELDS = ['source', 'saleIds', 'cashReceived', 'amount', 'expenses']
+
+# Delivery states in which the customer's cash has been collected
+CASH_COLLECTED_STATUSES = {'delivered', 'cash_received', 'completed'}
+
+TOLERANCE = 0.01
+
+def cash_source(sale):
+    """pendingCash document that should hold the sale's cash (as in sales_repository.dart)"""
+    if sale.get('saleType') == 'delivery' and sale.get('deliveryMethod') in ('mensajero', 'forza'):
+        return sale['deliveryMethod']
+    return 'store'
+
+def holds_cash(sale):
+    """True for efectivo sales whose cash was taken and must be pending or deposited"""
+    if sale.get('paymentMethod') != 'efectivo' or sale.get('status') != 'approved':
+        return False
+    return sale.get('saleType') == 'kiosko' or sale.get('deliveryStatus') in CASH_COLLECTED_STATUSES
+
+def money(value):
+    return float(value or 0)
+
+def iter_live(db):
+    """(deposits, pendingCash, sales) iterables of (id, dict) from Firestore"""
+    return (
+        ((s.id, s.to_dict()) for s in iter_docs(db.collection('deposits').select(DEPOSIT_FIELDS), 1000)),
+        read_pending_cash(db).items(),
+        ((s.id, s.to_dict()) for s in iter_docs(db.collection('sales').select(SALE_FIELDS), 1000)),
+    )
+
+def pending_cash_from_dump(directory):
+    """pending_cash.summarize() of an export (shard/pendingSales groups may be absent)"""
+    def layer(name, group=False):
+        path = os.path.join(directory, dump_filename(name, group))
+        return [decode_doc(record) for record in iter_dump(path)] if os.path.exists(path) else []
+    return summarize(layer('pendingCash'), layer(SHARDS, group=True), layer(PENDING_SALES, group=True))
+
+def iter_from_dump(directory):
+    return (
+        iter_dump_docs(directory, 'deposits'),
+        pending_cash_from_dump(directory).items(),
+        iter_dump_docs(directory, 'sales'),
+    )
+
+def check_cash_links(deposits, pending_cash, sales):
+    """
+    Returns (violations, counts); violations are dicts with 'check' plus
+    saleId/depositId/source and expected/actual where they apply
+    """
+    violations = []
+
+    def report(check, **fields):
+        violations.append({'check': check, **fields})
+
+    # Build side: every sale ID the deposits and pendingCash refer to
+    deposit_docs = {}
+    deposits_of = defaultdict(list)
+    for deposit_id, deposit in deposits:
+        sale_ids = deposit.get('saleIds') or []
+        deposit_docs[deposit_id] = {'cashReceived': money(deposit.get('cashReceived')), 'salesTotal': 0.0}
+        for sale_id, count in Counter(sale_ids).items():
+            if count > 1:
+                report('deposit_duplicate_sale', depositId=deposit_id, saleId=sale_id, actual=count)
+            deposits_of[sale_id].append(deposit_id)
+        net = money(deposit.get('cashReceived')) - money(deposit.get('expenses'))
+        if abs(money(deposit.get('amount')) - net) > TOLERANCE:
+            report('net_amount_mismatch', depositId=deposit_id, expected=round(net, 2), actual=money(deposit.get('amount')))
+
+    pending_docs = {}
+    sources_of = defaultdict(list)
+    for source, pending in pending_cash:
+        pending_docs[source] = {'amount': money(pending.get('amount')), 'salesTotal': 0.0}
+        for sale_id in set(pending.get('saleIds') or []):
+            sources_of[sale_id].append(source)
+
+    for sale_id, deposit_ids in deposits_of.items():
+        if len(set(deposit_ids)) > 1:
+            report('sale_in_multiple_deposits', saleId=sale_id, depositId=sorted(set(deposit_ids)))
+    for sale_id, sources in sources_of.items():
+        if len(sources) > 1:
+            report('pending_in_multiple_sources', saleId=sale_id, source=sorted(sources))
+
+    # Probe side: one pass over sales
+    seen = set()
+    scanned = 0
+    for sale_id, sale in sales:
+        scanned += 1
+        total = money(sale.get('total'))
+        deposit_id = sale.get('depositId')
+        listed_by = set(deposits_of.get(sale_id, ()))
+        pending_in = sources_of.get(sale_id, ())
+        if listed_by or pending_in:
+            seen.add(sale_id)
+
+        for listing_id in listed_by:
+            deposit_docs[listing_id]['salesTotal'] += total
+            if deposit_id != listing_id:
+                report('sale_not_linked_back', saleId=sale_id, depositId=listing_id, actual=deposit_id)
+
+        if deposit_id:
+            if deposit_id not in deposit_docs:
+                report('sale_missing_deposit', saleId=sale_id, depositId=deposit_id)
+            elif deposit_id not in listed_by:
+                report('sale_not_in_deposit', saleId=sale_id, depositId=deposit_id)
+            if sale.get('paymentMethod') != 'efectivo':
+                report('deposited_non_cash_sale', saleId=sale_id, depositId=deposit_id, actual=sale.get('paymentMethod'))
+
+        for source in pending_in:
+            pending_docs[source]['salesTotal'] += total
+            if deposit_id or listed_by:
+                report('pending_already_deposited', saleId=sale_id, source=source, depositId=deposit_id or sorted(listed_by))
+            if source != cash_source(sale):
+                report('pending_wrong_source', saleId=sale_id, source=source, expected=cash_source(sale))
+
+        if holds_cash(sale) and not deposit_id and not listed_by and not pending_in:
+            report('untracked_cash_sale', saleId=sale_id, source=cash_source(sale), actual=total)
+
+    # Links to sales the scan never produced
+    for sale_id in deposits_of.keys() - seen:
+        for deposit_id in set(deposits_of[sale_id]):
+            report('deposit_missing_sale', saleId=sale_id, depositId=deposit_id)
+    for sale_id in sources_of.keys() - seen:
+        for source in sources_of[sale_id]:
+            report('pending_missing_sale', saleId=sale_id, source=source)
+
+    for deposit_id, deposit in deposit_docs.items():
+        if abs(deposit['cashReceived'] - deposit['salesTotal']) > TOLERANCE:
+            report('cash_received_mismatch', depositId=deposit_id,
+                   expected=round(deposit['salesTotal'], 2), actual=deposit['cashReceived'])
+    for source, pending in pending_docs.items():
+        if abs(pending['amount'] - pending['salesTotal']) > TOLERANCE:
+            report('pending_amount_mismatch', source=source, expected=round(pending['salesTotal'], 2), actual=pending['amount'])
+
+    counts = {'sales': scanned, 'deposits': len(deposit_docs), 'pendingCash': len(pending_docs)}
+    return violations, counts
+
+def print_violation(violation):
+    details = ', '.join(f"{key}={value}" for key, value in violation.items() if key != 'check' and value is not None)
+    print(f"   {violation['check']}: {details}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate deposits ↔ sales ↔ pendingCash links over the full history')
+    parser.add_argument('--dump', help='Read a backup_firestore.py export directory instead of Firestore')
+    parser.add_argument('--report', help='Write every violation as JSON Lines to this file')
+    parser.add_argument('--show', type=int, default=20, help='Violations to print (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    print(f"🔗 Checking cash links in {args.dump or 'Firestore'}\n")
+    try:
+        sources = iter_from_dump(args.dump) if args.dump else iter_live(get_db(args.key))
+        violations, counts = check_cash_links(*sources)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        sys.exit(130)
+
+    if violations:
+        print(f"❌ Violations (showing {min(args.show, len(violations))} of {len(violations):,}):")
+        for violation in violations[:args.show]:
+            print_violation(violation)
+        print()
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            for violation in violations:
+                f.write(json.dumps(violation, ensure_ascii=False, default=str))
+                f.write('\n')
+
+    print(f"{'='*60}")
+    print(f"🧾 Scanned: {counts['sales']:,} sales, {counts['deposits']:,} deposits, {counts['pendingCash']} pendingCash sources")
+    for check, count in Counter(v['check'] for v in violations).most_common():
+        print(f"❌ {check}: {count:,}")
+    if args.report:
+        print(f"📝 Report written to {args.report}")
+    print(f"{'='*60}")
+
+    if violations:
+        sys.exit(1)
+    print("✅ All deposit, sale and pendingCash links are consistent")
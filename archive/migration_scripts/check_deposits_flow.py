@@ -1,56 +1,76 @@
 #!/usr/bin/env python3
 """
 Check the complete deposits flow - sales, pending cash, and deposits.
+
+Usage: python3 check_deposits_flow.py [--async] [--concurrency N] [--mirror mirror.sqlite]
+       python3 check_deposits_flow.py --incremental [--full] [--sweep-days 7]
+
+--async runs the independent queries concurrently with the async
+Firestore client, so the check takes as long as the slowest query.
+
+--mirror answers the same queries from a mirror_firestore.py SQLite
+mirror with indexed SQL, without reading Firestore at all.
+
+--incremental validates only the efectivo sales created or updated since
+the last run, the sales listed by deposits created since then, and whatever
+was flagged last time (kept in checkState/check_deposits_flow, see
+watermarks.py), and also checks those deposits against their sales. Reads
+then follow the day's activity; pending cash is still read whole, but it
+only holds undeposited cash. A full sweep of every efectivo sale and
+deposit runs every --sweep-days.
+
+For every deposit/sale/pendingCash link over the full history, run
+check_cash_links.py.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime
-
-# Initialize Firebase Admin
-cred = credentials.Certificate('../serviceAccountKey.json')
-firebase_admin.initialize_app(cred)
-
-db = firestore.client()
-
-print("="*60)
-print("CHECKING DEPOSITS FLOW")
-print("="*60)
-
-# 1. Check pending cash collection
-print("\n1. PENDING CASH STATE:")
-print("-" * 40)
-pending_cash_ref = db.collection('pendingCash')
-pending_cash_docs = pending_cash_ref.get()
-
-if not pending_cash_docs:
-    print("⚠️  NO pendingCash documents found!")
-    print("   Run: python3 init_pending_cash.py")
-else:
-    for doc in pending_cash_docs:
-        data = doc.to_dict()
-        source = doc.id
-        amount = data.get('amount', 0)
-        sale_ids = data.get('saleIds', [])
-        updated_at = data.get('updatedAt')
-        
+import argparse
+import sys
+from firebase_admin import firestore
+from firebase_app import get_db, get_async_db
+from async_firestore import DEFAULT_CONCURRENCY, gather_limited, query_get, run
+from pending_cash import layer_queries, path_pairs, read_pending_cash, summarize
+from mirror_firestore import PENDING_CASH_COLLECTIONS, field, mirror_pending_cash, open_mirror
+from check_cash_links import TOLERANCE, money
+from firestore_scan import iter_docs
+from watermarks import Watermark, add_incremental_arguments, changed_docs, get_docs
+
+def recent_sales_query(db):
+    return db.collection('sales').order_by('createdAt', direction=firestore.Query.DESCENDING).limit(5)
+
+def recent_deposits_query(db):
+    return db.collection('deposits').order_by('depositedAt', direction=firestore.Query.DESCENDING).limit(3)
+
+def efectivo_sales_query(db):
+    return db.collection('sales').where('paymentMethod', '==', 'efectivo').where('status', '==', 'approved')
+
+def is_efectivo_approved(data):
+    """The filter of efectivo_sales_query(), for documents read some other way"""
+    return data.get('paymentMethod') == 'efectivo' and data.get('status') == 'approved'
+
+def print_pending_cash(pending_cash):
+    print("\n1. PENDING CASH STATE:")
+    print("-" * 40)
+
+    for source, entry in pending_cash.items():
+        amount = entry['amount']
+        sale_ids = entry['saleIds']
+
         print(f"\nSource: {source}")
         print(f"  Amount: Q{amount:.2f}")
         print(f"  Sales: {len(sale_ids)}")
-        if updated_at:
-            print(f"  Updated: {updated_at}")
+        if entry['rootSaleIds']:
+            print(f"  Not yet sharded: {len(entry['rootSaleIds'])} sales on the root doc (run shard_pending_cash.py)")
         if sale_ids:
             print(f"  Sale IDs: {sale_ids[:3]}{'...' if len(sale_ids) > 3 else ''}")
 
-# 2. Check recent sales
-print("\n\n2. RECENT SALES (last 5):")
-print("-" * 40)
-sales_ref = db.collection('sales')
-recent_sales = sales_ref.order_by('createdAt', direction=firestore.Query.DESCENDING).limit(5).get()
+def print_recent_sales(recent_sales):
+    print("\n\n2. RECENT SALES (last 5):")
+    print("-" * 40)
+
+    if not recent_sales:
+        print("No sales found")
+        return
 
-if not recent_sales:
-    print("No sales found")
-else:
     for sale_doc in recent_sales:
         data = sale_doc.to_dict()
         sale_id = sale_doc.id
@@ -63,7 +83,7 @@ else:
         deposit_id = data.get('depositId')
         delivery_method = data.get('deliveryMethod')
         created_at = data.get('createdAt')
-        
+
         print(f"\nSale ID: {sale_id[:8]}...")
         print(f"  Type: {sale_type} | Payment: {payment_method} | Total: Q{total:.2f}")
         print(f"  Status: {status} | Stock: {stock_status}")
@@ -72,7 +92,7 @@ else:
         print(f"  Deposit ID: {deposit_id if deposit_id else 'None'}")
         if created_at:
             print(f"  Created: {created_at}")
-        
+
         # Check if this sale should be in pending cash
         if payment_method == 'efectivo' and status == 'approved':
             if sale_type == 'kiosko' and stock_status == 'completed':
@@ -83,15 +103,14 @@ else:
             elif sale_type == 'delivery' and delivery_status != 'delivered':
                 print(f"  ⏳ Waiting for delivery (not in pending cash yet)")
 
-# 3. Check deposits
-print("\n\n3. RECENT DEPOSITS (last 3):")
-print("-" * 40)
-deposits_ref = db.collection('deposits')
-recent_deposits = deposits_ref.order_by('depositedAt', direction=firestore.Query.DESCENDING).limit(3).get()
+def print_recent_deposits(recent_deposits):
+    print("\n\n3. RECENT DEPOSITS (last 3):")
+    print("-" * 40)
+
+    if not recent_deposits:
+        print("No deposits found")
+        return
 
-if not recent_deposits:
-    print("No deposits found")
-else:
     for deposit_doc in recent_deposits:
         data = deposit_doc.to_dict()
         deposit_id = deposit_doc.id
@@ -99,53 +118,45 @@ else:
         amount = data.get('amount', 0)
         sale_ids = data.get('saleIds', [])
         deposited_at = data.get('depositedAt')
-        
+
         print(f"\nDeposit ID: {deposit_id[:8]}...")
         print(f"  Source: {source} | Amount: Q{amount:.2f}")
         print(f"  Sales linked: {len(sale_ids)}")
         if deposited_at:
             print(f"  Deposited: {deposited_at}")
 
-# 4. Flow validation
-print("\n\n4. FLOW VALIDATION:")
-print("-" * 40)
-
-# Check for efectivo sales not in pending cash and not deposited
-all_sales = sales_ref.where('paymentMethod', '==', 'efectivo').where('status', '==', 'approved').get()
-orphaned_sales = []
-
-for sale_doc in all_sales:
-    data = sale_doc.to_dict()
-    sale_id = sale_doc.id
-    sale_type = data.get('saleType')
-    stock_status = data.get('stockStatus')
-    delivery_status = data.get('deliveryStatus')
-    deposit_id = data.get('depositId')
-    delivery_method = data.get('deliveryMethod')
-    total = data.get('total', 0)
-    
-    # Skip if already deposited
-    if deposit_id:
-        continue
-    
-    # Check if should be in pending cash
-    should_be_in_pending = False
-    expected_source = None
-    
-    if sale_type == 'kiosko' and stock_status == 'completed':
-        should_be_in_pending = True
-        expected_source = 'store'
-    elif sale_type == 'delivery' and delivery_status == 'delivered':
-        should_be_in_pending = True
-        expected_source = delivery_method if delivery_method else 'unknown'
-    
-    if should_be_in_pending:
-        # Check if in pending cash
-        pending_doc = db.collection('pendingCash').document(expected_source).get()
-        if pending_doc.exists:
-            pending_data = pending_doc.to_dict()
-            pending_sale_ids = pending_data.get('saleIds', [])
-            if sale_id not in pending_sale_ids:
+def find_orphaned_sales(all_sales, pending_cash):
+    """Efectivo sales that should be in pending cash but are not"""
+    pending_sale_ids = {source: set(entry['saleIds']) for source, entry in pending_cash.items()}
+    orphaned_sales = []
+
+    for sale_doc in all_sales:
+        data = sale_doc.to_dict()
+        sale_id = sale_doc.id
+        sale_type = data.get('saleType')
+        stock_status = data.get('stockStatus')
+        delivery_status = data.get('deliveryStatus')
+        deposit_id = data.get('depositId')
+        delivery_method = data.get('deliveryMethod')
+        total = data.get('total', 0)
+
+        # Skip if already deposited
+        if deposit_id:
+            continue
+
+        # Check if should be in pending cash
+        should_be_in_pending = False
+        expected_source = None
+
+        if sale_type == 'kiosko' and stock_status == 'completed':
+            should_be_in_pending = True
+            expected_source = 'store'
+        elif sale_type == 'delivery' and delivery_status == 'delivered':
+            should_be_in_pending = True
+            expected_source = delivery_method if delivery_method else 'unknown'
+
+        if should_be_in_pending and expected_source in pending_sale_ids:
+            if sale_id not in pending_sale_ids[expected_source]:
                 orphaned_sales.append({
                     'id': sale_id,
                     'type': sale_type,
@@ -153,13 +164,175 @@ for sale_doc in all_sales:
                     'total': total
                 })
 
-if orphaned_sales:
-    print(f"⚠️  Found {len(orphaned_sales)} sales NOT in pending cash:")
-    for sale in orphaned_sales[:5]:
-        print(f"  - {sale['id'][:8]}... ({sale['type']}) → should be in {sale['source']}, Q{sale['total']:.2f}")
-else:
-    print("✅ All efectivo sales are properly tracked!")
+    return orphaned_sales
+
+def print_flow_validation(orphaned_sales):
+    print("\n\n4. FLOW VALIDATION:")
+    print("-" * 40)
+
+    if orphaned_sales:
+        print(f"⚠️  Found {len(orphaned_sales)} sales NOT in pending cash:")
+        for sale in orphaned_sales[:5]:
+            print(f"  - {sale['id'][:8]}... ({sale['type']}) → should be in {sale['source']}, Q{sale['total']:.2f}")
+    else:
+        print("✅ All efectivo sales are properly tracked!")
+
+def find_deposit_problems(deposits, sales_by_id):
+    """(deposit id, problem) for deposits whose sales are missing, not linked back or don't add up"""
+    problems = []
+    for deposit_doc in deposits:
+        data = deposit_doc.to_dict()
+        sale_ids = data.get('saleIds') or []
+        listed = [sales_by_id[sale_id] for sale_id in sale_ids if sale_id in sales_by_id]
+        if len(listed) < len(sale_ids):
+            problems.append((deposit_doc.id, f"{len(sale_ids) - len(listed)} listed sales don't exist"))
+        unlinked = sum(1 for sale in listed if sale.get('depositId') != deposit_doc.id)
+        if unlinked:
+            problems.append((deposit_doc.id, f"{unlinked} listed sales have another depositId"))
+        sales_total = sum(money(sale.get('total')) for sale in listed)
+        if abs(money(data.get('cashReceived')) - sales_total) > TOLERANCE:
+            problems.append((deposit_doc.id, f"cashReceived Q{money(data.get('cashReceived')):.2f} != sales total Q{sales_total:.2f}"))
+    return problems
+
+def print_deposit_validation(deposit_problems, checked):
+    print("\n\n5. DEPOSIT VALIDATION:")
+    print("-" * 40)
+
+    if deposit_problems:
+        print(f"⚠️  Found {len(deposit_problems)} problems in {checked} deposits:")
+        for deposit_id, problem in deposit_problems[:5]:
+            print(f"  - {deposit_id[:8]}...: {problem}")
+    else:
+        print(f"✅ {checked} deposits match their sales")
+
+def print_report(pending_cash, recent_sales, recent_deposits, all_sales, deposits=None, deposit_problems=()):
+    """Prints every section; returns the orphaned sales"""
+    print("="*60)
+    print("CHECKING DEPOSITS FLOW")
+    print("="*60)
+
+    print_pending_cash(pending_cash)
+    print_recent_sales(recent_sales)
+    print_recent_deposits(recent_deposits)
+    orphaned_sales = find_orphaned_sales(all_sales, pending_cash)
+    print_flow_validation(orphaned_sales)
+    if deposits is not None:
+        print_deposit_validation(deposit_problems, len(deposits))
+
+    print("\n" + "="*60)
+    print("Check complete!")
+    print("="*60)
+    return orphaned_sales
+
+def check_deposits_flow():
+    db = get_db()
+    print_report(
+        read_pending_cash(db),
+        recent_sales_query(db).get(),
+        recent_deposits_query(db).get(),
+        efectivo_sales_query(db).get(),
+    )
+
+def changed_since(db, watermark):
+    """
+    (efectivo sales, deposits) to validate incrementally: created or updated
+    since the watermark, listed by those deposits, or flagged by the last run
+    """
+    summary = watermark.summary
+    deposits = {d.id: d for d in changed_docs(db.collection('deposits'), watermark.since, ('createdAt',))}
+    for deposit_doc in get_docs(db, 'deposits', set(summary.get('problemDepositIds', [])) - deposits.keys()):
+        deposits[deposit_doc.id] = deposit_doc
+
+    sales = {s.id: s for s in changed_docs(db.collection('sales'), watermark.since)}
+    # Sales linked to a deposit by older app versions weren't stamped
+    recheck = {sale_id for d in deposits.values() for sale_id in d.to_dict().get('saleIds') or []}
+    recheck.update(summary.get('orphanedSaleIds', []))
+    for sale_doc in get_docs(db, 'sales', recheck - sales.keys()):
+        sales[sale_doc.id] = sale_doc
+    return [s for s in sales.values() if is_efectivo_approved(s.to_dict())], list(deposits.values())
+
+def check_deposits_flow_incremental(args):
+    db = get_db()
+    watermark = Watermark.from_args(db, 'check_deposits_flow', args)
+    print(f"📌 {watermark.describe()}\n")
+
+    if watermark.full:
+        sales = efectivo_sales_query(db).get()
+        deposits = list(iter_docs(db.collection('deposits')))
+    else:
+        sales, deposits = changed_since(db, watermark)
+
+    sales_by_id = {s.id: s.to_dict() for s in sales}
+    listed = {sale_id for d in deposits for sale_id in d.to_dict().get('saleIds') or []}
+    sales_by_id.update((s.id, s.to_dict()) for s in get_docs(db, 'sales', listed - sales_by_id.keys()))
+    deposit_problems = find_deposit_problems(deposits, sales_by_id)
+
+    orphaned_sales = print_report(
+        read_pending_cash(db),
+        recent_sales_query(db).get(),
+        recent_deposits_query(db).get(),
+        sales,
+        deposits,
+        deposit_problems,
+    )
+
+    # Rolling summary: what has been validated since the last full sweep
+    previous = watermark.summary
+    summary = {
+        'salesChecked': previous.get('salesChecked', 0) + len(sales),
+        'depositsChecked': previous.get('depositsChecked', 0) + len(deposits),
+        'orphanedSaleIds': sorted(sale['id'] for sale in orphaned_sales),
+        'problemDepositIds': sorted({deposit_id for deposit_id, _ in deposit_problems}),
+    }
+    watermark.save(summary)
+    print(f"\n📌 Checked {len(sales)} efectivo sales and {len(deposits)} deposits this run; "
+          f"{summary['salesChecked']} and {summary['depositsChecked']} since the last full sweep")
+    if summary['orphanedSaleIds'] or summary['problemDepositIds']:
+        print(f"   Flagged ones are checked again on every run until fixed")
+
+async def check_deposits_flow_async(concurrency=DEFAULT_CONCURRENCY):
+    db = get_async_db()
+    # The sections have no data dependencies on each other
+    roots, shards, pending_sales, recent_sales, recent_deposits, all_sales = await gather_limited([
+        *(query_get(query) for query in layer_queries(db)),
+        query_get(recent_sales_query(db)),
+        query_get(recent_deposits_query(db)),
+        query_get(efectivo_sales_query(db)),
+    ], concurrency)
+    pending_cash = summarize(path_pairs(roots), path_pairs(shards), path_pairs(pending_sales))
+    print_report(pending_cash, recent_sales, recent_deposits, all_sales)
+
+def check_deposits_flow_mirror(mirror):
+    efectivo = f"{field('paymentMethod')} = ? AND {field('status')} = ?"
+    print_report(
+        mirror_pending_cash(mirror),
+        mirror.docs('sales', order_by=f"{field('createdAt.value')} DESC", limit=5),
+        mirror.docs('deposits', order_by=f"{field('depositedAt.value')} DESC", limit=3),
+        mirror.docs('sales', efectivo, ['efectivo', 'approved']),
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check sales, pending cash and deposits consistency')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Use the async Firestore client and run queries concurrently')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Max concurrent RPCs in --async mode (default {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--mirror', help='Read this mirror_firestore.py SQLite file instead of Firestore')
+    add_incremental_arguments(parser)
+    args = parser.parse_args()
+    if args.incremental and (args.mirror or args.use_async):
+        parser.error('--incremental reads Firestore with the blocking client; drop --mirror/--async')
 
-print("\n" + "="*60)
-print("Check complete!")
-print("="*60)
+    if args.incremental:
+        check_deposits_flow_incremental(args)
+    elif args.mirror:
+        try:
+            mirror = open_mirror(args.mirror, ['sales', 'deposits', *PENDING_CASH_COLLECTIONS])
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        check_deposits_flow_mirror(mirror)
+    elif args.use_async:
+        run(check_deposits_flow_async(args.concurrency))
+    else:
+        check_deposits_flow()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Find dangling references to products, bank accounts and deposits
+Usage:
+  python3 check_references.py
+  python3 check_references.py --partitions 16 --report dangling.jsonl
+  python3 check_references.py --dump backups/2025-06-01
+
+Products (and deposits) can be hard-deleted while sales, shipments,
+movements and legacy orders still point at them. The IDs of every
+referenced collection are loaded first with key-only scans, then every
+referencing collection is streamed with a projection of just the
+referencing fields and each reference is looked up in memory. Every
+collection is split into key ranges (partition queries) and all ranges
+are scanned concurrently, so a full check reads each collection once.
+
+Add a reference to REFERENCES when a new field points at another
+collection.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from google.cloud.firestore_v1.field_path import FieldPath
+from backup_firestore import dump_filename, iter_dump_docs
+from firebase_app import get_db
+from firestore_scan import partition_queries
+
+# (collection, field, referenced collection); 'items[].barcode' is the
+# barcode of every entry in the items list
+REFERENCES = [
+    ('sales', 'items[].barcode', 'products'),
+    ('shipments', 'items[].barcode', 'products'),
+    ('movements', 'items[].barcode', 'products'),
+    ('orders', 'items[].barcode', 'products'),
+    ('sales', 'destinationAccount', 'bankAccounts'),
+    ('sales', 'depositId', 'deposits'),
+    ('deposits', 'destinationAccount', 'bankAccounts'),
+    ('expenses', 'depositId', 'deposits'),
+]
+
+DEFAULT_PARTITIONS = 8
+
+def split_field(field):
+    """'items[].barcode' -> ('items', 'barcode'); 'depositId' -> ('depositId', None)"""
+    if '[].' in field:
+        return tuple(field.split('[].', 1))
+    return field, None
+
+def referenced_ids(data, field):
+    """Non-empty IDs `field` holds in one document"""
+    top, key = split_field(field)
+    value = data.get(top)
+    if key is None:
+        return [value] if isinstance(value, str) and value else []
+    return [item[key] for item in value or [] if isinstance(item, dict) and isinstance(item.get(key), str) and item[key]]
+
+def stream_partition(query, fields=None):
+    """(id, data) for the top-level documents of one partition"""
+    query = query.select(fields) if fields else query.select([FieldPath.document_id()])
+    for snapshot in query.stream():
+        if snapshot.reference.path.count('/') == 1:
+            yield snapshot.id, snapshot.to_dict()
+
+def check_documents(docs, fields, targets):
+    """
+    Check one stream of documents of a collection
+
+    Returns ({field: {'refs': n, 'dangling': Counter(id), 'examples': {id: doc id}}}, docs read)
+    """
+    result = {field: {'refs': 0, 'dangling': Counter(), 'examples': {}} for field, _ in fields}
+    count = 0
+    for doc_id, data in docs:
+        count += 1
+        for field, target in fields:
+            entry = result[field]
+            for ref in referenced_ids(data, field):
+                entry['refs'] += 1
+                if ref not in targets[target]:
+                    entry['dangling'][ref] += 1
+                    entry['examples'].setdefault(ref, doc_id)
+    return result, count
+
+def merge_results(total, part):
+    for field, entry in part.items():
+        merged = total.setdefault(field, {'refs': 0, 'dangling': Counter(), 'examples': {}})
+        merged['refs'] += entry['refs']
+        merged['dangling'].update(entry['dangling'])
+        for ref, doc_id in entry['examples'].items():
+            merged['examples'].setdefault(ref, doc_id)
+
+def fields_by_collection():
+    grouped = {}
+    for collection, field, target in REFERENCES:
+        grouped.setdefault(collection, []).append((field, target))
+    return grouped
+
+def check_live(db, partitions, workers):
+    """({collection: {field: result}}, {collection: docs read}) from Firestore"""
+    grouped = fields_by_collection()
+    target_names = sorted({target for _, _, target in REFERENCES})
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Key-only scans of the referenced collections, every range in parallel
+        id_futures = {
+            name: [executor.submit(lambda q: [doc_id for doc_id, _ in stream_partition(q)], query)
+                   for query in partition_queries(db, name, partitions)]
+            for name in target_names
+        }
+        targets = {name: {doc_id for future in futures for doc_id in future.result()} for name, futures in id_futures.items()}
+
+        scan_futures = []
+        for collection, fields in grouped.items():
+            projection = sorted({split_field(field)[0] for field, _ in fields})
+            for query in partition_queries(db, collection, partitions):
+                scan_futures.append((collection, executor.submit(
+                    lambda q, f=fields, p=projection: check_documents(stream_partition(q, p), f, targets), query)))
+
+        results = {}
+        scanned = Counter()
+        for collection, future in scan_futures:
+            part, count = future.result()
+            merge_results(results.setdefault(collection, {}), part)
+            scanned[collection] += count
+    scanned.update({name: len(ids) for name, ids in targets.items() if name not in grouped})
+    return results, scanned
+
+def check_dump(directory):
+    """Same as check_live, from a backup_firestore.py export"""
+    def docs(name):
+        # Exports only contain the collections that had documents
+        if not os.path.exists(os.path.join(directory, dump_filename(name))):
+            return iter(())
+        return iter_dump_docs(directory, name)
+
+    grouped = fields_by_collection()
+    targets = {
+        name: {doc_id for doc_id, _ in docs(name)}
+        for name in sorted({target for _, _, target in REFERENCES})
+    }
+    results = {}
+    scanned = Counter()
+    for collection, fields in grouped.items():
+        part, count = check_documents(docs(collection), fields, targets)
+        results[collection] = part
+        scanned[collection] = count
+    scanned.update({name: len(ids) for name, ids in targets.items() if name not in grouped})
+    return results, scanned
+
+def report_rows(results):
+    """One row per dangling ID, most referenced first"""
+    targets = {(collection, field): target for collection, field, target in REFERENCES}
+    rows = []
+    for collection, fields in results.items():
+        for field, entry in fields.items():
+            for ref, count in entry['dangling'].items():
+                rows.append({
+                    'collection': collection,
+                    'field': field,
+                    'target': targets[(collection, field)],
+                    'id': ref,
+                    'count': count,
+                    'example': f"{collection}/{entry['examples'][ref]}",
+                })
+    return sorted(rows, key=lambda row: -row['count'])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report references to missing products, bank accounts and deposits')
+    parser.add_argument('--dump', help='Read a backup_firestore.py export directory instead of Firestore')
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help=f'Key ranges per collection scanned in parallel (default {DEFAULT_PARTITIONS})')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent range scans (default 16)')
+    parser.add_argument('--report', help='Write every dangling ID as JSON Lines to this file')
+    parser.add_argument('--show', type=int, default=20, help='Dangling IDs to print (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    print(f"🔗 Checking references in {args.dump or 'Firestore'}\n")
+    try:
+        if args.dump:
+            results, scanned = check_dump(args.dump)
+        else:
+            results, scanned = check_live(get_db(args.key), args.partitions, args.workers)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        sys.exit(130)
+
+    rows = report_rows(results)
+    if rows:
+        print(f"❌ Dangling IDs (showing {min(args.show, len(rows))} of {len(rows):,}):")
+        for row in rows[:args.show]:
+            print(f"   {row['collection']}.{row['field']} → {row['target']}/{row['id']}: {row['count']:,} refs (e.g. {row['example']})")
+        print()
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write('\n')
+
+    print(f"{'='*60}")
+    print("📚 Scanned: " + ', '.join(f"{name} {count:,}" for name, count in sorted(scanned.items())))
+    for collection, fields in results.items():
+        for field, entry in fields.items():
+            dangling = sum(entry['dangling'].values())
+            status = '❌' if dangling else '✅'
+            print(f"{status} {collection}.{field}: {dangling:,} dangling of {entry['refs']:,} ({len(entry['dangling']):,} distinct IDs)")
+    if args.report:
+        print(f"📝 Report written to {args.report}")
+    print(f"{'='*60}")
+
+    if rows:
+        sys.exit(1)
+    print("✅ No dangling references")
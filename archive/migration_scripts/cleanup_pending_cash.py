@@ -1,82 +1,184 @@
 #!/usr/bin/env python3
 """
 Clean up pending cash collection - remove stale sale references and fix amounts.
+
+Usage: python3 cleanup_pending_cash.py [--async] [--concurrency N] [--mirror mirror.sqlite]
+
+Sources are read in the sharded layout (pending_cash.py): the amount is
+the root plus every shard, the sales are the root saleIds plus
+pendingSales. A fix writes the corrected total to the root and zeroes the
+shards in one batch, so run it when no sales are being registered.
+
+--async fetches every source's sales concurrently with the async Firestore
+client instead of one document at a time.
+
+--mirror plans the fix from a mirror_firestore.py SQLite mirror instead of
+reading pendingCash and the sales from Firestore; only the fixes are
+written. Since it writes, the mirror's heartbeat for every collection it
+reads must be under a minute old, and sales the mirror doesn't have are
+read again from Firestore before being removed (the sales listener can lag
+behind pendingSales).
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
-
-# Initialize Firebase Admin
-cred = credentials.Certificate('../serviceAccountKey.json')
-firebase_admin.initialize_app(cred)
-
-db = firestore.client()
-
-def cleanup_pending_cash():
-    """Clean up pending cash by validating all sale references."""
-    pending_cash_ref = db.collection('pendingCash')
-    
-    for source_doc in pending_cash_ref.stream():
-        source_id = source_doc.id
-        data = source_doc.to_dict()
-        
-        sale_ids = data.get('saleIds', [])
-        current_amount = data.get('amount', 0)
-        
-        print(f'\n=== Checking {source_id} ===')
-        print(f'Current amount: Q{current_amount:.2f}')
-        print(f'Sale IDs count: {len(sale_ids)}')
-        
-        if not sale_ids:
-            print('No sales linked, skipping...')
-            continue
-        
-        # Verify each sale exists and calculate correct total
-        valid_sale_ids = []
-        correct_total = 0.0
-        
-        for sale_id in sale_ids:
-            sale_ref = db.collection('sales').document(sale_id)
-            sale_doc = sale_ref.get()
-            
-            if sale_doc.exists:
-                sale_data = sale_doc.to_dict()
-                total = sale_data.get('total', 0)
-                delivery_status = sale_data.get('deliveryStatus', 'N/A')
-                payment_method = sale_data.get('paymentMethod', 'N/A')
-                
-                print(f'  ✓ Sale {sale_id}: Q{total:.2f} ({payment_method}, {delivery_status})')
-                valid_sale_ids.append(sale_id)
-                correct_total += total
-            else:
-                print(f'  ✗ Sale {sale_id}: NOT FOUND (will be removed)')
-        
-        # Update if needed
-        if len(valid_sale_ids) != len(sale_ids) or abs(correct_total - current_amount) > 0.01:
-            print(f'\n⚠️  Updating {source_id}:')
-            print(f'  Old: {len(sale_ids)} sales, Q{current_amount:.2f}')
-            print(f'  New: {len(valid_sale_ids)} sales, Q{correct_total:.2f}')
-            
-            if valid_sale_ids:
-                # Update with correct values
-                pending_cash_ref.document(source_id).update({
-                    'amount': correct_total,
-                    'saleIds': valid_sale_ids,
-                    'updatedAt': firestore.SERVER_TIMESTAMP,
-                })
-                print(f'✅ Updated {source_id}')
-            else:
-                # No valid sales, reset to 0
-                pending_cash_ref.document(source_id).update({
-                    'amount': 0,
-                    'saleIds': [],
-                    'updatedAt': firestore.SERVER_TIMESTAMP,
-                })
-                print(f'✅ Reset {source_id} to zero')
+import argparse
+import asyncio
+import sys
+from firebase_app import get_db, get_async_db
+from async_firestore import DEFAULT_CONCURRENCY, gather_limited, get_docs, query_get, run
+from pending_cash import SOURCES, layer_queries, path_pairs, read_pending_cash, reset_source_writes, summarize
+from write_executor import MAX_BATCH_WRITES, WriteExecutor, add_write, print_failures
+from mirror_firestore import MAX_WRITE_AGE, PENDING_CASH_COLLECTIONS, mirror_pending_cash, open_mirror
+from watermarks import get_docs as get_existing_docs
+
+def plan_source_update(source_id, entry, sale_docs):
+    """
+    Compare a pendingCash source (pending_cash.summarize entry) against its sales and print the result.
+
+    sale_docs: dict {sale_id: snapshot} covering entry['saleIds']
+    Returns: {'amount', 'removed'} to apply, or None if nothing needs changing
+    """
+    sale_ids = entry['saleIds']
+    current_amount = entry['amount']
+
+    print(f'\n=== Checking {source_id} ===')
+    print(f'Current amount: Q{current_amount:.2f}')
+    print(f'Sale IDs count: {len(sale_ids)}')
+
+    if not sale_ids and abs(current_amount) <= 0.01:
+        print('No sales linked, skipping...')
+        return None
+
+    # Verify each sale exists and calculate correct total
+    valid_sale_ids = []
+    removed = []
+    correct_total = 0.0
+
+    for sale_id in sale_ids:
+        sale_doc = sale_docs.get(sale_id)
+
+        if sale_doc is not None and sale_doc.exists:
+            sale_data = sale_doc.to_dict()
+            total = sale_data.get('total', 0)
+            delivery_status = sale_data.get('deliveryStatus', 'N/A')
+            payment_method = sale_data.get('paymentMethod', 'N/A')
+
+            print(f'  ✓ Sale {sale_id}: Q{total:.2f} ({payment_method}, {delivery_status})')
+            valid_sale_ids.append(sale_id)
+            correct_total += total
         else:
-            print(f'✓ {source_id} is correct, no update needed')
-    
+            print(f'  ✗ Sale {sale_id}: NOT FOUND (will be removed)')
+            removed.append(sale_id)
+
+    if not removed and abs(correct_total - current_amount) <= 0.01:
+        print(f'✓ {source_id} is correct, no update needed')
+        return None
+
+    print(f'\n⚠️  Updating {source_id}:')
+    print(f'  Old: {len(sale_ids)} sales, Q{current_amount:.2f}')
+    print(f'  New: {len(valid_sale_ids)} sales, Q{correct_total:.2f}')
+
+    # No valid sales resets the source to zero
+    return {
+        'amount': correct_total if valid_sale_ids else 0,
+        'removed': removed,
+    }
+
+def print_update_result(source_id, update):
+    if update['amount']:
+        print(f'✅ Updated {source_id}')
+    else:
+        print(f'✅ Reset {source_id} to zero')
+
+def cleanup_pending_cash(mirror=None):
+    """Clean up pending cash by validating all sale references (read from `mirror` if given)."""
+    db = get_db()
+    pending_cash = mirror_pending_cash(mirror) if mirror else read_pending_cash(db)
+
+    with WriteExecutor(db) as executor:
+        for source_id in SOURCES:
+            entry = pending_cash[source_id]
+
+            if mirror:
+                sale_docs = mirror.get('sales', entry['saleIds'])
+                # Only drop cash for sales Firestore confirms are gone
+                missing = [sale_id for sale_id in entry['saleIds'] if sale_id not in sale_docs]
+                if missing:
+                    found = get_existing_docs(db, 'sales', missing)
+                    if found:
+                        print(f'\n🔎 {source_id}: {len(found)} of {len(missing)} sales missing from the mirror exist in Firestore')
+                    sale_docs.update({doc.id: doc for doc in found})
+            else:
+                sale_docs = {}
+                for sale_id in entry['saleIds']:
+                    sale_docs[sale_id] = db.collection('sales').document(sale_id).get()
+
+            update = plan_source_update(source_id, entry, sale_docs)
+            if update is not None:
+                # The root and shard writes come first, in one batch
+                executor.submit(reset_source_writes(db, source_id, update['amount'], update['removed']))
+                executor.flush()
+                print_update_result(source_id, update)
+    print_failures(executor.failures)
+
+    print('\n✅ Cleanup complete!')
+
+async def commit_writes(db, writes):
+    """Commit Write tuples with the async client, MAX_BATCH_WRITES per batch in order"""
+    for i in range(0, len(writes), MAX_BATCH_WRITES):
+        batch = db.batch()
+        for write in writes[i:i + MAX_BATCH_WRITES]:
+            add_write(batch, write)
+        await batch.commit()
+
+async def cleanup_pending_cash_async(concurrency=DEFAULT_CONCURRENCY):
+    """Same cleanup, with every source's sale lookups and updates running concurrently."""
+    db = get_async_db()
+    layers = await gather_limited((query_get(query) for query in layer_queries(db)), concurrency)
+    pending_cash = summarize(*(path_pairs(docs) for docs in layers))
+
+    # One batched multi-get per source, all sources at once; the get_all
+    # calls of every source share one cap of `concurrency` RPCs
+    sales_ref = db.collection('sales')
+    rpcs = asyncio.Semaphore(concurrency)
+    sale_docs_by_source = await asyncio.gather(*(
+        get_docs(db, [sales_ref.document(sale_id) for sale_id in pending_cash[source_id]['saleIds']], rpcs)
+        for source_id in SOURCES
+    ))
+
+    # Print per source in a stable order, then write all updates together
+    updates = {}
+    for source_id, sale_docs in zip(SOURCES, sale_docs_by_source):
+        update = plan_source_update(source_id, pending_cash[source_id], sale_docs)
+        if update is not None:
+            updates[source_id] = update
+
+    await gather_limited(
+        (commit_writes(db, reset_source_writes(db, source_id, update['amount'], update['removed']))
+         for source_id, update in updates.items()),
+        concurrency,
+    )
+    for source_id, update in updates.items():
+        print_update_result(source_id, update)
+
     print('\n✅ Cleanup complete!')
 
 if __name__ == '__main__':
-    cleanup_pending_cash()
+    parser = argparse.ArgumentParser(description='Clean up pendingCash sale references and amounts')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Use the async Firestore client and run lookups concurrently')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Max concurrent RPCs in --async mode (default {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--mirror', help='Plan from this mirror_firestore.py SQLite file instead of reading Firestore')
+    args = parser.parse_args()
+
+    if args.mirror:
+        try:
+            mirror = open_mirror(args.mirror, ['sales', *PENDING_CASH_COLLECTIONS], MAX_WRITE_AGE)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        cleanup_pending_cash(mirror)
+    elif args.use_async:
+        run(cleanup_pending_cash_async(args.concurrency))
+    else:
+        cleanup_pending_cash()
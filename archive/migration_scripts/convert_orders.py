@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Convert the legacy `orders` collection into `sales` in bulk
+Usage:
+  python3 convert_orders.py --dry-run     # what each order would become
+  python3 convert_orders.py               # write the sales and link the orders
+
+The batch version of _convertToSale() in order_detail_screen.dart. Orders
+are streamed a page at a time (cursor pagination) and each one becomes a
+delivery sale, in the shape the app creates, with ID order-{orderId}:
+
+  order status                 deliveryStatus  stockStatus  side effects
+  pending / preparing / ready  pending         in_transit   none
+  shipped                      picked_up       in_transit   none
+  delivered                    delivered       completed    stockStore -qty, cash to pendingCash[deliveryMethod]
+
+so undelivered orders continue in the live delivery flow (stock and cash
+move when the sale is marked delivered, see STATE_MACHINES.md). The order
+gets a back-reference (saleId, convertedAt; delivered orders also become
+'completed' like in the UI). order_detail_screen.dart shows an order with a
+saleId as converted and offers no status, payment or cancel actions for it,
+so an undelivered order can't be delivered, paid or cancelled a second time
+outside its sale. Cancelled and completed orders and orders that already
+have a saleId are left alone.
+
+An order's sale, stock, cash and back-reference writes always go in the same
+batch, and an order is only converted if it has no saleId, so the commits
+are all-or-nothing per order and running the script again converts exactly
+the orders still missing. The products of delivered orders are read first;
+orders whose products don't exist are reported and skipped instead of
+failing their whole batch.
+"""
+
+import argparse
+import sys
+from collections import Counter
+from firebase_admin import firestore
+from check_cash_links import cash_source
+from firebase_app import get_db
+from firestore_scan import iter_pages
+from pending_cash import add_sale_writes
+from write_executor import MAX_BATCH_WRITES, WriteExecutor, print_failures, set_doc, update
+
+# IDs per get_all call
+GET_ALL_CHUNK = 300
+
+# Order status -> (deliveryStatus, stockStatus) of the sale
+SALE_STATES = {
+    'pending': ('pending', 'in_transit'),
+    'preparing': ('pending', 'in_transit'),
+    'ready': ('pending', 'in_transit'),
+    'shipped': ('picked_up', 'in_transit'),
+    'delivered': ('delivered', 'completed'),
+}
+
+# createdBy for orders that don't record who took them
+CONVERTER_USER = 'convert_orders'
+
+def sale_id_for(order_id):
+    return f"order-{order_id}"
+
+def skip_reason(order):
+    """Why an order is not converted, or None"""
+    if order.get('saleId') or order.get('convertedSaleId'):
+        return 'already converted'
+    status = order.get('status', 'pending')
+    if status not in SALE_STATES:
+        return status if status in ('cancelled', 'completed') else f"unknown status '{status}'"
+    if not order.get('items'):
+        return 'no items'
+    return None
+
+def order_total(order):
+    if order.get('total') is not None:
+        return order['total']
+    return sum(item.get('subtotal', item.get('quantity', 0) * item.get('unitPrice', 0))
+               for item in order['items'])
+
+def sale_doc_for(order_id, order):
+    """The sales document for an order (same fields as _convertToSale)"""
+    delivery_status, stock_status = SALE_STATES[order.get('status', 'pending')]
+    delivered = delivery_status == 'delivered'
+    total = order_total(order)
+    return {
+        'saleType': 'delivery',
+        'deliveryMethod': order.get('deliveryMethod'),
+        'paymentMethod': 'efectivo',  # Orders are cash on delivery
+        'items': order['items'],
+        'subtotal': total,
+        'discount': 0.0,
+        'total': total,
+        'nit': 'CF',
+        'customerName': order.get('customerName'),
+        'customerPhone': order.get('customerPhone', order.get('phone')),
+        'deliveryAddress': order.get('deliveryAddress', order.get('address')),
+        'deductFrom': 'store',
+        'stockStatus': stock_status,
+        'paymentVerified': delivered,  # Cash is only in hand once delivered
+        'status': 'approved',
+        'depositId': None,
+        'deliveryStatus': delivery_status,
+        'createdBy': order.get('createdBy') or CONVERTER_USER,
+        'createdAt': order.get('createdAt') or firestore.SERVER_TIMESTAMP,
+        'convertedAt': firestore.SERVER_TIMESTAMP,
+        'updatedAt': firestore.SERVER_TIMESTAMP,  # createdAt is the order's; incremental checks look here
+        'orderId': order_id,
+    }
+
+def order_writes(db, order_id, order):
+    """Every write converting one order; they must be committed together"""
+    sale_id = sale_id_for(order_id)
+    sale = sale_doc_for(order_id, order)
+    writes = [set_doc(db.collection('sales').document(sale_id), sale)]
+    link = {
+        'saleId': sale_id,
+        'convertedAt': firestore.SERVER_TIMESTAMP,
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }
+    if sale['deliveryStatus'] == 'delivered':
+        for item in order['items']:
+            writes.append(update(db.collection('products').document(item['barcode']), {
+                'stockStore': firestore.Increment(-item['quantity']),
+                'updatedAt': firestore.SERVER_TIMESTAMP,
+            }))
+        writes.extend(add_sale_writes(db, cash_source(sale), sale_id, sale['total']))
+        link['status'] = 'completed'
+        link['completedAt'] = firestore.SERVER_TIMESTAMP
+    writes.append(update(db.collection('orders').document(order_id), link))
+    return writes
+
+def existing_products(db, barcodes):
+    """The subset of `barcodes` that have a product document"""
+    refs = [db.collection('products').document(barcode) for barcode in sorted(barcodes)]
+    found = set()
+    for i in range(0, len(refs), GET_ALL_CHUNK):
+        for snapshot in db.get_all(refs[i:i + GET_ALL_CHUNK], field_paths=['barcode']):
+            if snapshot.exists:
+                found.add(snapshot.id)
+    return found
+
+def convert_orders(args):
+    db = get_db(args.key)
+    mode = 'DRY RUN' if args.dry_run else 'LIVE'
+    print(f"📦 Converting legacy orders to sales [{mode}]\n")
+
+    skipped = Counter()
+    converted = Counter()   # order status -> orders
+    problems = []           # (order id, problem)
+    batch = []
+    scanned = 0
+
+    executor = WriteExecutor(db)
+    try:
+        for page in iter_pages(db.collection('orders'), args.page_size):
+            scanned += len(page)
+            todo = []
+            for snapshot in page:
+                order = snapshot.to_dict()
+                reason = skip_reason(order)
+                if reason:
+                    skipped[reason] += 1
+                else:
+                    todo.append((snapshot.id, order))
+
+            # Stock is decremented with update(), which fails on a missing product
+            needed = {item['barcode'] for _, order in todo if order.get('status') == 'delivered' for item in order['items']}
+            found = existing_products(db, needed) if needed else set()
+
+            for order_id, order in todo:
+                missing = sorted({item['barcode'] for item in order['items']} - found) if order.get('status') == 'delivered' else []
+                if missing:
+                    problems.append((order_id, f"products not found: {', '.join(missing)}"))
+                    continue
+                writes = order_writes(db, order_id, order)
+                if len(writes) > MAX_BATCH_WRITES:
+                    problems.append((order_id, f"{len(writes)} writes, too many for one batch"))
+                    continue
+                if args.dry_run:
+                    if sum(converted.values()) < args.show:
+                        sale = writes[0].data
+                        print(f"   {order_id} ({order.get('status', 'pending')}) → sales/{writes[0].ref.id}: "
+                              f"{sale['deliveryStatus']}/{sale['stockStatus']}, Q{sale['total']:,.2f}, {len(writes)} writes")
+                else:
+                    # Whole orders per batch, so each order's writes commit together
+                    if len(batch) + len(writes) > MAX_BATCH_WRITES:
+                        executor.submit(batch)
+                        batch = []
+                    batch.extend(writes)
+                converted[order.get('status', 'pending')] += 1
+            print(f"   ... {scanned:,} orders scanned, {sum(converted.values()):,} to convert")
+        if batch:
+            executor.submit(batch)
+    finally:
+        executor.close()
+
+    failed_orders = sum(1 for writes, _ in executor.failures for write in writes
+                        if write.ref.parent.id == 'orders')
+
+    print(f"\n{'='*60}")
+    print(f"📋 Orders scanned: {scanned:,}")
+    print(f"📋 To convert: {sum(converted.values()):,}"
+          + (f" ({', '.join(f'{status} {n:,}' for status, n in sorted(converted.items()))})" if converted else ''))
+    if not args.dry_run:
+        print(f"✅ Converted: {sum(converted.values()) - failed_orders:,}")
+    for reason, n in skipped.most_common():
+        print(f"⏭️  Skipped ({reason}): {n:,}")
+    if problems:
+        print(f"❌ Not convertible: {len(problems):,}")
+        for order_id, problem in problems[:args.show]:
+            print(f"   {order_id}: {problem}")
+    if executor.retries:
+        print(f"🔁 Batch retries: {executor.retries}")
+    print_failures(executor.failures)
+    print(f"{'='*60}")
+    if executor.failures:
+        # A timed-out batch may have landed; the orders' saleId says which did
+        print("Run again to convert the failed orders; the ones that did commit have a saleId and are skipped")
+    return not (problems or executor.failures)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the legacy orders collection into sales')
+    parser.add_argument('--dry-run', action='store_true', help="Show the sales but don't write")
+    parser.add_argument('--page-size', type=int, default=500, help='Orders read per page (default 500)')
+    parser.add_argument('--show', type=int, default=20, help='Orders/problems to print (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    try:
+        ok = convert_orders(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user (run again to convert the rest)")
+        ok = False
+    if not ok:
+        sys.exit(1)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Compare two Firestore dumps document by document
+Usage:
+  python3 diff_snapshots.py backups/before backups/after
+  python3 diff_snapshots.py backups/staging backups/prod --ignore updatedAt --report diff.jsonl
+
+Takes two dumps written by backup_firestore.py (directories, or two single
+.jsonl.gz files) and joins documents by path. Reports added, removed and
+changed documents, with the changed fields for each. Exits with status 1
+when there are differences, so it can gate a migration.
+
+Memory stays bounded with a partitioned hash join: both sides are split by
+hash(path) into temp partitions, and only one partition of the "before" side
+is held in memory at a time. Unchanged documents are detected by comparing
+raw lines (dumps are key-sorted) without parsing them.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+import tempfile
+import zlib
+from firestore_json import MANIFEST
+
+# Rough compressed -> in-memory expansion, used to pick the partition count
+EXPANSION_FACTOR = 10
+
+def list_dump_files(location):
+    """{filename: path} for a dump directory, or a single dump file"""
+    if os.path.isfile(location):
+        return {os.path.basename(location): location}
+    manifest_path = os.path.join(location, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            names = list(json.load(f)['files'])
+    else:
+        names = sorted(name for name in os.listdir(location) if name.endswith('.jsonl.gz'))
+    return {name: os.path.join(location, name) for name in names}
+
+def record_path(line):
+    """Document path from a dump line; 'path' is the last key since keys are sorted"""
+    index = line.rfind('"path":')
+    return json.loads(line[index + 7:line.rindex('}')])
+
+def partition_of(path, partitions):
+    return zlib.crc32(path.encode('utf-8')) % partitions
+
+def split_into_partitions(dump_path, out_dir, partitions):
+    """Write each line of a dump into out_dir/<n>.jsonl by hash(path)"""
+    os.makedirs(out_dir, exist_ok=True)
+    files = [open(os.path.join(out_dir, f'{n}.jsonl'), 'w', encoding='utf-8') for n in range(partitions)]
+    try:
+        if dump_path is not None:
+            with gzip.open(dump_path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        files[partition_of(record_path(line), partitions)].write(line)
+    finally:
+        for partition_file in files:
+            partition_file.close()
+
+def flatten(data, prefix=''):
+    """Nested maps -> {'a.b.c': value}; lists are compared as whole values"""
+    flat = {}
+    for key, value in data.items():
+        field = f'{prefix}{key}'
+        if isinstance(value, dict) and value and '__type__' not in value:
+            flat.update(flatten(value, f'{field}.'))
+        else:
+            flat[field] = value
+    return flat
+
+def is_ignored(field, ignore):
+    return any(field == name or field.startswith(f'{name}.') for name in ignore)
+
+def field_changes(before, after, ignore):
+    """{field: [old, new]} for every differing (non-ignored) field; None = missing"""
+    old_fields = flatten(before)
+    new_fields = flatten(after)
+    changes = {}
+    for field in old_fields.keys() | new_fields.keys():
+        if is_ignored(field, ignore):
+            continue
+        old = old_fields.get(field)
+        new = new_fields.get(field)
+        if old != new or (field in old_fields) != (field in new_fields):
+            changes[field] = [old, new]
+    return dict(sorted(changes.items()))
+
+def diff_partition(before_file, after_file, ignore):
+    """Yield diff entries for one partition pair"""
+    with open(before_file, encoding='utf-8') as f:
+        before = {record_path(line): line for line in f}
+
+    with open(after_file, encoding='utf-8') as f:
+        for line in f:
+            path = record_path(line)
+            old_line = before.pop(path, None)
+            if old_line is None:
+                yield {'change': 'added', 'path': path}
+            elif old_line != line:
+                changes = field_changes(json.loads(old_line)['data'], json.loads(line)['data'], ignore)
+                if changes:
+                    yield {'change': 'changed', 'path': path, 'fields': changes}
+
+    for path in before:
+        yield {'change': 'removed', 'path': path}
+
+def pick_partitions(before_path, memory_mb):
+    if before_path is None:
+        return 1
+    estimated = os.path.getsize(before_path) * EXPANSION_FACTOR
+    return max(1, -(-estimated // (memory_mb * 1024 * 1024)))
+
+def diff_dumps(before_dir, after_dir, ignore, memory_mb, report_file=None, show=20):
+    before_files = list_dump_files(before_dir)
+    after_files = list_dump_files(after_dir)
+    # Single-file mode compares the two files whatever their names
+    if os.path.isfile(before_dir) and os.path.isfile(after_dir):
+        after_files = {name: after_files[other] for name, other in zip(before_files, after_files)}
+
+    totals = {'added': 0, 'removed': 0, 'changed': 0}
+    shown = 0
+    work_dir = tempfile.mkdtemp(prefix='xepi_diff_')
+    try:
+        for name in sorted(before_files.keys() | after_files.keys()):
+            before_path = before_files.get(name)
+            after_path = after_files.get(name)
+            partitions = pick_partitions(before_path, memory_mb)
+
+            before_dir_parts = os.path.join(work_dir, name, 'before')
+            after_dir_parts = os.path.join(work_dir, name, 'after')
+            split_into_partitions(before_path, before_dir_parts, partitions)
+            split_into_partitions(after_path, after_dir_parts, partitions)
+
+            counts = {'added': 0, 'removed': 0, 'changed': 0}
+            for n in range(partitions):
+                for entry in diff_partition(os.path.join(before_dir_parts, f'{n}.jsonl'),
+                                            os.path.join(after_dir_parts, f'{n}.jsonl'), ignore):
+                    counts[entry['change']] += 1
+                    if report_file is not None:
+                        report_file.write(json.dumps(entry, ensure_ascii=False, default=str) + '\n')
+                    if shown < show:
+                        shown += 1
+                        print_entry(entry)
+            shutil.rmtree(os.path.join(work_dir, name))
+
+            if any(counts.values()):
+                print(f"   {name}: +{counts['added']:,} -{counts['removed']:,} ~{counts['changed']:,}")
+            for key in totals:
+                totals[key] += counts[key]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return totals
+
+def print_entry(entry):
+    symbol = {'added': '+', 'removed': '-', 'changed': '~'}[entry['change']]
+    print(f"   {symbol} {entry['path']}")
+    for field, (old, new) in entry.get('fields', {}).items():
+        print(f"       {field}: {json.dumps(old, ensure_ascii=False)} → {json.dumps(new, ensure_ascii=False)}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Diff two Firestore dumps by document path')
+    parser.add_argument('before', help='Dump directory (or .jsonl.gz file) before the change')
+    parser.add_argument('after', help='Dump directory (or .jsonl.gz file) after the change')
+    parser.add_argument('--ignore', action='append', default=[], help='Field to ignore, e.g. updatedAt (repeatable)')
+    parser.add_argument('--report', help='Write every difference as JSON Lines to this file')
+    parser.add_argument('--show', type=int, default=20, help='Differences to print (default 20)')
+    parser.add_argument('--memory-mb', type=int, default=256, help='Approx. memory budget per partition (default 256)')
+    args = parser.parse_args()
+
+    print(f"🔍 Comparing {args.before} → {args.after}\n")
+    report_file = open(args.report, 'w', encoding='utf-8') if args.report else None
+    try:
+        totals = diff_dumps(args.before, args.after, args.ignore, args.memory_mb, report_file, args.show)
+    finally:
+        if report_file is not None:
+            report_file.close()
+
+    print(f"\n{'='*60}")
+    print(f"➕ Added: {totals['added']:,}")
+    print(f"➖ Removed: {totals['removed']:,}")
+    print(f"✏️  Changed: {totals['changed']:,}")
+    print(f"{'='*60}")
+
+    if any(totals.values()):
+        sys.exit(1)
+    print("✅ Dumps are identical")
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Bulk-edit products from a spreadsheet keyed by barcode
+Usage:
+  python3 edit_products.py data/cambios.xlsx              # preview the diff, write nothing
+  python3 edit_products.py data/cambios.xlsx --apply
+
+Every sheet is read. CODIGO_BARRA identifies the product; the other columns
+are the fields to change (Spanish headers as in productos.xlsx, or the
+field names):
+
+  NOMBRE / name             text
+  PRECIO / priceOverride    number; '-' clears the override (subcategory price)
+  COSTO / costPrice         number; '-' clears it
+  TEMAS / temas             comma-separated list; '-' clears it
+
+An empty cell leaves the field as it is. The products are read with chunked
+get_all (only the edited fields), compared field by field, and only
+products with a real difference get one update() with just the changed
+fields, as product_detail_screen.dart does. Temas counts (temas/{tema}
+productCount) are adjusted with one Increment per tema.
+"""
+
+import argparse
+import math
+import sys
+import pandas as pd
+from collections import Counter
+from firebase_admin import firestore
+from firebase_app import get_db
+from write_executor import WriteExecutor, print_failures, set_doc, update
+
+# Header -> product field
+COLUMNS = {
+    'NOMBRE': 'name', 'name': 'name',
+    'PRECIO': 'priceOverride', 'priceOverride': 'priceOverride',
+    'COSTO': 'costPrice', 'costPrice': 'costPrice',
+    'TEMAS': 'temas', 'temas': 'temas',
+}
+
+NUMBER_FIELDS = {'priceOverride', 'costPrice'}
+
+# Cell value that clears a field
+CLEAR = '-'
+
+# IDs per get_all call
+GET_ALL_CHUNK = 300
+
+def normalize_barcode(value):
+    """Excel reads numeric barcodes as floats: 7401234.0 -> '7401234'"""
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    barcode = str(value).strip()
+    return barcode or None
+
+def parse_cell(field, value):
+    """
+    New value of `field` from a cell: (value,) to set, () to leave unchanged.
+    Raises ValueError for a cell that can't be used.
+    """
+    if pd.isna(value) or (isinstance(value, str) and not value.strip()):
+        return ()
+    if isinstance(value, str) and value.strip() == CLEAR:
+        return ([],) if field == 'temas' else (None,)
+    if field in NUMBER_FIELDS:
+        number = float(value)
+        if not math.isfinite(number) or number < 0:
+            raise ValueError(f'{value!r} is not a price')
+        return (round(number, 2),)
+    if field == 'temas':
+        temas = [tema.strip() for tema in str(value).replace(';', ',').split(',')]
+        return (list(dict.fromkeys(tema for tema in temas if tema)),)
+    return (str(value).strip(),)
+
+def read_edits(path):
+    """({barcode: {field: new value}}, problems)"""
+    edits = {}
+    rows = {}
+    problems = []
+    for sheet, df in pd.read_excel(path, sheet_name=None, dtype=object).items():
+        fields = {col: COLUMNS[col] for col in df.columns if col in COLUMNS}
+        if 'CODIGO_BARRA' not in df.columns or not fields:
+            print(f"⏭️  Sheet {sheet}: needs CODIGO_BARRA and one of {', '.join(COLUMNS)}, skipped")
+            continue
+        for index, row in df.iterrows():
+            where = f"sheet {sheet} row {index + 2}"
+            barcode = normalize_barcode(row['CODIGO_BARRA'])
+            if barcode is None:
+                if row.drop('CODIGO_BARRA').notna().any():
+                    problems.append(f"{where}: no barcode")
+                continue
+            if barcode in rows:
+                problems.append(f"{where}: {barcode} already edited at {rows[barcode]}")
+                continue
+            rows[barcode] = where
+            changes = {}
+            for col, field in fields.items():
+                try:
+                    parsed = parse_cell(field, row[col])
+                except ValueError as e:
+                    problems.append(f"{where}: {col} {e}")
+                    continue
+                if parsed:
+                    changes[field] = parsed[0]
+            if changes:
+                edits[barcode] = changes
+    return edits, problems
+
+def fetch_current(db, barcodes, fields):
+    """{barcode: dict of `fields`} for the products that exist"""
+    current = {}
+    refs = [db.collection('products').document(barcode) for barcode in barcodes]
+    for i in range(0, len(refs), GET_ALL_CHUNK):
+        for snapshot in db.get_all(refs[i:i + GET_ALL_CHUNK], field_paths=fields):
+            if snapshot.exists:
+                current[snapshot.id] = snapshot.to_dict()
+    return current
+
+def same(old, new):
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)):
+        return math.isclose(old, new, abs_tol=0.005)
+    return old == new
+
+def diff(edits, current):
+    """{barcode: {field: (old, new)}} of the edits that change something"""
+    changes = {}
+    for barcode, fields in edits.items():
+        product = current[barcode]
+        changed = {}
+        for field, new in fields.items():
+            old = product.get(field)
+            if not same(old or [] if field == 'temas' else old, new):
+                changed[field] = (old, new)
+        if changed:
+            changes[barcode] = changed
+    return changes
+
+def tema_deltas(changes):
+    """{tema: productCount delta} over every temas change"""
+    deltas = Counter()
+    for fields in changes.values():
+        if 'temas' in fields:
+            old, new = fields['temas']
+            deltas.update(set(new) - set(old or []))
+            deltas.subtract(set(old or []) - set(new))
+    return {tema: delta for tema, delta in deltas.items() if delta}
+
+def tema_writes(db, deltas):
+    """One write per tema; temas/ docs that don't exist yet are created"""
+    refs = [db.collection('temas').document(tema) for tema in deltas]
+    existing = set()
+    for i in range(0, len(refs), GET_ALL_CHUNK):
+        existing.update(s.id for s in db.get_all(refs[i:i + GET_ALL_CHUNK], field_paths=['name']) if s.exists)
+    writes = []
+    for ref, (tema, delta) in zip(refs, deltas.items()):
+        data = {'name': tema, 'productCount': firestore.Increment(delta), 'lastUsed': firestore.SERVER_TIMESTAMP}
+        if tema not in existing:
+            data['createdAt'] = firestore.SERVER_TIMESTAMP
+        writes.append(set_doc(ref, data, merge=True))
+    return writes
+
+def print_preview(changes, limit):
+    per_field = Counter(field for fields in changes.values() for field in fields)
+    print(f"\n📝 {len(changes):,} products change ({', '.join(f'{field}: {n:,}' for field, n in per_field.items()) or 'nothing'})")
+    for barcode, fields in list(changes.items())[:limit]:
+        print(f"   {barcode}")
+        for field, (old, new) in fields.items():
+            print(f"      {field}: {old!r} → {new!r}")
+    if len(changes) > limit:
+        print(f"   ... and {len(changes) - limit:,} more")
+
+def edit_products(args):
+    print(f"📊 Reading {args.workbook}...")
+    edits, problems = read_edits(args.workbook)
+    if problems:
+        print(f"❌ Rows that cannot be used: {len(problems):,}")
+        for problem in problems[:10]:
+            print(f"   - {problem}")
+        print("\nFix the sheet and run again; nothing was written")
+        return False
+    fields = sorted({field for changes in edits.values() for field in changes})
+    print(f"✅ {len(edits):,} products with edits to {', '.join(fields) or 'nothing'}")
+    if not edits:
+        return True
+
+    db = get_db(args.key)
+    current = fetch_current(db, list(edits), fields)
+    missing = [barcode for barcode in edits if barcode not in current]
+    if missing:
+        print(f"❌ Barcodes not in products/: {len(missing):,} ({', '.join(missing[:10])}{'...' if len(missing) > 10 else ''})")
+        print("\nNothing was written")
+        return False
+
+    changes = diff(edits, current)
+    print_preview(changes, args.show)
+    unchanged = len(edits) - len(changes)
+    if unchanged:
+        print(f"   ({unchanged:,} rows already match)")
+    if not args.apply:
+        print("\n[PREVIEW] Nothing written; run again with --apply")
+        return True
+    if not changes:
+        return True
+
+    writes = [
+        update(db.collection('products').document(barcode), {
+            **{field: new for field, (_, new) in fields.items()},
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        })
+        for barcode, fields in changes.items()
+    ]
+    deltas = tema_deltas(changes)
+    with WriteExecutor(db) as executor:
+        executor.submit(writes)
+        if deltas:
+            executor.submit(tema_writes(db, deltas))
+
+    failed = sum(1 for batch, _ in executor.failures for write in batch if write.ref.parent.id == 'products')
+
+    print(f"\n{'='*60}")
+    print(f"✅ Products updated: {len(writes) - failed:,}")
+    if deltas:
+        print(f"🏷️  Temas counts adjusted: {len(deltas)}")
+    print_failures(executor.failures)
+    print(f"{'='*60}")
+    if {'priceOverride', 'name'} & {field for fields in changes.values() for field in fields}:
+        print("Next: materialize_prices.py and build_catalog.py pick up the edited products")
+    return not executor.failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Bulk-edit product fields from a spreadsheet keyed by barcode')
+    parser.add_argument('workbook', help='Excel file with CODIGO_BARRA and the columns to change')
+    parser.add_argument('--apply', action='store_true', help='Write the changes (default: preview only)')
+    parser.add_argument('--show', type=int, default=20, help='Products to show in the preview (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    try:
+        ok = edit_products(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        ok = False
+    if not ok:
+        sys.exit(1)
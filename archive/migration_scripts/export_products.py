@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Export the product catalog to Excel in the productos.xlsx layout
+Usage:
+  python3 export_products.py                                  # productos_export.xlsx
+  python3 export_products.py --out catalogo.xlsx --only-active
+  python3 export_products.py --dump backups/2025-06-01         # from a backup_firestore.py export
+
+One sheet per sheetNumber (as import_products.py reads them), with the
+import columns plus effective price, bulk tiers and one stock column per
+location (locations/*.stockField). PRECIO and COSTO are priceOverride and
+costPrice, so an edited export can go straight back into edit_products.py.
+
+Products are streamed page by page (projected to the exported fields) and
+each row is appended to an openpyxl write_only workbook, which flushes
+rows to disk as it goes: memory stays flat however big the catalog is.
+Subcategory prices and locations are read once up front.
+"""
+
+import argparse
+import time
+from openpyxl import Workbook
+from backup_firestore import iter_dump_docs
+from build_catalog import load_subcategories
+from firebase_app import get_db
+from firestore_scan import iter_docs
+from pricing import base_price, is_bulk_eligible, price_tiers
+
+PRODUCT_FIELDS = [
+    'warehouseCode', 'categoryCode', 'primaryCategory', 'subcategory', 'name', 'size', 'temas',
+    'priceOverride', 'costPrice', 'isActive', 'sheetNumber', 'stockWarehouse', 'stockStore',
+]
+
+# Used when the locations collection is empty (see setup_locations.py)
+DEFAULT_LOCATIONS = [('Bodega', 'stockWarehouse'), ('Tienda', 'stockStore')]
+
+# Sheet for products imported without a sheetNumber
+NO_SHEET = 'Sin hoja'
+
+PAGE_SIZE = 1000
+
+def load_locations(docs):
+    """[(name, stockField)] of the active locations by displayOrder, from (id, dict) pairs"""
+    locations = sorted(
+        (data for _, data in docs if data.get('isActive', True) and data.get('stockField')),
+        key=lambda data: data.get('displayOrder', 0),
+    )
+    return [(data.get('name') or data['stockField'], data['stockField']) for data in locations] or DEFAULT_LOCATIONS
+
+def header(locations):
+    return [
+        'CODIGO_BARRA', 'ID_BODEGA', 'ID_CATEGORIA', 'Categoría', 'Subcategoría', 'NOMBRE', 'MEDIDA', 'Tema',
+        'PRECIO', 'COSTO', 'PRECIO_EFECTIVO', 'PRECIO_MAYOREO',
+        *(f'STOCK {name}' for name, _ in locations),
+        'ACTIVO',
+    ]
+
+def tiers_text(code, subcategory):
+    """'2+: Q25.00, 5+: Q20.00' for bulk-eligible subcategories"""
+    bulk_pricing = (subcategory or {}).get('bulkPricing')
+    if not is_bulk_eligible(code, bulk_pricing):
+        return None
+    return ', '.join(f"{tier['minQty']}+: Q{tier['unitPrice']:.2f}" for tier in price_tiers(bulk_pricing)) or None
+
+def product_row(barcode, product, subcategories, locations):
+    code = product.get('categoryCode')
+    subcategory = subcategories.get(code)
+    return [
+        barcode,
+        product.get('warehouseCode'),
+        code,
+        product.get('primaryCategory'),
+        product.get('subcategory'),
+        product.get('name'),
+        product.get('size'),
+        ', '.join(product.get('temas') or []) or None,
+        product.get('priceOverride'),
+        product.get('costPrice'),
+        base_price(product, subcategory),
+        tiers_text(code, subcategory),
+        *(product.get(field) or 0 for _, field in locations),
+        'SI' if product.get('isActive', True) else 'NO',
+    ]
+
+def sheet_key(title):
+    return (0, int(title)) if title.isdigit() else (1, title)
+
+def export_products(products, subcategories, locations, out_path, only_active=False, progress_every=10000):
+    """
+    Write (barcode, dict) pairs to out_path, one sheet per sheetNumber
+    Returns: {sheet title: rows}
+    """
+    workbook = Workbook(write_only=True)
+    sheets = {}
+    counts = {}
+    columns = header(locations)
+    written = 0
+    started = time.monotonic()
+
+    for barcode, product in products:
+        if only_active and not product.get('isActive', True):
+            continue
+        sheet_number = product.get('sheetNumber')
+        title = str(sheet_number) if sheet_number is not None else NO_SHEET
+        sheet = sheets.get(title)
+        if sheet is None:
+            sheet = sheets[title] = workbook.create_sheet(title)
+            sheet.append(columns)
+            counts[title] = 0
+        sheet.append(product_row(barcode, product, subcategories, locations))
+        counts[title] += 1
+        written += 1
+        if written % progress_every == 0:
+            print(f"   📦 {written:,} products ({written / (time.monotonic() - started):,.0f}/s)")
+
+    # Sheets were created in the order products came in; list them 1, 2, ... as in productos.xlsx
+    for position, title in enumerate(sorted(sheets, key=sheet_key)):
+        workbook.move_sheet(title, position - workbook.index(sheets[title]))
+    if not sheets:
+        workbook.create_sheet(NO_SHEET).append(columns)
+    workbook.save(out_path)
+    return counts
+
+def export_from_firestore(db, out_path, only_active):
+    subcategories = load_subcategories(db)
+    locations = load_locations((s.id, s.to_dict()) for s in db.collection('locations').stream())
+    print(f"🏷️  {len(subcategories)} subcategories, locations: {', '.join(name for name, _ in locations)}")
+    products = ((s.id, s.to_dict()) for s in iter_docs(db.collection('products').select(PRODUCT_FIELDS), PAGE_SIZE))
+    return export_products(products, subcategories, locations, out_path, only_active)
+
+def export_from_dump(directory, out_path, only_active):
+    subcategories = {data.get('code') or code: data for code, data in iter_dump_docs(directory, 'subcategories', group=True)}
+    try:
+        locations = load_locations(iter_dump_docs(directory, 'locations'))
+    except FileNotFoundError:
+        locations = DEFAULT_LOCATIONS
+    print(f"🏷️  {len(subcategories)} subcategories, locations: {', '.join(name for name, _ in locations)}")
+    return export_products(iter_dump_docs(directory, 'products'), subcategories, locations, out_path, only_active)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export products to Excel in the productos.xlsx layout')
+    parser.add_argument('--out', default='productos_export.xlsx', help='Output file (default productos_export.xlsx)')
+    parser.add_argument('--only-active', action='store_true', help='Skip inactive products')
+    parser.add_argument('--dump', help='Read a backup_firestore.py export directory instead of Firestore')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    print(f"📤 Exporting products from {args.dump or 'Firestore'} to {args.out}\n")
+    started = time.monotonic()
+    try:
+        if args.dump:
+            counts = export_from_dump(args.dump, args.out, args.only_active)
+        else:
+            counts = export_from_firestore(get_db(args.key), args.out, args.only_active)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+    else:
+        print(f"\n{'='*60}")
+        print(f"✅ {sum(counts.values()):,} products in {len(counts)} sheets ({time.monotonic() - started:.1f}s)")
+        for title in sorted(counts, key=sheet_key):
+            print(f"   Sheet {title:>7}: {counts[title]:,}")
+        print(f"{'='*60}")
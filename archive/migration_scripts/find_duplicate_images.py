@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Find duplicate and near-duplicate product images
+Usage:
+  python3 find_duplicate_images.py                       # data/images only
+  python3 find_duplicate_images.py --remote              # + images already used by products
+  python3 find_duplicate_images.py --remote --report dedup.json --max-distance 6
+
+Suppliers reuse the same photo under different barcodes and the same shot
+often arrives as _1/_2 variants. Every image gets a dHash and a pHash (see
+image_hashes.py, cached in .image_hashes.json); near-duplicates are found
+with a BK-tree radius query per image instead of comparing all pairs, and
+grouped into clusters. Byte-identical files always land in one cluster.
+
+To reuse existing uploads instead of uploading copies, run
+upload_images.py --link-existing.
+"""
+
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from firebase_app import get_bucket, get_db
+from gc_product_images import list_product_blobs, referenced_images
+from image_hashes import CACHE_PATH, BKTree, HashCache, hamming, hash_local_files, hash_remote_images
+
+IMAGES_FOLDER = 'data/images'
+
+# Pairs of images at most this many bits apart (in both hashes) are duplicates
+DEFAULT_MAX_DISTANCE = 8
+
+LOCAL_IMAGE_RE = re.compile(r'^(\d{13})(?:_\d+)?\.(jpe?g|png|webp|gif)$', re.IGNORECASE)
+
+def local_images(folder):
+    """[(path, barcode)] for image files named like upload_images.py expects"""
+    images = []
+    for filename in sorted(os.listdir(folder)):
+        match = LOCAL_IMAGE_RE.match(filename)
+        if match:
+            images.append((os.path.join(folder, filename), match.group(1)))
+    return images
+
+def load_local_images(folder, cache, workers=None):
+    """Hashed entries for data/images: {'source', 'barcode', 'url', 'digest', 'hashes'}"""
+    images = local_images(folder)
+    hashed = hash_local_files([path for path, _ in images], cache, workers)
+    return [
+        {'source': path, 'barcode': barcode, 'url': None, 'digest': hashed[path][0], 'hashes': hashed[path][1]}
+        for path, barcode in images
+    ]
+
+def load_uploaded_images(db, bucket, cache, workers=None, list_workers=8):
+    """Hashed entries for every image a product references, with its stored URL"""
+    with ThreadPoolExecutor(max_workers=list_workers) as executor:
+        referenced_future = executor.submit(referenced_images, db, bucket.name)
+        blobs = list_product_blobs(bucket, executor, list_workers * 4)
+        referenced, _ = referenced_future.result()
+
+    blobs = [blob for blob in blobs if blob.name in referenced]
+    hashed = hash_remote_images(blobs, cache, workers)
+    return [
+        {'source': blob.name, 'barcode': blob.name.split('/')[1], 'url': referenced[blob.name],
+         'digest': hashed[blob.name][0], 'hashes': hashed[blob.name][1]}
+        for blob in blobs
+    ]
+
+def find_clusters(entries, max_distance):
+    """
+    Group entries into duplicate clusters (lists of entries, largest first)
+
+    Identical digests are merged first; each distinct image then queries a
+    BK-tree on phash and is joined (union-find) to every earlier image whose
+    phash and dhash are both within max_distance.
+    """
+    by_digest = {}
+    for entry in entries:
+        if entry['hashes'] is not None:
+            by_digest.setdefault(entry['digest'], []).append(entry)
+
+    parent = {digest: digest for digest in by_digest}
+
+    def find(digest):
+        while parent[digest] != digest:
+            parent[digest] = parent[parent[digest]]
+            digest = parent[digest]
+        return digest
+
+    tree = BKTree()
+    for digest, group in by_digest.items():
+        hashes = group[0]['hashes']
+        for _, other in tree.search(hashes['phash'], max_distance):
+            if hamming(hashes['dhash'], by_digest[other][0]['hashes']['dhash']) <= max_distance:
+                parent[find(digest)] = find(other)
+        tree.add(hashes['phash'], digest)
+
+    clusters = {}
+    for digest, group in by_digest.items():
+        clusters.setdefault(find(digest), []).extend(group)
+    return sorted((members for members in clusters.values() if len(members) > 1), key=len, reverse=True)
+
+def print_cluster(number, members):
+    barcodes = sorted({member['barcode'] for member in members})
+    note = f" across {len(barcodes)} barcodes" if len(barcodes) > 1 else ""
+    print(f"   #{number}: {len(members)} images{note}")
+    for member in members:
+        where = '☁️ ' if member['url'] else '📁'
+        print(f"      {where} {member['source']}")
+
+def main(args):
+    cache = HashCache(args.cache)
+    entries = []
+
+    if os.path.exists(args.images):
+        print(f"📷 Hashing {args.images}...")
+        entries.extend(load_local_images(args.images, cache, args.workers))
+    else:
+        print(f"⚠️  Images folder not found: {args.images}")
+
+    if args.remote:
+        print("☁️  Hashing images referenced by products...")
+        entries.extend(load_uploaded_images(get_db(args.key), get_bucket(args.key, args.bucket), cache, args.workers))
+
+    cache.save()
+
+    unreadable = [entry['source'] for entry in entries if entry['hashes'] is None]
+    clusters = find_clusters(entries, args.max_distance)
+
+    print(f"\n🔍 Duplicate clusters (showing {min(args.show, len(clusters))} of {len(clusters)}):")
+    for number, members in enumerate(clusters[:args.show], 1):
+        print_cluster(number, members)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump([
+                [{'source': m['source'], 'barcode': m['barcode'], 'url': m['url'], 'md5': m['digest']} for m in members]
+                for members in clusters
+            ], f, indent=2, ensure_ascii=False)
+
+    redundant = sum(len(members) - 1 for members in clusters)
+    cross_barcode = sum(1 for members in clusters if len({m['barcode'] for m in members}) > 1)
+    print(f"\n{'='*60}")
+    print(f"📷 Images hashed: {len(entries):,} ({len({e['digest'] for e in entries}):,} distinct files)")
+    print(f"🔁 Duplicate clusters: {len(clusters):,} ({cross_barcode:,} shared across barcodes)")
+    print(f"🗑️  Redundant copies: {redundant:,}")
+    if unreadable:
+        print(f"⚠️  Unreadable or undownloadable images: {len(unreadable)} (e.g. {unreadable[0]})")
+    if args.report:
+        print(f"📝 Report written to {args.report}")
+    print(f"{'='*60}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find duplicate product images with perceptual hashes')
+    parser.add_argument('--images', default=IMAGES_FOLDER, help=f'Local images folder (default {IMAGES_FOLDER})')
+    parser.add_argument('--remote', action='store_true', help='Include images already referenced by products')
+    parser.add_argument('--max-distance', type=int, default=DEFAULT_MAX_DISTANCE,
+                        help=f'Max differing bits (of 64) per hash (default {DEFAULT_MAX_DISTANCE})')
+    parser.add_argument('--workers', type=int, help='Hashing processes (default: CPU count)')
+    parser.add_argument('--cache', default=CACHE_PATH, help=f'Hash cache file (default {CACHE_PATH})')
+    parser.add_argument('--report', help='Write all clusters as JSON to this file')
+    parser.add_argument('--show', type=int, default=20, help='Clusters to print (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    parser.add_argument('--bucket', help='Bucket name (default: <projectId>.firebasestorage.app)')
+    args = parser.parse_args()
+
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
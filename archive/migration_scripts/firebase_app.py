@@ -0,0 +1,85 @@
+"""
+Shared Firebase Admin bootstrap for the migration scripts
+Usage: from firebase_app import get_db, get_async_db, get_bucket
+
+Initializes the default app once per process (reusing it if a script already
+did) and hands out the sync or async Firestore client and the Storage bucket
+on top of it. firebase_admin caches the clients per app, so every caller in
+a process shares one gRPC channel. firebase_admin itself is only imported
+on first use, so importing this module costs nothing.
+"""
+
+import os
+
+# Scripts are run both from the project root and from this folder
+SERVICE_ACCOUNT_PATHS = ['serviceAccountKey.json', '../serviceAccountKey.json']
+
+# Key file per project for --project (looked up in the same places)
+PROJECT_KEYS = {
+    'prod': 'serviceAccountKey.json',
+    'staging': 'stagingServiceAccountKey.json',
+}
+
+# Production project; tools that bulk-write test data refuse to target it by default
+PROD_PROJECT_ID = 'xepi-f5c22'
+
+# Key file used when a caller doesn't pass one (set by use_project)
+_default_key_file = 'serviceAccountKey.json'
+
+def find_service_account(filename='serviceAccountKey.json'):
+    """Return the first existing path of `filename` in the default locations"""
+    paths = [os.path.join(os.path.dirname(path), filename) for path in SERVICE_ACCOUNT_PATHS]
+    for path in paths:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f'{filename} not found in: ' + ', '.join(paths))
+
+def use_project(project):
+    """Make `project` ('prod' or 'staging') the default for get_app() in this process"""
+    global _default_key_file
+    _default_key_file = PROJECT_KEYS[project]
+
+def default_key_path():
+    """Key file get_app() uses when no key is passed (e.g. to hand to worker processes)"""
+    return find_service_account(_default_key_file)
+
+def get_app(key_path=None):
+    """
+    Return the default Firebase app, initializing it on first use
+
+    key_path: service account JSON to use instead of the default locations
+    (e.g. a staging project's key). Ignored if the app already exists.
+    """
+    import firebase_admin
+    from firebase_admin import credentials
+
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        cred = credentials.Certificate(key_path or find_service_account(_default_key_file))
+        return firebase_admin.initialize_app(cred)
+
+def get_db(key_path=None):
+    """Blocking Firestore client"""
+    from firebase_admin import firestore
+    return firestore.client(get_app(key_path))
+
+def get_emulator_db(host, project_id='demo-xepi'):
+    """Blocking client for a local Firestore emulator at host:port (no key needed)"""
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import firestore
+
+    os.environ['FIRESTORE_EMULATOR_HOST'] = host
+    return firestore.Client(project=project_id, credentials=AnonymousCredentials())
+
+def get_async_db(key_path=None):
+    """google.cloud.firestore.AsyncClient sharing the same app"""
+    from firebase_admin import firestore_async
+    return firestore_async.client(get_app(key_path))
+
+def get_bucket(key_path=None, name=None):
+    """Storage bucket (default: the project's <projectId>.firebasestorage.app)"""
+    from firebase_admin import storage
+
+    app = get_app(key_path)
+    return storage.bucket(name or f'{app.project_id}.firebasestorage.app', app=app)
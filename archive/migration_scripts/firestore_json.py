@@ -0,0 +1,74 @@
+"""
+Lossless JSON encoding for Firestore document data
+Usage: from firestore_json import encode_doc, decode_doc, dumps_record
+
+Plain JSON can't hold Firestore timestamps, references, geopoints or bytes,
+so those are written as tagged objects: {"__type__": "timestamp", "value": ...}.
+Keys are sorted so dumps of the same data are byte-identical (diffable).
+
+The Firestore types are imported on first use, so tools that only read
+dumps (diff_snapshots.py) don't load the client.
+"""
+
+import base64
+import json
+from datetime import datetime, timezone
+from functools import cache
+
+TYPE_KEY = '__type__'
+
+# Index of a backup_firestore.py dump directory
+MANIFEST = 'manifest.json'
+
+@cache
+def firestore_types():
+    """(GeoPoint, BaseDocumentReference)"""
+    from google.cloud.firestore import GeoPoint
+    from google.cloud.firestore_v1.base_document import BaseDocumentReference
+    return GeoPoint, BaseDocumentReference
+
+def encode_value(value):
+    GeoPoint, BaseDocumentReference = firestore_types()
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return {TYPE_KEY: 'timestamp', 'value': value.isoformat()}
+    if isinstance(value, BaseDocumentReference):
+        return {TYPE_KEY: 'ref', 'path': value.path}
+    if isinstance(value, GeoPoint):
+        return {TYPE_KEY: 'geopoint', 'latitude': value.latitude, 'longitude': value.longitude}
+    if isinstance(value, bytes):
+        return {TYPE_KEY: 'bytes', 'value': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    return value
+
+def decode_value(value, db=None):
+    """Inverse of encode_value; `db` is needed to rebuild document references"""
+    if isinstance(value, dict):
+        tag = value.get(TYPE_KEY)
+        if tag == 'timestamp':
+            return datetime.fromisoformat(value['value'])
+        if tag == 'ref':
+            return db.document(value['path']) if db is not None else value['path']
+        if tag == 'geopoint':
+            GeoPoint, _ = firestore_types()
+            return GeoPoint(value['latitude'], value['longitude'])
+        if tag == 'bytes':
+            return base64.b64decode(value['value'])
+        return {key: decode_value(item, db) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_value(item, db) for item in value]
+    return value
+
+def encode_doc(snapshot):
+    """{'path': ..., 'data': ...} record for a DocumentSnapshot"""
+    return {'path': snapshot.reference.path, 'data': encode_value(snapshot.to_dict())}
+
+def decode_doc(record, db=None):
+    return record['path'], decode_value(record['data'], db)
+
+def dumps_record(record):
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
@@ -0,0 +1,56 @@
+"""
+Cursor-paginated scans over Firestore queries
+Usage: from firestore_scan import iter_pages, iter_docs, partition_queries
+
+Reads a collection (or collection group) one page at a time ordered by
+document name, so memory stays at one page no matter how big the
+collection is, and a scan can resume from the last document it saw.
+partition_queries() splits a collection into key ranges that can be
+streamed in parallel.
+"""
+
+from google.cloud.firestore_v1.field_path import FieldPath
+
+DEFAULT_PAGE_SIZE = 500
+
+def iter_pages(query, page_size=DEFAULT_PAGE_SIZE, start_after=None):
+    """
+    Yield lists of DocumentSnapshots, `page_size` at a time
+
+    start_after: a DocumentSnapshot, or {'__name__': DocumentReference} when
+    resuming from a stored document path (see cursor_from_path).
+    """
+    ordered = query.order_by(FieldPath.document_id())
+    cursor = start_after
+    while True:
+        page_query = ordered.limit(page_size)
+        if cursor is not None:
+            page_query = page_query.start_after(cursor)
+        page = list(page_query.stream())
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        cursor = {'__name__': page[-1].reference}
+
+def cursor_from_path(db, path):
+    """start_after value for a document path saved by a previous run"""
+    return {'__name__': db.document(path)}
+
+def iter_docs(query, page_size=DEFAULT_PAGE_SIZE, start_after=None):
+    """Yield DocumentSnapshots from iter_pages() one by one"""
+    for page in iter_pages(query, page_size, start_after):
+        yield from page
+
+def partition_queries(db, collection_id, partitions):
+    """
+    Queries covering collection group `collection_id` in about `partitions`
+    disjoint key ranges (fewer for small collections). Group queries also
+    match subcollections with the same id; callers that only want the
+    top-level collection skip paths with more than one '/'.
+    """
+    group = db.collection_group(collection_id)
+    if partitions <= 1:
+        return [group]
+    return [partition.query() for partition in group.get_partitions(partitions)]
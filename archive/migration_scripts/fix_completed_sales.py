@@ -2,75 +2,111 @@
 """
 Fix sales that were marked as 'completed' without adding to pending cash.
 Finds delivery+efectivo sales with deliveryStatus='completed' and no depositId,
-then adds them to pending cash.
+then adds the ones not already pending to pending cash.
+
+Usage: python3 fix_completed_sales.py
+       python3 fix_completed_sales.py --incremental [--full] [--sweep-days 7]
+
+--incremental only looks at sales created or updated since the last run
+(watermark in checkState/fix_completed_sales, see watermarks.py), with a
+full sweep every --sweep-days.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import argparse
 from datetime import datetime
+from firebase_app import get_db
+from pending_cash import add_sale_writes, read_pending_cash
+from watermarks import Watermark, add_incremental_arguments, changed_docs
+from write_executor import add_write
 
-# Initialize Firebase
-cred = credentials.Certificate('../serviceAccountKey.json')
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+def fix_completed_sales(args=None):
+    db = get_db()
+    watermark = Watermark.from_args(db, 'fix_completed_sales', args) if args and args.incremental else None
 
-print("=" * 60)
-print("FIXING COMPLETED SALES WITHOUT PENDING CASH")
-print("=" * 60)
+    print("=" * 60)
+    print("FIXING COMPLETED SALES WITHOUT PENDING CASH")
+    print("=" * 60)
+    if watermark:
+        print(watermark.describe())
 
-# Find all delivery + efectivo sales with deliveryStatus='completed' and no deposit
-sales_ref = db.collection('sales')
-all_sales = sales_ref.where('saleType', '==', 'delivery').where('paymentMethod', '==', 'efectivo').get()
+    # Find all delivery + efectivo sales with deliveryStatus='completed' and no deposit
+    sales_ref = db.collection('sales')
+    if watermark and not watermark.full:
+        all_sales = [
+            sale_doc for sale_doc in changed_docs(sales_ref, watermark.since)
+            if (sale_doc.to_dict().get('saleType'), sale_doc.to_dict().get('paymentMethod')) == ('delivery', 'efectivo')
+        ]
+    else:
+        all_sales = sales_ref.where('saleType', '==', 'delivery').where('paymentMethod', '==', 'efectivo').get()
 
-fixed_count = 0
-skipped_count = 0
+    # Every pending sale per source (root saleIds + pendingSales), read once
+    pending_sale_ids = {source: set(entry['saleIds']) for source, entry in read_pending_cash(db).items()}
 
-for sale_doc in all_sales:
-    sale_data = sale_doc.to_dict()
-    sale_id = sale_doc.id
+    fixed_count = 0
+    skipped_count = 0
+
+    for sale_doc in all_sales:
+        sale_data = sale_doc.to_dict()
+        sale_id = sale_doc.id
     
-    delivery_status = sale_data.get('deliveryStatus')
-    deposit_id = sale_data.get('depositId')
+        delivery_status = sale_data.get('deliveryStatus')
+        deposit_id = sale_data.get('depositId')
     
-    # Only fix if completed/cash_received and no deposit
-    if delivery_status in ['completed', 'cash_received'] and deposit_id is None:
-        delivery_method = sale_data.get('deliveryMethod')
-        total = sale_data.get('total', 0)
+        # Only fix if completed/cash_received and no deposit
+        if delivery_status in ['completed', 'cash_received'] and deposit_id is None:
+            delivery_method = sale_data.get('deliveryMethod')
+            total = sale_data.get('total', 0)
         
-        # Determine cash source
-        if delivery_method == 'mensajero':
-            cash_source = 'mensajero'
-        elif delivery_method == 'forza':
-            cash_source = 'forza'
-        else:
-            cash_source = 'store'
+            # Determine cash source
+            if delivery_method == 'mensajero':
+                cash_source = 'mensajero'
+            elif delivery_method == 'forza':
+                cash_source = 'forza'
+            else:
+                cash_source = 'store'
         
-        print(f"Fixing sale: {sale_id[:8]}...")
-        print(f"  Type: delivery")
-        print(f"  Total: Q{total:.2f}")
-        print(f"  Adding to: pendingCash/{cash_source}")
+            if sale_id in pending_sale_ids[cash_source]:
+                skipped_count += 1
+                continue
         
-        # Add to pending cash
-        pending_cash_ref = db.collection('pendingCash').document(cash_source)
-        pending_cash_ref.set({
-            'source': cash_source,
-            'amount': firestore.firestore.Increment(total),
-            'saleIds': firestore.firestore.ArrayUnion([sale_id]),
-            'updatedAt': firestore.firestore.SERVER_TIMESTAMP
-        }, merge=True)
+            print(f"Fixing sale: {sale_id[:8]}...")
+            print(f"  Type: delivery")
+            print(f"  Total: Q{total:.2f}")
+            print(f"  Adding to: pendingCash/{cash_source}")
         
-        print(f"  ✅ Fixed!")
-        fixed_count += 1
-    else:
-        skipped_count += 1
+            # Add to pending cash (a shard plus the sale's pendingSales doc)
+            batch = db.batch()
+            for write in add_sale_writes(db, cash_source, sale_id, total):
+                add_write(batch, write)
+            batch.commit()
+            pending_sale_ids[cash_source].add(sale_id)
+        
+            print(f"  ✅ Fixed!")
+            fixed_count += 1
+        else:
+            skipped_count += 1
 
-print("\n" + "=" * 60)
-print("SUMMARY")
-print("=" * 60)
-print(f"Fixed: {fixed_count} sales")
-print(f"Skipped: {skipped_count} sales")
+    print("\n" + "=" * 60)
+    print("SUMMARY")
+    print("=" * 60)
+    print(f"Fixed: {fixed_count} sales")
+    print(f"Skipped: {skipped_count} sales")
 
-if fixed_count > 0:
-    print("\nFixed sales have been added to pending cash.")
+    if fixed_count > 0:
+        print("\nFixed sales have been added to pending cash.")
+
+    if watermark:
+        previous = watermark.summary
+        summary = {
+            'salesChecked': previous.get('salesChecked', 0) + len(all_sales),
+            'fixed': previous.get('fixed', 0) + fixed_count,
+        }
+        watermark.save(summary)
+        print(f"Since the last full sweep: {summary['salesChecked']} sales checked, {summary['fixed']} fixed")
     
-print("\n✅ Done!")
+    print("\n✅ Done!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Add completed efectivo deliveries missing from pending cash')
+    add_incremental_arguments(parser)
+    fix_completed_sales(parser.parse_args())
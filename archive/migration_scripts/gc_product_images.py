@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Delete product images in Storage that no product references anymore
+Usage:
+  python3 gc_product_images.py                 # dry run: report reclaimable bytes
+  python3 gc_product_images.py --delete        # delete the orphans
+  python3 gc_product_images.py --grace-days 30 --show 50
+
+Every upload gets a timestamped name under products/{barcode}/ and
+update_product_images() replaces the `images` array, so each re-upload
+leaves the previous blobs behind. This tool:
+- lists products/ in parallel: one delimiter pass for the barcode folders,
+  then the folders split into ranges listed concurrently (1000 per page)
+- builds the set of blob names referenced by IMAGE_URL_FIELDS (download
+  URLs, public URLs and gs:// URLs all resolve to the same blob name)
+- treats unreferenced blobs older than the grace period as orphans, so an
+  upload whose Firestore update hasn't landed yet is never touched
+- deletes orphans in parallel HTTP batches of 100
+
+Only products/{barcode}/ and products/temp_*/ folders are considered; the
+legacy products/{category}/ folders are referenced from the Realtime
+Database and are left alone.
+"""
+
+import argparse
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import unquote, urlparse
+import firebase_admin
+from google.api_core.exceptions import NotFound
+from google.cloud import storage as gcs
+from firebase_app import get_bucket, get_db
+from firestore_scan import iter_docs
+
+PREFIX = 'products/'
+
+# Folders written by upload_images.py and the app (add_product_screen uses temp_<ms> before a barcode exists)
+PRODUCT_FOLDER_RE = re.compile(r'^products/(\d+|temp_\d+)/')
+
+# collection -> fields holding image URLs (a string, or lists/maps of strings).
+# Add new image fields here (thumbnails, variants...) or their blobs will be collected.
+IMAGE_URL_FIELDS = {
+    'products': ['images', 'primaryImageUrl'],
+}
+
+# Max calls in one Storage JSON batch request
+BATCH_DELETE_SIZE = 100
+
+def iter_urls(value):
+    """Strings found in a field value, descending into lists and maps"""
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, list):
+        for item in value:
+            yield from iter_urls(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_urls(item)
+
+def blob_name_from_url(url, bucket_name):
+    """
+    Blob name for a Storage URL in `bucket_name`, or None
+
+    - https://firebasestorage.googleapis.com/v0/b/{bucket}/o/{quoted name}?alt=media&token=...
+    - https://storage.googleapis.com/{bucket}/{name}  (blob.public_url)
+    - https://{bucket}.storage.googleapis.com/{name}
+    - gs://{bucket}/{name}
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'gs':
+        return parsed.path.lstrip('/') if parsed.netloc == bucket_name else None
+    if parsed.netloc == 'firebasestorage.googleapis.com':
+        parts = parsed.path.split('/', 5)
+        if len(parts) == 6 and parts[1:3] == ['v0', 'b'] and parts[3] == bucket_name and parts[4] == 'o':
+            return unquote(parts[5])
+        return None
+    if parsed.netloc == 'storage.googleapis.com':
+        parts = parsed.path.split('/', 2)
+        if len(parts) == 3 and parts[1] == bucket_name:
+            return unquote(parts[2])
+        return None
+    if parsed.netloc == f'{bucket_name}.storage.googleapis.com':
+        return unquote(parsed.path.lstrip('/'))
+    return None
+
+def referenced_images(db, bucket_name, page_size=1000):
+    """({blob name: URL as stored} for every referenced image, number of URLs pointing elsewhere)"""
+    images = {}
+    foreign = 0
+    for collection, fields in IMAGE_URL_FIELDS.items():
+        for snapshot in iter_docs(db.collection(collection).select(fields), page_size):
+            data = snapshot.to_dict()
+            for field in fields:
+                for url in iter_urls(data.get(field)):
+                    name = blob_name_from_url(url, bucket_name)
+                    if name:
+                        images.setdefault(name, url)
+                    else:
+                        foreign += 1
+    return images, foreign
+
+def list_product_folders(bucket):
+    """Sorted products/{barcode}/ prefixes (one delimiter listing, prefixes only)"""
+    iterator = bucket.client.list_blobs(bucket, prefix=PREFIX, delimiter='/', fields='prefixes,nextPageToken')
+    folders = []
+    for page in iterator.pages:
+        folders.extend(folder for folder in page.prefixes if PRODUCT_FOLDER_RE.match(folder))
+    return sorted(folders)
+
+def folder_ranges(folders, shards):
+    """Split sorted folders into (start_offset, end_offset) listing ranges"""
+    if not folders:
+        return []
+    size = -(-len(folders) // shards)
+    return [
+        (folders[i], folders[i + size] if i + size < len(folders) else None)
+        for i in range(0, len(folders), size)
+    ]
+
+def list_range(bucket, start, end):
+    """Blobs in [start, end) under products/{barcode}/, paginated"""
+    iterator = bucket.client.list_blobs(
+        bucket, prefix=PREFIX, start_offset=start, end_offset=end, page_size=1000,
+        fields='items(name,size,timeCreated,md5Hash,contentType,cacheControl),nextPageToken',
+    )
+    return [blob for blob in iterator if PRODUCT_FOLDER_RE.match(blob.name)]
+
+def list_product_blobs(bucket, executor, shards):
+    """Every blob under products/{barcode}/, listed as `shards` ranges on `executor`"""
+    ranges = folder_ranges(list_product_folders(bucket), shards)
+    return [blob for listed in executor.map(lambda r: list_range(bucket, *r), ranges) for blob in listed]
+
+def thread_bucket(local, bucket_name):
+    """One storage client per worker: HTTP batches aren't safe to share across threads"""
+    if not hasattr(local, 'bucket'):
+        app = firebase_admin.get_app()
+        client = gcs.Client(project=app.project_id, credentials=app.credential.get_credential())
+        local.bucket = client.bucket(bucket_name)
+    return local.bucket
+
+def delete_chunk(local, bucket_name, names):
+    """Delete up to BATCH_DELETE_SIZE blobs in one request; returns (deleted, errors)"""
+    bucket = thread_bucket(local, bucket_name)
+    try:
+        with bucket.client.batch():
+            for name in names:
+                bucket.blob(name).delete()
+        return len(names), []
+    except Exception:
+        # A failed batch only reports its first error: redo it one by one
+        deleted = 0
+        errors = []
+        for name in names:
+            try:
+                bucket.blob(name).delete()
+                deleted += 1
+            except NotFound:
+                deleted += 1
+            except Exception as e:
+                errors.append((name, e))
+        return deleted, errors
+
+def format_bytes(size):
+    if size < 1024:
+        return f"{size:,} B"
+    size /= 1024
+    for unit in ('KB', 'MB'):
+        if size < 1024:
+            return f"{size:,.1f} {unit}"
+        size /= 1024
+    return f"{size:,.1f} GB"
+
+def gc_product_images(args):
+    db = get_db(args.key)
+    bucket = get_bucket(args.key, args.bucket)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.grace_days)
+
+    mode = 'DELETE' if args.delete else 'DRY RUN'
+    print(f"🧹 Orphaned product images in gs://{bucket.name}/{PREFIX} [{mode}]\n")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        # The Firestore scan runs while the bucket is being listed
+        referenced_future = executor.submit(referenced_images, db, bucket.name)
+
+        blobs = list_product_blobs(bucket, executor, args.workers * 4)
+        print(f"📷 {len(blobs):,} blobs ({format_bytes(sum(blob.size or 0 for blob in blobs))})")
+
+        referenced, foreign = referenced_future.result()
+        print(f"🔗 {len(referenced):,} referenced images"
+              f"{f' ({foreign:,} URLs outside this bucket ignored)' if foreign else ''}")
+
+    orphans = []
+    recent = 0
+    listed_names = set()
+    for blob in blobs:
+        listed_names.add(blob.name)
+        if blob.name in referenced:
+            continue
+        if blob.time_created and blob.time_created > cutoff:
+            recent += 1
+            continue
+        orphans.append(blob)
+
+    dangling = sum(1 for name in referenced if PRODUCT_FOLDER_RE.match(name) and name not in listed_names)
+    reclaimable = sum(blob.size or 0 for blob in orphans)
+
+    if orphans:
+        print(f"\n🗑️  Orphans (showing {min(args.show, len(orphans))} of {len(orphans):,}):")
+        for blob in sorted(orphans, key=lambda b: b.name)[:args.show]:
+            print(f"   {blob.name} ({format_bytes(blob.size or 0)}, {blob.time_created:%Y-%m-%d})")
+
+    print(f"\n{'='*60}")
+    print(f"🗑️  Orphaned blobs: {len(orphans):,}")
+    print(f"💾 Reclaimable: {format_bytes(reclaimable)}")
+    print(f"⏳ Unreferenced but newer than {args.grace_days} days (kept): {recent:,}")
+    if dangling:
+        print(f"⚠️  Referenced images missing from the bucket: {dangling:,}")
+    print(f"{'='*60}")
+
+    if not args.delete or not orphans:
+        if orphans:
+            print("\n💡 Run with --delete to remove them")
+        return
+
+    # An empty reference set almost certainly means the wrong project/bucket
+    if not referenced:
+        print("\n❌ No referenced images found; refusing to delete everything. Check --key/--bucket.")
+        return
+
+    print(f"\n🚀 Deleting {len(orphans):,} blobs...")
+    names = [blob.name for blob in orphans]
+    chunks = [names[i:i + BATCH_DELETE_SIZE] for i in range(0, len(names), BATCH_DELETE_SIZE)]
+    local = threading.local()
+    deleted = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for chunk_deleted, chunk_errors in executor.map(lambda chunk: delete_chunk(local, bucket.name, chunk), chunks):
+            deleted += chunk_deleted
+            errors.extend(chunk_errors)
+
+    print(f"✅ Deleted {deleted:,} blobs ({format_bytes(reclaimable)})")
+    if errors:
+        print(f"❌ {len(errors)} deletes failed:")
+        for name, error in errors[:10]:
+            print(f"   {name}: {error}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Garbage-collect unreferenced product images in Storage')
+    parser.add_argument('--delete', action='store_true', help='Delete the orphans (default: dry run)')
+    parser.add_argument('--grace-days', type=int, default=7, help='Keep unreferenced blobs newer than this (default 7)')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel listings/deletes (default 8)')
+    parser.add_argument('--show', type=int, default=20, help='Orphans to print (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    parser.add_argument('--bucket', help="Bucket name (default: <projectId>.firebasestorage.app)")
+    args = parser.parse_args()
+
+    try:
+        gc_product_images(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
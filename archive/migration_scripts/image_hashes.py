@@ -0,0 +1,239 @@
+"""
+Perceptual image hashes, a content-addressed hash cache and a BK-tree
+Usage: from image_hashes import HashCache, hash_local_files, hash_remote_images, BKTree, find_match
+
+- dhash: 9x8 grayscale thumbnail, 1 bit per horizontal gradient (64 bits)
+- phash: 32x32 grayscale -> 2D DCT (NumPy) -> 8x8 low frequencies vs. their
+  median (64 bits)
+Two images are near-duplicates when both hashes are within a small Hamming
+distance; resizes, recompression and small crops/brightness changes stay
+well under 10 bits.
+
+Hashing runs in a process pool. Results are cached by the MD5 of the file
+contents (the same digest GCS reports as md5Hash), so re-runs only decode
+new images and already-uploaded blobs with a known digest are never
+downloaded twice.
+"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from PIL import Image, ImageOps
+
+# Bump when the hash algorithm changes so cached values are recomputed
+HASH_VERSION = 1
+
+CACHE_PATH = '.image_hashes.json'
+
+# Images downloaded/hashed per round when hashing blobs (bounds memory)
+REMOTE_CHUNK = 64
+
+def dct_matrix(n):
+    """Orthonormal DCT-II basis, so dct(A) = M @ A @ M.T"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+DCT_32 = dct_matrix(32)
+
+def bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+def dhash(gray):
+    pixels = np.asarray(gray.resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    return bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+def phash(gray):
+    pixels = np.asarray(gray.resize((32, 32), Image.LANCZOS), dtype=np.float64)
+    low = (DCT_32 @ pixels @ DCT_32.T)[:8, :8].flatten()
+    # The DC term is just mean brightness; leave it out of the median
+    return bits_to_int(low > np.median(low[1:]))
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+def open_gray(source):
+    image = Image.open(source)
+    image.seek(0)  # first frame of animated GIFs
+    return ImageOps.exif_transpose(image).convert('L')
+
+def image_hashes(source):
+    """{'dhash': int, 'phash': int} for a path or file object, None if unreadable"""
+    try:
+        gray = open_gray(source)
+    except Exception:
+        return None
+    return {'dhash': dhash(gray), 'phash': phash(gray)}
+
+def hash_image_file(path):
+    """Process-pool entry point for local files"""
+    return image_hashes(path)
+
+def hash_image_bytes(data):
+    """Process-pool entry point for downloaded blobs"""
+    return image_hashes(io.BytesIO(data))
+
+def file_md5(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def blob_md5(blob):
+    """Hex MD5 from the listing's base64 md5Hash (None for composite objects)"""
+    return base64.b64decode(blob.md5_hash).hex() if blob.md5_hash else None
+
+class HashCache:
+    """{md5: {'dhash': int, 'phash': int} or None} persisted as JSON"""
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                stored = json.load(f)
+            if stored.get('version') == HASH_VERSION:
+                self.entries = {
+                    digest: {name: int(value, 16) for name, value in hashes.items()} if hashes else None
+                    for digest, hashes in stored['hashes'].items()
+                }
+
+    def __contains__(self, digest):
+        return digest in self.entries
+
+    def get(self, digest):
+        return self.entries.get(digest)
+
+    def put(self, digest, hashes):
+        self.entries[digest] = hashes
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'version': HASH_VERSION,
+                'hashes': {
+                    digest: {name: f'{value:016x}' for name, value in hashes.items()} if hashes else None
+                    for digest, hashes in self.entries.items()
+                },
+            }, f)
+        os.replace(tmp_path, self.path)
+
+def hash_local_files(paths, cache, workers=None):
+    """{path: (md5, hashes or None)}; only files whose digest isn't cached are decoded"""
+    with ThreadPoolExecutor(max_workers=8) as io_pool:
+        digests = dict(zip(paths, io_pool.map(file_md5, paths)))
+
+    todo = {}
+    for path, digest in digests.items():
+        if digest not in cache and digest not in todo:
+            todo[digest] = path
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for digest, hashes in zip(todo, pool.map(hash_image_file, todo.values(), chunksize=8)):
+                cache.put(digest, hashes)
+
+    return {path: (digest, cache.get(digest)) for path, digest in digests.items()}
+
+def hash_remote_images(blobs, cache, workers=None, download_workers=16, log=print):
+    """
+    {blob name: (md5, hashes or None)}; blobs with a cached md5Hash aren't downloaded
+
+    A blob that fails to download is logged and gets hashes None (like an
+    unreadable image) without being cached, so the next run retries it.
+    """
+    def download(blob):
+        try:
+            return blob.download_as_bytes()
+        except Exception as e:
+            log(f"   ⚠️  {blob.name}: download failed ({e})")
+            return None
+
+    results = {}
+    todo = []
+    for blob in blobs:
+        digest = blob_md5(blob)
+        if digest and digest in cache:
+            results[blob.name] = (digest, cache.get(digest))
+        else:
+            todo.append(blob)
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=download_workers) as io_pool, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            for i in range(0, len(todo), REMOTE_CHUNK):
+                chunk = todo[i:i + REMOTE_CHUNK]
+                downloaded = []
+                for blob, data in zip(chunk, io_pool.map(download, chunk)):
+                    if data is None:
+                        results[blob.name] = (blob_md5(blob), None)
+                    else:
+                        downloaded.append((blob, data))
+                datas = [data for _, data in downloaded]
+                for (blob, data), hashes in zip(downloaded, pool.map(hash_image_bytes, datas)):
+                    digest = blob_md5(blob) or hashlib.md5(data).hexdigest()
+                    cache.put(digest, hashes)
+                    results[blob.name] = (digest, hashes)
+
+    return results
+
+class BKTree:
+    """Metric tree over 64-bit hashes: radius queries without comparing all pairs"""
+
+    def __init__(self):
+        self.root = None    # [key, items, {distance: child}]
+        self.size = 0
+
+    def add(self, key, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [key, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key, radius):
+        """[(distance, item)] for every key within `radius`"""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_key, items, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= radius:
+                found.extend((distance, item) for item in items)
+            # Triangle inequality: only children in [d - r, d + r] can match
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+def find_match(tree, hashes, max_distance):
+    """
+    Closest (distance, payload) in a tree of (hashes, payload) items, or None
+
+    Candidates come from the phash radius query; dhash must agree too.
+    """
+    best = None
+    for phash_distance, (other, payload) in tree.search(hashes['phash'], max_distance):
+        dhash_distance = hamming(hashes['dhash'], other['dhash'])
+        if dhash_distance <= max_distance:
+            distance = max(phash_distance, dhash_distance)
+            if best is None or distance < best[0]:
+                best = (distance, payload)
+    return best
@@ -3,15 +3,10 @@ Import categories from Excel to Firestore
 Usage: python scripts/import_categories.py
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 import pandas as pd
 from datetime import datetime
-
-# Initialize Firebase
-cred = credentials.Certificate('serviceAccountKey.json')
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+from firebase_admin import firestore
+from firebase_app import get_db
 
 # Bulk pricing configuration (only for specific categories)
 BULK_PRICING_CATEGORIES = {
@@ -41,6 +36,7 @@ def generate_category_name(categoria, subcategoria):
 
 def import_categories():
     """Import categories from Excel to Firestore"""
+    db = get_db()
     
     print("📊 Reading Excel file...")
     df = pd.read_excel('data/categorias.xlsx')
@@ -1,20 +1,20 @@
 """
 Import products from Excel to Firestore
 Usage: python scripts/import_products.py
+       python scripts/import_products.py --profile   # time parse/validate/normalize/write (see profiling.py)
+
+The workbook is opened once and each sheet parsed from it; rows are read as
+plain dicts and progress is a progress bar per sheet, not a line per row.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import argparse
+from firebase_admin import firestore
 import pandas as pd
 import re
-
-# Initialize Firebase (reuse existing app if already initialized)
-try:
-    db = firestore.client()
-except ValueError:
-    cred = credentials.Certificate('serviceAccountKey.json')
-    firebase_admin.initialize_app(cred)
-    db = firestore.client()
+from firebase_app import get_db
+from profiling import Profiler, add_profile_argument
+from progress import ProgressBar
+from write_executor import WriteExecutor, print_failures, set_doc
 
 def format_size(medida):
     """Format size string (e.g., '8X60' -> '8 x 60 cms')"""
@@ -41,13 +41,81 @@ def extract_temas(tema):
     # For now, single tema. Future: split by comma or semicolon
     return [str(tema).strip()]
 
-def import_products():
+def product_doc_for(row, barcode, sheet_num):
+    """Product document for one sheet row (a dict of column -> value)"""
+    # Extract fields
+    nombre = row.get('NOMBRE', None)
+    if pd.notna(nombre):
+        nombre = str(nombre).strip()
+    else:
+        nombre = None
+    
+    warehouse_code = str(row['ID_BODEGA']).strip() if pd.notna(row['ID_BODEGA']) else None
+    category_code = str(row['ID_CATEGORIA']).strip() if pd.notna(row['ID_CATEGORIA']) else None
+    primary_category = str(row['Categoría']).strip() if pd.notna(row['Categoría']) else None
+    subcategory = str(row['Subcategoría']).strip() if pd.notna(row['Subcategoría']) and row['Subcategoría'] != '' else None
+    
+    # Size
+    medida = row.get('MEDIDA', None)
+    size_raw = str(medida).strip() if pd.notna(medida) and medida != '' else None
+    size_formatted = format_size(medida)
+    
+    # Temas
+    tema = row.get('Tema', None)
+    temas = extract_temas(tema)
+    
+    # Build product document
+    product_doc = {
+        # Identity
+        'barcode': barcode,
+        'name': nombre,
+        'warehouseCode': warehouse_code,
+    
+        # Category linkage
+        'categoryCode': category_code,
+        'primaryCategory': primary_category,
+        'subcategory': subcategory,
+    
+        # Attributes
+        'size': size_raw,
+        'sizeFormatted': size_formatted,
+        'temas': temas,
+        'color': None,  # To be added manually later
+    
+        # Images (empty for now)
+        'images': [],
+        'primaryImageUrl': None,
+    
+        # Pricing (inherit from category)
+        'priceOverride': None,
+    
+        # Stock (initialized to 0)
+        'inStock': True,  # Product exists
+        'stockWarehouse': 0,
+        'stockStore': 0,
+    
+        # Metadata
+        'isActive': True,
+        'createdAt': firestore.SERVER_TIMESTAMP,
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+        'notes': None,
+    
+        # Source tracking
+        'importSource': 'productos.xlsx',
+        'sheetNumber': sheet_num
+    }
+    
+    return product_doc
+
+def import_products(profiler=None):
     """Import products from Excel to Firestore"""
+    profiler = profiler or Profiler('import_products')
     
     print("📊 Reading Excel file (all sheets)...")
     
     # Read all sheets
-    excel_file = pd.ExcelFile('data/productos.xlsx')
+    with profiler.phase('parse'):
+        excel_file = pd.ExcelFile('data/productos.xlsx')
     all_sheets = excel_file.sheet_names
     
     print(f"✅ Found {len(all_sheets)} sheets: {all_sheets}\n")
@@ -58,6 +126,11 @@ def import_products():
     total_skipped = 0
     sheet_stats = {}
     
+    db = get_db()
+
+    # Rows are queued and committed in batches of 500, with retry on throttling
+    executor = WriteExecutor(db)
+    
     for sheet_num in range(1, 21):  # Sheets 1-20
         sheet_name = str(sheet_num)
         
@@ -73,8 +146,9 @@ def import_products():
         
         print(f"📄 Processing Sheet {sheet_num}...")
         
-        # Read sheet
-        df = pd.read_excel('data/productos.xlsx', sheet_name=sheet_name)
+        # Read sheet (from the already-open workbook; read_excel(path) would load the file again per sheet)
+        with profiler.phase('parse'):
+            df = excel_file.parse(sheet_name)
         
         # Verify required columns exist
         required_cols = ['CODIGO_BARRA', 'ID_BODEGA', 'ID_CATEGORIA', 'Categoría', 'Subcategoría']
@@ -87,92 +161,39 @@ def import_products():
         
         imported = 0
         errors = 0
+        sheet_writes = []
+        
+        # Plain dicts: much cheaper per row than iterrows() Series
+        with profiler.phase('parse'):
+            rows = df.to_dict('records')
+        bar = ProgressBar(len(rows), f"Sheet {sheet_num}")
         
-        for index, row in df.iterrows():
+        for index, row in enumerate(rows):
+            bar.update()
             try:
-                # Skip if no barcode
-                if pd.isna(row['CODIGO_BARRA']) or row['CODIGO_BARRA'] == '':
-                    continue
-                
-                barcode = str(int(row['CODIGO_BARRA'])).strip()  # Convert to string, remove decimals
-                
-                # Extract fields
-                nombre = row.get('NOMBRE', None)
-                if pd.notna(nombre):
-                    nombre = str(nombre).strip()
-                else:
-                    nombre = None
-                
-                warehouse_code = str(row['ID_BODEGA']).strip() if pd.notna(row['ID_BODEGA']) else None
-                category_code = str(row['ID_CATEGORIA']).strip() if pd.notna(row['ID_CATEGORIA']) else None
-                primary_category = str(row['Categoría']).strip() if pd.notna(row['Categoría']) else None
-                subcategory = str(row['Subcategoría']).strip() if pd.notna(row['Subcategoría']) and row['Subcategoría'] != '' else None
-                
-                # Size
-                medida = row.get('MEDIDA', None)
-                size_raw = str(medida).strip() if pd.notna(medida) and medida != '' else None
-                size_formatted = format_size(medida)
-                
-                # Temas
-                tema = row.get('Tema', None)
-                temas = extract_temas(tema)
-                
-                # Build product document
-                product_doc = {
-                    # Identity
-                    'barcode': barcode,
-                    'name': nombre,
-                    'warehouseCode': warehouse_code,
-                    
-                    # Category linkage
-                    'categoryCode': category_code,
-                    'primaryCategory': primary_category,
-                    'subcategory': subcategory,
-                    
-                    # Attributes
-                    'size': size_raw,
-                    'sizeFormatted': size_formatted,
-                    'temas': temas,
-                    'color': None,  # To be added manually later
-                    
-                    # Images (empty for now)
-                    'images': [],
-                    'primaryImageUrl': None,
+                with profiler.phase('validate'):
+                    # Skip if no barcode
+                    if pd.isna(row['CODIGO_BARRA']) or row['CODIGO_BARRA'] == '':
+                        continue
                     
-                    # Pricing (inherit from category)
-                    'priceOverride': None,
-                    
-                    # Stock (initialized to 0)
-                    'inStock': True,  # Product exists
-                    'stockWarehouse': 0,
-                    'stockStore': 0,
-                    
-                    # Metadata
-                    'isActive': True,
-                    'createdAt': firestore.SERVER_TIMESTAMP,
-                    'updatedAt': firestore.SERVER_TIMESTAMP,
-                    'notes': None,
-                    
-                    # Source tracking
-                    'importSource': 'productos.xlsx',
-                    'sheetNumber': sheet_num
-                }
+                    barcode = str(int(row['CODIGO_BARRA'])).strip()  # Convert to string, remove decimals
+                
+                with profiler.phase('normalize'):
+                    product_doc = product_doc_for(row, barcode, sheet_num)
                 
                 # Import to Firestore (using barcode as document ID)
-                db.collection('products').document(barcode).set(product_doc)
+                sheet_writes.append(set_doc(db.collection('products').document(barcode), product_doc))
                 
                 imported += 1
                 
-                # Print progress (only first 3 per sheet to avoid clutter)
-                if imported <= 3:
-                    display_name = nombre if nombre else f"{primary_category} ({warehouse_code})"
-                    print(f"   ✅ {barcode}: {display_name}")
-                elif imported == 4:
-                    print(f"   ... (continuing to import remaining products)")
-                
             except Exception as e:
-                print(f"   ❌ Error at row {index + 2}: {e}")
+                bar.write(f"   ❌ Error at row {index + 2}: {e}")
                 errors += 1
+        bar.close()
+        profiler.count('rows', len(rows))
+        
+        with profiler.phase('write'):
+            executor.submit(sheet_writes)
         
         # Sheet summary
         print(f"   📊 Sheet {sheet_num}: {imported} imported, {errors} errors\n")
@@ -180,13 +201,21 @@ def import_products():
         total_imported += imported
         total_errors += errors
     
+    # Waiting for the last batches to commit is network time
+    with profiler.phase('write'):
+        executor.close()
+    total_failed = sum(len(writes) for writes, _ in executor.failures)
+    
     # Final summary
     print(f"{'='*60}")
     print(f"📦 Import Complete!")
-    print(f"✅ Total products imported: {total_imported}")
+    print(f"✅ Total products imported: {total_imported - total_failed}")
     print(f"⏭️  Sheets skipped: {total_skipped} (sheet 18)")
     if total_errors > 0:
         print(f"❌ Total errors: {total_errors}")
+    if executor.retries:
+        print(f"🔁 Batch retries: {executor.retries}")
+    print_failures(executor.failures)
     print(f"{'='*60}\n")
     
     # Detailed breakdown
@@ -200,10 +229,15 @@ def import_products():
     print(f"   2. Upload product images to Firebase Storage (named by barcode)")
     print(f"   3. Run image linking script (coming next)")
     print(f"   4. Add stock counts manually or via admin UI")
+    profiler.finish()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import products from data/productos.xlsx')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+
     try:
-        import_products()
+        import_products(Profiler.from_args('import_products', args))
         print("\n✨ All done! Check Firestore Console to verify.")
     except FileNotFoundError as e:
         if 'serviceAccountKey.json' in str(e):
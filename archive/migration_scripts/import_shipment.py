@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Import a supplier shipment from Excel and add it to warehouse stock
+Usage:
+  python3 import_shipment.py data/envio.xlsx --dry-run
+  python3 import_shipment.py data/envio.xlsx --received-by "Bodega"
+
+Every sheet of the workbook is read; rows need CODIGO_BARRA and CANTIDAD.
+Same end state as completing a shipment in receive_shipment_screen.dart: a
+completed `shipments` doc with one item per product, and stockWarehouse
+incremented per product.
+
+Lines are aggregated per barcode first, every barcode is validated with one
+chunked get_all, and stock is posted as one Increment per distinct product,
+499 products per batch. Each batch also records its chunk number on the
+shipment (postedChunks) atomically with its increments, and the shipment is
+only marked completed after every chunk, so an interrupted import is
+resumed by running the same command again: posted chunks are skipped.
+Until then its status is 'importing', which the app shows but can't edit,
+complete or delete (completing it there would post the stock again).
+The shipment ID is derived from the aggregated items, so importing the same
+shipment twice is refused unless --shipment-id is given.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import pandas as pd
+from datetime import datetime, timezone
+from firebase_admin import firestore
+from firebase_app import get_db
+from write_executor import MAX_BATCH_WRITES, WriteExecutor, print_failures, update
+
+REQUIRED_COLUMNS = ['CODIGO_BARRA', 'CANTIDAD']
+
+# Product fields copied into the shipment items (as the app does)
+ITEM_FIELDS = ['name', 'warehouseCode', 'categoryCode', 'images']
+
+# IDs per get_all call
+GET_ALL_CHUNK = 300
+
+# Products per batch; the shipment's postedChunks update is the 500th write
+CHUNK = MAX_BATCH_WRITES - 1
+
+# Status while chunks are being posted; only this script resumes it
+# ('in-progress' is the app's own draft state, which it completes)
+IMPORTING = 'importing'
+
+# Statuses an import resumes; 'in-progress' for imports started before IMPORTING
+RESUMABLE = (IMPORTING, 'in-progress')
+
+def normalize_barcode(value):
+    """Excel reads numeric barcodes as floats: 7401234.0 -> '7401234'"""
+    if pd.isna(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    barcode = str(value).strip()
+    return barcode or None
+
+def read_lines(path):
+    """
+    (lines, problems): lines is a DataFrame of sheet, row, barcode, quantity;
+    problems lists the rows that can't be imported
+    """
+    frames = []
+    problems = []
+    for sheet, df in pd.read_excel(path, sheet_name=None).items():
+        missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+        if missing:
+            print(f"⏭️  Sheet {sheet}: no {'/'.join(missing)} column, skipped")
+            continue
+        lines = pd.DataFrame({
+            'sheet': sheet,
+            'row': df.index + 2,  # header is row 1
+            'barcode': df['CODIGO_BARRA'].map(normalize_barcode),
+            'quantity': pd.to_numeric(df['CANTIDAD'], errors='coerce'),
+        })
+        # Blank rows at the end of a sheet are common
+        lines = lines[lines['barcode'].notna() | lines['quantity'].notna()]
+        no_barcode = lines['barcode'].isna()
+        bad_quantity = lines['quantity'].isna() | (lines['quantity'] <= 0) | (lines['quantity'] % 1 != 0)
+        for line in lines[no_barcode].itertuples():
+            problems.append(f"sheet {sheet} row {line.row}: no barcode")
+        for line in lines[bad_quantity & ~no_barcode].itertuples():
+            problems.append(f"sheet {sheet} row {line.row}: {line.barcode} quantity {line.quantity:g} is not a positive whole number")
+        bad = no_barcode | bad_quantity
+        frames.append(lines[~bad])
+    lines = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['sheet', 'row', 'barcode', 'quantity'])
+    return lines.astype({'quantity': int}), problems
+
+def aggregate(lines):
+    """{barcode: total quantity}, sorted by barcode so chunks are the same on every run"""
+    return {barcode: int(quantity) for barcode, quantity in lines.groupby('barcode', sort=True)['quantity'].sum().items()}
+
+def shipment_id_for(totals):
+    digest = hashlib.sha256(json.dumps(totals, sort_keys=True).encode('utf-8')).hexdigest()
+    return f'import-{digest[:16]}'
+
+def fetch_products(db, barcodes):
+    """{barcode: dict of ITEM_FIELDS} for the barcodes that exist, in ceil(n / GET_ALL_CHUNK) RPCs"""
+    products = {}
+    refs = [db.collection('products').document(barcode) for barcode in barcodes]
+    for i in range(0, len(refs), GET_ALL_CHUNK):
+        for snapshot in db.get_all(refs[i:i + GET_ALL_CHUNK], field_paths=ITEM_FIELDS):
+            if snapshot.exists:
+                products[snapshot.id] = snapshot.to_dict()
+    return products
+
+def shipment_items(totals, products, added_at):
+    items = []
+    for barcode, quantity in totals.items():
+        product = products[barcode]
+        items.append({
+            'barcode': barcode,
+            'productName': product.get('name'),
+            'warehouseCode': product.get('warehouseCode'),
+            'categoryCode': product.get('categoryCode'),
+            'quantity': quantity,
+            # Only the thumbnail; the whole list could push a big shipment past 1 MiB
+            'images': (product.get('images') or [])[:1],
+            'addedAt': added_at,
+        })
+    return items
+
+def chunk_writes(db, shipment_ref, n, chunk, totals, extra=None):
+    """One atomic batch: the chunk's stock increments plus its postedChunks marker"""
+    writes = [
+        update(db.collection('products').document(barcode), {
+            'stockWarehouse': firestore.Increment(totals[barcode]),
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        })
+        for barcode in chunk
+    ]
+    writes.append(update(shipment_ref, {
+        'postedChunks': firestore.ArrayUnion([n]),
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+        **(extra or {}),
+    }))
+    return writes
+
+def print_problems(title, problems, limit=10):
+    print(f"❌ {title}: {len(problems):,}")
+    for problem in problems[:limit]:
+        print(f"   - {problem}")
+    if len(problems) > limit:
+        print(f"   ... and {len(problems) - limit:,} more")
+
+def import_shipment(args):
+    print(f"📊 Reading {args.workbook}...")
+    lines, problems = read_lines(args.workbook)
+    if problems:
+        print_problems('Rows that cannot be imported', problems)
+        print("\nFix the workbook and run again; nothing was written")
+        return False
+
+    totals = aggregate(lines)
+    units = sum(totals.values())
+    print(f"✅ {len(lines):,} lines → {len(totals):,} products, {units:,} units")
+    if not totals:
+        return True
+
+    db = get_db(args.key)
+    products = fetch_products(db, list(totals))
+    unknown = [barcode for barcode in totals if barcode not in products]
+    if unknown:
+        print_problems('Barcodes not in products/', unknown)
+        print("\nImport the products first (import_products.py); nothing was written")
+        return False
+
+    shipment_id = args.shipment_id or shipment_id_for(totals)
+    shipment_ref = db.collection('shipments').document(shipment_id)
+    snapshot = shipment_ref.get()
+    existing = snapshot.to_dict() if snapshot.exists else None
+    if existing and existing.get('status') not in RESUMABLE:
+        print(f"⏭️  Already imported as shipments/{shipment_id} ({existing.get('status')})")
+        print("   Pass --shipment-id to post the same items again")
+        return True
+    if existing and existing.get('totalItems') != units:
+        print(f"❌ shipments/{shipment_id} exists with different items; pass another --shipment-id")
+        return False
+
+    barcodes = list(totals)
+    chunks = [barcodes[i:i + CHUNK] for i in range(0, len(barcodes), CHUNK)]
+    posted = set(existing.get('postedChunks') or []) if existing else set()
+    todo = [n for n in range(len(chunks)) if n not in posted]
+    print(f"🧾 shipments/{shipment_id}: {len(chunks)} batches, {len(posted)} already posted")
+    if args.dry_run:
+        print("\n[DRY RUN] Nothing written")
+        return True
+
+    if existing is None:
+        shipment_ref.set({
+            'status': IMPORTING,
+            'date': firestore.SERVER_TIMESTAMP,
+            'receivedBy': 'import_shipment.py',
+            'receivedByName': args.received_by,
+            # Server timestamps aren't allowed inside arrays
+            'items': shipment_items(totals, products, datetime.now(timezone.utc)),
+            'totalItems': units,
+            'totalProducts': len(totals),
+            'completedAt': None,
+            'cancelledAt': None,
+            'createdAt': firestore.SERVER_TIMESTAMP,
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+            'notes': args.notes,
+            'importSource': os.path.basename(args.workbook),
+            'postedChunks': [],
+        })
+    elif existing.get('status') != IMPORTING:
+        # Take it out of the app's hands before posting more stock
+        shipment_ref.update({'status': IMPORTING, 'updatedAt': firestore.SERVER_TIMESTAMP})
+
+    completed = {'status': 'completed', 'completedAt': firestore.SERVER_TIMESTAMP}
+    with WriteExecutor(db) as executor:
+        for n in todo:
+            # A single remaining batch completes the shipment atomically with its stock
+            extra = completed if len(todo) == 1 else None
+            executor.submit(chunk_writes(db, shipment_ref, n, chunks[n], totals, extra))
+    failures = executor.failures
+    if not failures and len(todo) != 1:
+        shipment_ref.update({**completed, 'updatedAt': firestore.SERVER_TIMESTAMP})
+
+    print(f"\n{'='*60}")
+    print(f"📦 Stock posted: {len(todo) - len(failures)}/{len(todo)} batches")
+    print_failures(failures)
+    if failures:
+        print("Run the same command again to post the remaining batches")
+    else:
+        print(f"✅ shipments/{shipment_id} completed: {len(totals):,} products, {units:,} units")
+    print(f"{'='*60}")
+    return not failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import a shipment workbook into warehouse stock')
+    parser.add_argument('workbook', help='Excel file with CODIGO_BARRA and CANTIDAD columns')
+    parser.add_argument('--dry-run', action='store_true', help="Validate and show the totals but don't write")
+    parser.add_argument('--received-by', default='import_shipment.py', help='receivedByName on the shipment')
+    parser.add_argument('--notes', help='Notes on the shipment')
+    parser.add_argument('--shipment-id', help='Shipment document ID (default: derived from the items)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    try:
+        ok = import_shipment(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
+        ok = False
+    if not ok:
+        sys.exit(1)
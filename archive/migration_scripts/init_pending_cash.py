@@ -4,15 +4,9 @@ Initialize pendingCash collection in Firestore.
 Creates documents for store, mensajero, and forza with amount=0 if they don't exist.
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
 from datetime import datetime
-
-# Initialize Firebase Admin
-cred = credentials.Certificate('../serviceAccountKey.json')
-firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+from firebase_app import get_db
 
 # Define the three cash sources
 sources = {
@@ -38,6 +32,7 @@ sources = {
 
 def init_pending_cash():
     """Initialize pendingCash collection with all sources."""
+    db = get_db()
     pending_cash_ref = db.collection('pendingCash')
     
     for source_id, data in sources.items():
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Materialize each product's effective price and bulk tiers onto the product
+Usage:
+  python3 materialize_prices.py                      # subcategories with new pricing + products edited since last run
+  python3 materialize_prices.py --category CUA-2030  # just this subcategory
+  python3 materialize_prices.py --full               # every product; rebuilds the index
+  python3 materialize_prices.py --full --plan plans/prices.jsonl   # apply with apply_plan.py
+
+Writes on products/{barcode}:
+  effectivePrice  priceOverride, else the subcategory's defaultPrice
+  priceTiers      [{minQty, unitPrice}] from bulkPricing for bulk-eligible
+                  codes (pricing.BULK_ELIGIBLE_CODES), else []
+so readers don't need a second read of the subcategory.
+
+pricingIndex/{categoryCode} keeps {barcodes, pricingHash}. When a
+subcategory's defaultPrice/bulkPricing changes its hash no longer matches
+and only the barcodes listed there are re-read (get_all by ID, no query)
+and rewritten in batches. Products edited since the previous run
+(updatedAt) are re-priced and moved between index entries if their
+categoryCode changed. An entry's pricingHash only advances when its
+category was re-read (or on --full), so a --category run doesn't mark the
+other categories up to date. Only fields that actually differ are written, and
+updatedAt is left alone: these are derived fields, not user edits.
+Deleted products leave the index on --full (or when their category is
+re-read).
+
+--plan writes the same writes to a plan file instead (products in phase 0,
+index in phase 1, run state in phase 2) for apply_plan.py to apply from
+several processes.
+"""
+
+import argparse
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from firebase_admin import firestore
+from build_catalog import load_subcategories
+from firebase_app import get_db
+from firestore_scan import iter_docs
+from plan_executor import PlanWriter
+from pricing import base_price, is_bulk_eligible, price_tiers
+from write_executor import WriteExecutor, delete, print_failures, set_doc, update
+
+INDEX_COLLECTION = 'pricingIndex'
+STATE_DOC = 'catalogMeta/prices'
+
+# Product fields the job needs
+PRICE_FIELDS = ['categoryCode', 'priceOverride', 'effectivePrice', 'priceTiers']
+
+# IDs per get_all call
+GET_ALL_CHUNK = 300
+
+# The next incremental run re-checks this much before the previous start (clock skew)
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+def pricing_hash(code, subcategory):
+    """Hash of everything in a subcategory that feeds the product price"""
+    subcategory = subcategory or {}
+    return hashlib.sha1(json.dumps({
+        'defaultPrice': subcategory.get('defaultPrice'),
+        'bulkPricing': subcategory.get('bulkPricing'),
+        'eligible': is_bulk_eligible(code, subcategory.get('bulkPricing')),
+    }, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def materialized_fields(product, subcategory):
+    bulk_pricing = (subcategory or {}).get('bulkPricing')
+    eligible = is_bulk_eligible(product.get('categoryCode'), bulk_pricing)
+    return {
+        'effectivePrice': base_price(product, subcategory),
+        'priceTiers': price_tiers(bulk_pricing) if eligible else [],
+    }
+
+def load_index(db):
+    """{code: {'barcodes': set, 'pricingHash': str}}"""
+    index = {}
+    for snapshot in iter_docs(db.collection(INDEX_COLLECTION)):
+        data = snapshot.to_dict()
+        index[snapshot.id] = {'barcodes': set(data.get('barcodes', [])), 'pricingHash': data.get('pricingHash')}
+    return index
+
+def get_products(db, barcodes):
+    """{barcode: product dict} for the barcodes that still exist (PRICE_FIELDS only)"""
+    products = {}
+    refs = [db.collection('products').document(barcode) for barcode in sorted(barcodes)]
+    for i in range(0, len(refs), GET_ALL_CHUNK):
+        for snapshot in db.get_all(refs[i:i + GET_ALL_CHUNK], field_paths=PRICE_FIELDS):
+            if snapshot.exists:
+                products[snapshot.id] = snapshot.to_dict()
+    return products
+
+def query_products(query):
+    return {snapshot.id: snapshot.to_dict() for snapshot in query.select(PRICE_FIELDS).stream()}
+
+def materialize_prices(args):
+    db = get_db(args.key)
+    started = datetime.now(timezone.utc)
+    state_ref = db.document(STATE_DOC)
+    products_ref = db.collection('products')
+
+    subcategories = load_subcategories(db)
+    index = load_index(db)
+
+    # Which products to (re)price; `stale` categories are re-read in full
+    old_index = {code: {'barcodes': set(entry['barcodes']), 'pricingHash': entry['pricingHash']} for code, entry in index.items()}
+    if args.full:
+        scope = 'all products'
+        products = {s.id: s.to_dict() for s in iter_docs(products_ref.select(PRICE_FIELDS), 1000)}
+        index = {}
+        stale = None
+    else:
+        if args.category:
+            stale = set(args.category)
+        else:
+            stale = {code for code, sub in subcategories.items()
+                     if index.get(code, {}).get('pricingHash') != pricing_hash(code, sub)}
+        products = {}
+        for code in stale:
+            if index.get(code, {}).get('pricingHash') is not None:
+                products.update(get_products(db, index[code]['barcodes']))
+            else:
+                # Not indexed yet (or only listing products moved in by an
+                # earlier run): one query bootstraps the entry
+                products.update(query_products(products_ref.where('categoryCode', '==', code)))
+        scope = f"{len(stale)} subcategories with new pricing"
+
+        if not args.category:
+            state = state_ref.get()
+            last_run = state.to_dict().get('lastRunStartedAt') if state.exists else None
+            if last_run is not None:
+                edited = query_products(products_ref.where('updatedAt', '>', last_run - WATERMARK_OVERLAP))
+                products.update(edited)
+                scope += f" + {len(edited)} products edited since {last_run:%Y-%m-%d %H:%M}"
+
+        # Listed in a re-read category but gone from products: deleted
+        for code in stale & set(index):
+            index[code]['barcodes'] = {barcode for barcode in index[code]['barcodes'] if barcode in products}
+
+    mode = 'DRY RUN' if args.dry_run else 'PLAN' if args.plan else 'LIVE'
+    print(f"💲 Materializing prices [{mode}]: {scope}\n")
+
+    listed_under = {barcode: code for code, entry in index.items() for barcode in entry['barcodes']}
+    writes = []
+    unchanged = 0
+    for barcode, product in products.items():
+        code = product.get('categoryCode')
+        old_code = listed_under.get(barcode)
+        if old_code != code:
+            if old_code:
+                index[old_code]['barcodes'].discard(barcode)
+            if code:
+                index.setdefault(code, {'barcodes': set(), 'pricingHash': None})['barcodes'].add(barcode)
+
+        fields = materialized_fields(product, subcategories.get(code))
+        changes = {key: value for key, value in fields.items() if key not in product or product[key] != value}
+        if changes:
+            writes.append(update(products_ref.document(barcode), changes))
+        else:
+            unchanged += 1
+
+    index_writes = []
+    for code, entry in index.items():
+        # Only categories whose products were all re-read are up to date;
+        # the others keep their hash and just get their barcodes updated
+        if stale is None or code in stale:
+            entry['pricingHash'] = pricing_hash(code, subcategories.get(code))
+        old = old_index.get(code)
+        if old is None or old['barcodes'] != entry['barcodes'] or old['pricingHash'] != entry['pricingHash']:
+            index_writes.append(set_doc(db.collection(INDEX_COLLECTION).document(code), {
+                'barcodes': sorted(entry['barcodes']),
+                'pricingHash': entry['pricingHash'],
+                'updatedAt': firestore.SERVER_TIMESTAMP,
+            }))
+    # A full run rebuilds the index from scratch; drop entries of emptied categories
+    index_writes.extend(delete(db.collection(INDEX_COLLECTION).document(code)) for code in old_index if code not in index)
+
+    failures = []
+    if args.plan and not args.dry_run:
+        with PlanWriter(args.plan, f"materialize_prices{' --full' if args.full else ''}") as plan:
+            plan.add(writes)
+            plan.add(index_writes, phase=1)
+            if not args.category:
+                plan.add([set_doc(state_ref, {'lastRunStartedAt': started, 'updatedAt': firestore.SERVER_TIMESTAMP}, merge=True)], phase=2)
+    elif not args.dry_run:
+        with WriteExecutor(db) as executor:
+            executor.submit(writes)
+            executor.flush()
+            # The index only moves forward once the products it vouches for are written
+            if not executor.failures:
+                executor.submit(index_writes)
+        failures = executor.failures
+        if not failures and not args.category:
+            state_ref.set({'lastRunStartedAt': started, 'updatedAt': firestore.SERVER_TIMESTAMP}, merge=True)
+
+    print(f"{'='*60}")
+    print(f"📦 Products checked: {len(products):,}")
+    planned = args.dry_run or args.plan
+    print(f"💲 Products {'to update' if planned else 'updated'}: {len(writes):,}")
+    print(f"✅ Already up to date: {unchanged:,}")
+    print(f"🗂️  Index entries {'to write' if planned else 'written'}: {len(index_writes)}")
+    print_failures(failures)
+    if args.plan and not args.dry_run:
+        print(f"📝 Nothing written; planned to {args.plan}")
+        print(f"Next: python3 apply_plan.py apply {args.plan} --workers 8")
+    print(f"{'='*60}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write effectivePrice/priceTiers onto products')
+    parser.add_argument('--full', action='store_true', help='Re-price every product and rebuild the index')
+    parser.add_argument('--category', action='append', help='Re-price only this subcategory code (repeatable)')
+    parser.add_argument('--dry-run', action='store_true', help="Compute changes but don't write")
+    parser.add_argument('--plan', help='Write the changes to this plan file for apply_plan.py instead of applying them')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    try:
+        materialize_prices(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Run registered Firestore migrations (see migrations.py, migration_runner.py)
+Usage:
+  python3 migrate.py list
+  python3 migrate.py run add_display_order --dry-run
+  python3 migrate.py run add_display_order
+  python3 migrate.py status add_display_order --checkpoint firestore
+  python3 migrate.py run add_display_order --plan plans/display_order.jsonl   # apply with apply_plan.py
+
+Interrupted or crashed runs resume from their last page checkpoint.
+"""
+
+import argparse
+from firebase_app import get_db
+from migration_runner import CHECKPOINT_COLLECTION, LOCAL_CHECKPOINT_DIR, MIGRATIONS, checkpoint_store, plan_migration, run_migration
+import migrations  # noqa: F401  (registers the migrations)
+
+def print_status(name, db, checkpoint):
+    migration = MIGRATIONS[name]
+    state = checkpoint_store(migration, db, checkpoint).load()
+    if not state:
+        print(f"{name} v{migration.version}: not started")
+        return
+    print(f"{name} v{migration.version}: {state['status']}")
+    print(f"   scanned={state['scanned']:,} writes={state['writes']:,} pages={state['pages']:,}")
+    print(f"   last document: {state['lastPath']}")
+    print(f"   updated: {state['updatedAt']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run registered, resumable Firestore migrations')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='List registered migrations')
+
+    run_parser = subparsers.add_parser('run', help='Run or resume a migration')
+    run_parser.add_argument('name', choices=sorted(MIGRATIONS))
+    run_parser.add_argument('--dry-run', action='store_true', help='Scan and count planned writes without writing')
+    run_parser.add_argument('--restart', action='store_true', help='Ignore any checkpoint and start from the beginning')
+    run_parser.add_argument('--page-size', type=int, default=500, help='Documents per page/checkpoint (default 500)')
+    run_parser.add_argument('--max-concurrency', type=int, default=16, help='Upper bound on batch commits in flight (default 16)')
+    run_parser.add_argument('--max-ops', type=int, help='Cap the ramp-up at this many writes/sec')
+    run_parser.add_argument('--plan', help='Write the writes to this plan file for apply_plan.py instead of applying them')
+
+    status_parser = subparsers.add_parser('status', help='Show the checkpoint of a migration')
+    status_parser.add_argument('name', choices=sorted(MIGRATIONS))
+
+    for sub in (run_parser, status_parser):
+        sub.add_argument('--checkpoint', choices=['local', 'firestore'], default='local',
+                         help=f'Store checkpoints in {LOCAL_CHECKPOINT_DIR}/ or in {CHECKPOINT_COLLECTION}/ (default local)')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for migration in MIGRATIONS.values():
+            print(f"{migration.name} v{migration.version}: {migration.description}")
+        return
+
+    db = get_db()
+    if args.command == 'status':
+        print_status(args.name, db, args.checkpoint)
+    elif args.plan:
+        plan_migration(args.name, db, args.plan, page_size=args.page_size)
+    else:
+        run_migration(args.name, db, dry_run=args.dry_run, checkpoint=args.checkpoint,
+                      page_size=args.page_size, max_concurrency=args.max_concurrency,
+                      max_ops=args.max_ops, restart=args.restart)
+
+if __name__ == '__main__':
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted - run again to resume from the last checkpoint")
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Move legacy product images into the products/{barcode}/ layout
+Usage:
+  python3 migrate_legacy_images.py --dry-run     # what would be copied
+  python3 migrate_legacy_images.py               # copy, then repoint the products
+  python3 migrate_legacy_images.py --verify      # compare source/destination hashes
+  python3 migrate_legacy_images.py --verify --recopy
+
+Product `images`/`primaryImageUrl` URLs that point into this bucket but
+outside a products/{barcode}/ folder (the admin_dashboard_legacy.dart
+products/{category}/ uploads) are copied to
+products/{barcode}/legacy_{name}, one copy per product that uses them.
+
+Copies are server-side rewrite calls run in parallel, so the bytes never
+leave Cloud Storage. The new blobs get the same immutable cache headers and
+public URLs as upload_images.py. Every finished copy (destination, source,
+MD5, URL) is saved in a local checkpoint, so an interrupted run resumes
+with the copies still missing. Products are then updated in batches, each
+legacy URL replaced in place by its copy's URL; products already pointing
+at products/{barcode}/ have nothing left to change.
+
+--verify re-reads the metadata of every checkpointed pair and compares the
+server-side MD5 (CRC32C for composite objects) of source and destination;
+--recopy copies the ones that differ or are missing again.
+
+The legacy blobs are left in place: the Realtime Database read by
+admin_dashboard_legacy.dart still references them. Delete them together
+with that screen once --verify passes.
+"""
+
+import argparse
+import json
+import os
+import posixpath
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from firebase_admin import firestore
+from firebase_app import get_bucket, get_db
+from firestore_scan import iter_docs
+from gc_product_images import PRODUCT_FOLDER_RE, blob_name_from_url, thread_bucket
+from patch_image_metadata import IMMUTABLE_CACHE_CONTROL, content_type_for
+from write_executor import WriteExecutor, print_failures, update
+
+CHECKPOINT_PATH = '.legacy_images.json'
+
+# Copies between checkpoint saves
+SAVE_EVERY = 200
+
+def legacy_name(url, bucket_name):
+    """Blob name of a URL in this bucket that is not in a products/{barcode}/ folder, else None"""
+    name = blob_name_from_url(url, bucket_name)
+    if name is None or PRODUCT_FOLDER_RE.match(name):
+        return None
+    return name
+
+def destination_name(barcode, source):
+    # Legacy names are already unique (product_<ms>_<file>)
+    return f'products/{barcode}/legacy_{posixpath.basename(source)}'
+
+def plan(db, bucket_name):
+    """
+    ({barcode: {'images', 'primaryImageUrl'}} of products with legacy URLs,
+     {destination: source} copies they need)
+    """
+    products = {}
+    copies = {}
+    for snapshot in iter_docs(db.collection('products').select(['images', 'primaryImageUrl']), 1000):
+        data = snapshot.to_dict()
+        urls = list(data.get('images') or []) + [data.get('primaryImageUrl')]
+        sources = {legacy_name(url, bucket_name) for url in urls if isinstance(url, str)} - {None}
+        if not sources:
+            continue
+        products[snapshot.id] = data
+        for source in sources:
+            copies[destination_name(snapshot.id, source)] = source
+    return products, copies
+
+class Checkpoint:
+    """{destination: {'source', 'md5', 'crc32c', 'url'}} of finished copies, saved as JSON"""
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.unsaved = 0
+        self.copies = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.copies = json.load(f)
+
+    def add(self, destination, entry):
+        with self.lock:
+            self.copies[destination] = entry
+            self.unsaved += 1
+            if self.unsaved >= SAVE_EVERY:
+                self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.copies, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        self.unsaved = 0
+
+def copy_image(local, bucket_name, destination, source):
+    """Server-side copy with the upload_images.py metadata; returns the checkpoint entry"""
+    bucket = thread_bucket(local, bucket_name)
+    source_blob = bucket.blob(source)
+    target = bucket.blob(destination)
+    target.cache_control = IMMUTABLE_CACHE_CONTROL
+    target.content_type = content_type_for(destination) or 'image/jpeg'
+    # Large or cross-class copies take several rewrite calls
+    token, _, _ = target.rewrite(source_blob)
+    while token is not None:
+        token, _, _ = target.rewrite(source_blob, token=token)
+    target.make_public()
+    return {'source': source, 'md5': target.md5_hash, 'crc32c': target.crc32c, 'url': target.public_url}
+
+def run_copies(bucket_name, todo, checkpoint, workers):
+    """Copy {destination: source} in parallel; returns [(destination, error)]"""
+    local = threading.local()
+    errors = []
+    done = 0
+
+    def job(item):
+        destination, source = item
+        try:
+            checkpoint.add(destination, copy_image(local, bucket_name, destination, source))
+            return None
+        except Exception as e:
+            return destination, e
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(job, todo.items()):
+            done += 1
+            if result is not None:
+                errors.append(result)
+            if done % 500 == 0:
+                print(f"   📋 {done:,}/{len(todo):,} copied")
+    checkpoint.save()
+    return errors
+
+def repointed(barcode, data, bucket_name, copies):
+    """The product's update with legacy URLs replaced by their copies, or None"""
+    def new_url(url):
+        source = legacy_name(url, bucket_name) if isinstance(url, str) else None
+        entry = copies.get(destination_name(barcode, source)) if source else None
+        return entry['url'] if entry else url
+
+    images = [new_url(url) for url in data.get('images') or []]
+    changes = {}
+    if images != list(data.get('images') or []):
+        changes['images'] = images
+    primary = data.get('primaryImageUrl')
+    if primary and new_url(primary) != primary:
+        changes['primaryImageUrl'] = new_url(primary)
+    if not changes:
+        return None
+    changes['updatedAt'] = firestore.SERVER_TIMESTAMP
+    return changes
+
+def verify(bucket, copies, workers):
+    """[(destination, problem)] for checkpointed copies whose hashes don't match"""
+    local = threading.local()
+
+    def check(item):
+        destination, entry = item
+        bucket_ = thread_bucket(local, bucket.name)
+        source, target = bucket_.get_blob(entry['source']), bucket_.get_blob(destination)
+        if target is None:
+            return destination, 'destination missing'
+        if source is None:
+            # The legacy blob was deleted after copying; the checkpointed hash still vouches for it
+            source_md5, source_crc = entry.get('md5'), entry.get('crc32c')
+        else:
+            source_md5, source_crc = source.md5_hash, source.crc32c
+        if source_md5 and target.md5_hash:
+            return None if source_md5 == target.md5_hash else (destination, 'MD5 differs')
+        return None if source_crc == target.crc32c else (destination, 'CRC32C differs')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [result for result in executor.map(check, copies.items()) if result is not None]
+
+def migrate_legacy_images(args):
+    db = get_db(args.key)
+    bucket = get_bucket(args.key, args.bucket)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    if args.verify:
+        print(f"🔍 Verifying {len(checkpoint.copies):,} copies in gs://{bucket.name}\n")
+        problems = verify(bucket, checkpoint.copies, args.workers)
+        for destination, problem in problems[:args.show]:
+            print(f"   ❌ {destination}: {problem}")
+        recopy_errors = []
+        if problems and args.recopy:
+            # The products already point at the destinations; copy over them in place
+            recopy = {destination: checkpoint.copies[destination]['source'] for destination, _ in problems}
+            recopy_errors = run_copies(bucket.name, recopy, checkpoint, args.workers)
+        print(f"\n{'='*60}")
+        print(f"✅ Matching: {len(checkpoint.copies) - len(problems):,}")
+        if problems and args.recopy:
+            print(f"🔁 Copied again: {len(problems) - len(recopy_errors):,}" + (f", failed: {len(recopy_errors):,}" if recopy_errors else ''))
+        elif problems:
+            print(f"❌ Mismatched or missing: {len(problems):,} (copy them again with --verify --recopy)")
+        print(f"{'='*60}")
+        return not problems or (args.recopy and not recopy_errors)
+
+    mode = 'DRY RUN' if args.dry_run else 'LIVE'
+    print(f"🖼️  Legacy product images in gs://{bucket.name} [{mode}]\n")
+    products, copies = plan(db, bucket.name)
+    todo = {dest: source for dest, source in copies.items() if dest not in checkpoint.copies}
+    print(f"📦 {len(products):,} products use {len(set(copies.values())):,} legacy images")
+    print(f"📋 Copies: {len(copies):,} needed, {len(copies) - len(todo):,} already done")
+    if args.dry_run:
+        for dest, source in list(todo.items())[:args.show]:
+            print(f"   {source} → {dest}")
+        return True
+
+    errors = run_copies(bucket.name, todo, checkpoint, args.workers) if todo else []
+    for destination, error in errors[:args.show]:
+        print(f"   ❌ {copies[destination]} → {destination}: {error}")
+
+    writes = []
+    for barcode, data in products.items():
+        changes = repointed(barcode, data, bucket.name, checkpoint.copies)
+        if changes:
+            writes.append(update(db.collection('products').document(barcode), changes))
+    with WriteExecutor(db) as executor:
+        executor.submit(writes)
+    failed = sum(len(batch) for batch, _ in executor.failures)
+
+    print(f"\n{'='*60}")
+    print(f"📋 Copied: {len(todo) - len(errors):,}" + (f", failed: {len(errors):,}" if errors else ''))
+    print(f"🔗 Products repointed: {len(writes) - failed:,}")
+    print_failures(executor.failures)
+    print(f"{'='*60}")
+    if errors or failed:
+        print("Run again to retry; finished copies are not repeated")
+    else:
+        print("Next: --verify, then delete admin_dashboard_legacy.dart")
+    return not (errors or failed)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Copy legacy product images into products/{barcode}/ and repoint the products')
+    parser.add_argument('--dry-run', action='store_true', help="Show the copies but don't copy or write")
+    parser.add_argument('--verify', action='store_true', help='Compare source and destination hashes of every copy')
+    parser.add_argument('--recopy', action='store_true', help='With --verify, copy mismatched or missing destinations again')
+    parser.add_argument('--workers', type=int, default=16, help='Parallel copies/metadata reads (default 16)')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help=f'Progress file (default {CHECKPOINT_PATH})')
+    parser.add_argument('--show', type=int, default=20, help='Copies/problems to print (default 20)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    parser.add_argument('--bucket', help="Bucket name (default: <projectId>.firebasestorage.app)")
+    args = parser.parse_args()
+
+    try:
+        ok = migrate_legacy_images(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user (finished copies are in the checkpoint)")
+        ok = False
+    if not ok:
+        sys.exit(1)
@@ -11,10 +11,10 @@ Este script:
 Ejecutar: python migrate_temas.py
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 from collections import defaultdict
 from datetime import datetime
+from firebase_app import get_db
+from write_executor import WriteExecutor, print_failures, set_doc
 
 def migrate_temas():
     """Migrar temas de productos a colección separada."""
@@ -24,8 +24,7 @@ def migrate_temas():
     # Inicializar Firebase Admin SDK
     # NOTA: Debes descargar tu serviceAccountKey.json de Firebase Console
     try:
-        cred = credentials.Certificate('serviceAccountKey.json')
-        firebase_admin.initialize_app(cred)
+        db = get_db()
         print("✅ Firebase inicializado correctamente")
     except Exception as e:
         print(f"❌ Error al inicializar Firebase: {e}")
@@ -33,8 +32,6 @@ def migrate_temas():
         print("   Descárgalo desde: Firebase Console > Project Settings > Service Accounts")
         return
     
-    db = firestore.client()
-    
     # 1. Leer todos los productos
     print("\n📖 Leyendo productos...")
     products_ref = db.collection('products')
@@ -62,27 +59,29 @@ def migrate_temas():
     # 3. Crear documentos en colección temas
     print("📝 Creando colección de temas...")
     temas_ref = db.collection('temas')
-    batch = db.batch()
+    writes = []
     
     for tema, count in sorted(tema_count.items()):
-        tema_doc_ref = temas_ref.document(tema)
-        batch.set(tema_doc_ref, {
+        writes.append(set_doc(temas_ref.document(tema), {
             'name': tema,
             'productCount': count,
             'createdAt': tema_first_seen.get(tema, datetime.now()),
             'lastUsed': datetime.now(),
-        })
+        }))
         print(f"  ✓ {tema}: {count} producto(s)")
     
-    # 4. Commit batch
-    try:
-        batch.commit()
+    # 4. Commit (lotes de 500, con reintentos)
+    with WriteExecutor(db) as executor:
+        executor.submit(writes)
+    
+    if executor.failures:
+        print(f"\n❌ Error al guardar temas:")
+        print_failures(executor.failures)
+    else:
         print(f"\n✅ Migración completada exitosamente!")
         print(f"   - {len(tema_count)} temas migrados")
         print(f"   - {total_products} productos procesados")
         print(f"\n🎉 Ahora los temas se cargan desde la colección 'temas'")
-    except Exception as e:
-        print(f"\n❌ Error al guardar temas: {e}")
 
 if __name__ == '__main__':
     migrate_temas()
@@ -0,0 +1,218 @@
+"""
+Resumable migration framework for Firestore data changes
+Usage: from migration_runner import register_migration, update, run_migration
+(command line: see migrate.py)
+
+A migration is a registered, versioned transform over a query (see
+migrations.py). The runner:
+- scans the query with cursor pagination (one page in memory)
+- turns each document into zero or more writes via the transform
+- commits the writes of a page through write_executor.WriteExecutor
+  (batches of up to 500, adaptive concurrency, retry with backoff)
+- saves a checkpoint (last document path + counters) after every page,
+  locally in .migrations/ or in a _migrations/{name}_v{version} doc
+- ramps traffic following Firestore's 500/50/5 rule: start at 500 ops/s
+  and raise the limit 50% every 5 minutes
+
+A crash resumes from the last checkpoint, so the page in progress is
+re-applied: transforms must be idempotent (check before writing).
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from firestore_scan import cursor_from_path, iter_pages
+from write_executor import WriteExecutor, delete, print_failures, set_doc, update  # noqa: F401  (re-exported for migrations.py)
+
+# 500/50/5: 500 ops/s, +50% every 5 minutes
+RAMP_INITIAL_OPS = 500
+RAMP_INCREASE = 1.5
+RAMP_INTERVAL_SECONDS = 5 * 60
+
+CHECKPOINT_COLLECTION = '_migrations'
+LOCAL_CHECKPOINT_DIR = '.migrations'
+
+Migration = namedtuple('Migration', ['name', 'version', 'description', 'query', 'transform'])
+
+MIGRATIONS = {}
+
+def register_migration(name, version, query, description=''):
+    """
+    Decorator registering `transform(snapshot, db) -> [Write, ...]`
+
+    query: function(db) -> the Query/CollectionReference to scan
+    """
+    def decorator(transform):
+        MIGRATIONS[name] = Migration(name, version, description or (transform.__doc__ or '').strip(), query, transform)
+        return transform
+    return decorator
+
+class RampLimiter:
+    """Token bucket whose rate follows the 500/50/5 ramp-up rule"""
+
+    def __init__(self, initial_ops=RAMP_INITIAL_OPS, max_ops=None):
+        self.initial_ops = initial_ops
+        self.max_ops = max_ops
+        self.started = time.monotonic()
+        self.tokens = float(initial_ops)
+        self.last_refill = self.started
+        self.lock = threading.Lock()
+
+    def current_rate(self):
+        steps = int((time.monotonic() - self.started) // RAMP_INTERVAL_SECONDS)
+        rate = self.initial_ops * (RAMP_INCREASE ** steps)
+        return min(rate, self.max_ops) if self.max_ops else rate
+
+    def acquire(self, ops):
+        """Block until `ops` writes may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                rate = self.current_rate()
+                self.tokens = min(rate, self.tokens + (now - self.last_refill) * rate)
+                self.last_refill = now
+                # A batch larger than one second's budget waits for a full bucket
+                needed = min(ops, rate)
+                if self.tokens >= needed:
+                    self.tokens -= needed
+                    return
+                wait = (needed - self.tokens) / rate
+            time.sleep(wait)
+
+class LocalCheckpoint:
+    """Checkpoint stored as .migrations/{name}_v{version}.json"""
+
+    def __init__(self, migration):
+        self.path = os.path.join(LOCAL_CHECKPOINT_DIR, f'{migration.name}_v{migration.version}.json')
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state):
+        os.makedirs(LOCAL_CHECKPOINT_DIR, exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+class FirestoreCheckpoint:
+    """Checkpoint stored in _migrations/{name}_v{version}"""
+
+    def __init__(self, migration, db):
+        self.ref = db.collection(CHECKPOINT_COLLECTION).document(f'{migration.name}_v{migration.version}')
+
+    def load(self):
+        doc = self.ref.get()
+        return doc.to_dict() if doc.exists else None
+
+    def save(self, state):
+        self.ref.set(state)
+
+def checkpoint_store(migration, db, checkpoint):
+    """checkpoint: 'local' or 'firestore'"""
+    if checkpoint == 'firestore':
+        return FirestoreCheckpoint(migration, db)
+    return LocalCheckpoint(migration)
+
+def new_state(migration):
+    return {
+        'name': migration.name,
+        'version': migration.version,
+        'status': 'running',
+        'lastPath': None,
+        'scanned': 0,
+        'writes': 0,
+        'pages': 0,
+        'startedAt': datetime.now(timezone.utc).isoformat(),
+        'updatedAt': None,
+    }
+
+def run_migration(name, db, dry_run=False, checkpoint='local', page_size=500,
+                  max_concurrency=16, max_ops=None, restart=False):
+    """Run (or resume) a registered migration; returns the final state dict"""
+    migration = MIGRATIONS[name]
+    store = checkpoint_store(migration, db, checkpoint)
+
+    state = None if (restart or dry_run) else store.load()
+    if state and state.get('status') == 'done':
+        print(f"✅ {name} v{migration.version} already completed ({state['writes']:,} writes). Use --restart to run again.")
+        return state
+    if state:
+        print(f"↩️  Resuming {name} v{migration.version} after {state['lastPath']} ({state['scanned']:,} docs scanned)")
+        start_after = cursor_from_path(db, state['lastPath']) if state['lastPath'] else None
+    else:
+        state = new_state(migration)
+        start_after = None
+
+    mode = 'DRY RUN' if dry_run else 'LIVE'
+    print(f"🔧 {name} v{migration.version} [{mode}]: {migration.description}\n")
+
+    limiter = RampLimiter(max_ops=max_ops)
+    started = time.monotonic()
+    with WriteExecutor(db, max_concurrency=max_concurrency, limiter=limiter) as executor:
+        for page in iter_pages(migration.query(db), page_size, start_after):
+            writes = []
+            for snapshot in page:
+                writes.extend(migration.transform(snapshot, db))
+
+            if writes and not dry_run:
+                executor.submit(writes)
+                executor.flush()
+                # Never checkpoint past a page whose writes didn't all land
+                if executor.failures:
+                    print_failures(executor.failures)
+                    raise RuntimeError(f"{name}: writes failed on the page after {state['lastPath']}; "
+                                       f"fix the cause and run again to resume")
+
+            state['scanned'] += len(page)
+            state['writes'] += len(writes)
+            state['pages'] += 1
+            state['lastPath'] = page[-1].reference.path
+            state['updatedAt'] = datetime.now(timezone.utc).isoformat()
+            if not dry_run:
+                store.save(state)
+
+            elapsed = time.monotonic() - started
+            print(f"   📄 page {state['pages']}: {state['scanned']:,} scanned, "
+                  f"{state['writes']:,} {'planned' if dry_run else 'written'} "
+                  f"({limiter.current_rate():,.0f} ops/s limit, {executor.current_concurrency()} batches in flight, {elapsed:.0f}s)")
+
+    state['status'] = 'done'
+    state['updatedAt'] = datetime.now(timezone.utc).isoformat()
+    if not dry_run:
+        store.save(state)
+
+    print(f"\n{'='*60}")
+    print(f"✅ {name} v{migration.version} {'dry run' if dry_run else 'migration'} complete")
+    print(f"   Documents scanned: {state['scanned']:,}")
+    print(f"   Writes {'planned' if dry_run else 'applied'}: {state['writes']:,}")
+    print(f"{'='*60}")
+    return state
+
+def plan_migration(name, db, plan_path, page_size=500):
+    """Scan and transform like run_migration, but write the writes to a plan file (see plan_executor.py)"""
+    from plan_executor import PlanWriter
+
+    migration = MIGRATIONS[name]
+    print(f"📝 {name} v{migration.version} [PLAN → {plan_path}]: {migration.description}\n")
+
+    scanned = 0
+    with PlanWriter(plan_path, f'{name} v{migration.version}') as plan:
+        for page in iter_pages(migration.query(db), page_size):
+            for snapshot in page:
+                plan.add(migration.transform(snapshot, db))
+            scanned += len(page)
+            print(f"   📄 {scanned:,} scanned, {plan.writes:,} planned")
+
+    print(f"\n{'='*60}")
+    print(f"✅ {name} v{migration.version} planned")
+    print(f"   Documents scanned: {scanned:,}")
+    print(f"   Writes planned: {plan.writes:,}" + (f" ({plan.dropped:,} repeated writes dropped)" if plan.dropped else ''))
+    print(f"Next: python3 apply_plan.py apply {plan_path} --workers 8")
+    print(f"{'='*60}")
@@ -0,0 +1,86 @@
+"""
+Registered migrations for migrate.py
+Usage: python3 migrate.py list
+
+Each transform receives one DocumentSnapshot and returns the writes for it.
+Transforms must be idempotent: a resumed run re-applies the last page.
+Bump the version when a migration's logic changes so it runs again.
+"""
+
+from firebase_admin import firestore
+from migration_runner import register_migration, set_doc, update
+
+@register_migration('add_display_order', version=1, query=lambda db: db.collection('products'))
+def add_display_order(snapshot, db):
+    """Add displayOrder=0 to products that don't have it"""
+    if 'displayOrder' in snapshot.to_dict():
+        return []
+    return [update(snapshot.reference, {'displayOrder': 0})]
+
+# primaryCategory -> (ID of its first flat doc, write for the primary doc or None),
+# built once per primary per process
+_primary_category_writes = {}
+
+def primary_category_write(db, primary):
+    """
+    (first flat doc ID, write or None) for categories/{primary}
+
+    categories_list_screen.dart orders primaries by displayOrder, which hides
+    docs without it. Fields are only filled in where missing (v1 wrote no
+    displayOrder/coverImageUrl/createdAt), so reruns keep later edits such as
+    a deactivated primary. Every sibling shares the first one's values and
+    only the first one writes, so siblings never disagree.
+    """
+    if primary not in _primary_category_writes:
+        siblings = sorted(db.collection('categories').where('primaryCategory', '==', primary).stream(),
+                          key=lambda doc: doc.id)
+        first = siblings[0].to_dict()
+        existing = db.collection('categories').document(primary).get()
+        existing = existing.to_dict() if existing.exists else {}
+        fields = {
+            'name': primary,
+            'primaryCode': first['primaryCode'],
+            'coverImageUrl': None,  # To be set manually via admin
+            'isActive': True,
+            'displayOrder': first.get('displayOrder', 0),  # Use first sub's order
+            'createdAt': firestore.SERVER_TIMESTAMP,
+        }
+        primary_data = {field: value for field, value in fields.items() if field not in existing}
+        write = None
+        if primary_data:
+            primary_data['updatedAt'] = firestore.SERVER_TIMESTAMP
+            write = set_doc(db.collection('categories').document(primary), primary_data, merge=True)
+        _primary_category_writes[primary] = (siblings[0].id, write)
+    return _primary_category_writes[primary]
+
+@register_migration('nested_categories', version=3, query=lambda db: db.collection('categories'))
+def nested_categories(snapshot, db):
+    """Copy flat categories into categories/{primaryCategory}/subcategories/{code}"""
+    data = snapshot.to_dict()
+
+    # Only the old flat documents carry primaryCategory; primary docs are skipped
+    primary = data.get('primaryCategory')
+    if not primary:
+        return []
+
+    primary_ref = db.collection('categories').document(primary)
+    first_id, primary_write = primary_category_write(db, primary)
+    writes = [primary_write] if snapshot.id == first_id and primary_write else []
+
+    writes.append(
+        set_doc(primary_ref.collection('subcategories').document(snapshot.id), {
+            'code': data['code'],
+            'name': data['name'],
+            'subcategoryName': data.get('subcategoryName'),
+            'defaultPrice': data.get('defaultPrice'),
+            'coverImageUrl': data.get('coverImageUrl'),
+            'bulkPricing': data.get('bulkPricing'),
+            'hasSubcategories': data.get('hasSubcategories', False),
+            'isActive': data.get('isActive', True),
+            'displayOrder': data.get('displayOrder', 0),
+            'createdAt': data.get('createdAt', firestore.SERVER_TIMESTAMP),
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+            'notes': data.get('notes'),
+        }),
+    )
+    return writes
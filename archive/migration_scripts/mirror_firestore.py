@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Keep a local SQLite mirror of the cash collections up to date with on_snapshot listeners
+Usage:
+  python3 mirror_firestore.py                         # run until Ctrl-C (mirror.sqlite)
+  python3 mirror_firestore.py --db /tmp/mirror.sqlite --once
+  python3 mirror_firestore.py --status
+  python3 mirror_firestore.py --emulator localhost:8080 --db /tmp/emulator.sqlite
+
+One listener per collection in MIRRORED (products, sales, deposits,
+pendingCash and its pendingCashShards/pendingSales groups) applies every
+change to a `documents` table, each snapshot in one SQLite transaction.
+Fields the checks filter on have partial expression indexes, so readers
+such as check_deposits_flow.py --mirror and cleanup_pending_cash.py --mirror
+answer from indexed SQL instead of re-reading whole collections.
+
+Every row keeps its document's update_time and every collection its last
+read_time (the watermark). A listener always opens with the full result,
+so after a restart only documents whose update_time changed are rewritten
+and documents missing from it are deleted; the rest of the mirror stays as
+it was. The daemon writes a heartbeat per collection while its listener is
+live and caught up, and readers name the collections they use: a mirror
+that never synced one of them (e.g. one run with --only) or whose heartbeat
+for it is too old is refused.
+
+The listener source is injectable: MemorySource is an in-process stand-in
+that emits the same change events (for tests and dry runs), and --emulator
+points the real listeners at a local Firestore emulator.
+"""
+
+import argparse
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timezone
+from firebase_app import get_db, get_emulator_db
+from firestore_json import decode_value, dumps_record, encode_value
+from pending_cash import PENDING_SALES, SHARDS, summarize
+
+DEFAULT_DB = 'mirror.sqlite'
+
+# Collection (or collection group) -> fields to index, as json paths into the data
+MIRRORED = {
+    'products': {'indexes': [('categoryCode',), ('updatedAt.value',)]},
+    'sales': {'indexes': [('paymentMethod', 'status'), ('depositId',), ('createdAt.value',)]},
+    'deposits': {'indexes': [('source',), ('depositedAt.value',)]},
+    'pendingCash': {},
+    SHARDS: {'group': True},
+    PENDING_SALES: {'group': True},
+}
+
+# What mirror_pending_cash() reads
+PENDING_CASH_COLLECTIONS = ('pendingCash', SHARDS, PENDING_SALES)
+
+# Seconds between heartbeats / listener health checks
+HEARTBEAT_SECONDS = 5
+
+# Max heartbeat age for readers that only report, and for readers that write back
+MAX_READ_AGE = 15 * 60
+MAX_WRITE_AGE = 60
+
+# Host parameters per IN (...) lookup (SQLite's default limit is 999)
+LOOKUP_CHUNK = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    collection TEXT NOT NULL,
+    data TEXT NOT NULL,
+    update_time TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS documents_collection ON documents(collection);
+CREATE TABLE IF NOT EXISTS watermarks (
+    collection TEXT PRIMARY KEY,
+    read_time TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# kind: 'ADDED' | 'MODIFIED' | 'REMOVED'; data is None for REMOVED
+Change = namedtuple('Change', ['kind', 'path', 'data', 'update_time'])
+
+class MirrorDoc(namedtuple('MirrorDoc', ['path', 'data'])):
+    """A mirrored document with the parts of the DocumentSnapshot API the scripts use"""
+    exists = True
+
+    @property
+    def id(self):
+        return self.path.rsplit('/', 1)[1]
+
+    def to_dict(self):
+        return self.data
+
+def timestamp_key(value):
+    """Fixed-width UTC string (nanoseconds) for an update/read time, so keys sort as times"""
+    if value is None:
+        return ''
+    if hasattr(value, 'ToDatetime'):  # protobuf Timestamp
+        nanos = value.nanos
+        value = value.ToDatetime(tzinfo=timezone.utc)
+    else:
+        nanos = getattr(value, 'nanosecond', value.microsecond * 1000)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime('%Y-%m-%dT%H:%M:%S') + f'.{nanos:09d}Z'
+
+def collection_of(path):
+    """'pendingCash/store/pendingSales/abc' -> 'pendingSales'"""
+    return path.rsplit('/', 2)[-2]
+
+def field(name):
+    """SQL expression for a data field (same text as the indexes, so they are used)"""
+    if not re.fullmatch(r'[\w.]+', name):
+        raise ValueError(f'Bad field name: {name}')
+    return f"json_extract(data, '$.{name}')"
+
+def checked_collection(collection):
+    # Collection names are inlined (not bound) so SQLite can match the partial indexes
+    if collection not in MIRRORED:
+        raise ValueError(f'{collection} is not mirrored (see MIRRORED)')
+    return collection
+
+class Mirror:
+    """The SQLite side: applies change events and answers queries"""
+
+    def __init__(self, path=DEFAULT_DB, readonly=False):
+        self.path = path
+        if readonly:
+            self.conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            return
+        self.conn = sqlite3.connect(path)
+        # WAL lets the scripts read while the daemon writes
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        for collection, options in MIRRORED.items():
+            for fields in options.get('indexes', []):
+                name = '_'.join([collection, *fields]).replace('.', '_')
+                columns = ', '.join(field(f) for f in fields)
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON documents({columns}) "
+                                  f"WHERE collection = '{collection}'")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def apply(self, collection, changes, read_time, initial=False):
+        """
+        Apply one snapshot's changes in a single transaction
+
+        initial: the changes are the listener's full first result; documents
+        whose update_time is already mirrored are skipped and mirrored
+        documents not in it are deleted.
+        Returns: Counter of 'upserted', 'removed', 'unchanged'
+        """
+        counts = Counter()
+        with self.conn:
+            known = None
+            if initial:
+                known = dict(self.conn.execute(
+                    'SELECT path, update_time FROM documents WHERE collection = ?', (collection,)))
+            seen = set()
+            for change in changes:
+                if change.kind == 'REMOVED':
+                    cursor = self.conn.execute('DELETE FROM documents WHERE path = ?', (change.path,))
+                    counts['removed'] += cursor.rowcount
+                    continue
+                seen.add(change.path)
+                if known is not None and known.get(change.path) == change.update_time:
+                    counts['unchanged'] += 1
+                    continue
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO documents (path, collection, data, update_time) VALUES (?, ?, ?, ?)',
+                    (change.path, collection, dumps_record(encode_value(change.data)), change.update_time))
+                counts['upserted'] += 1
+            if known is not None:
+                gone = [(path,) for path in known if path not in seen]
+                self.conn.executemany('DELETE FROM documents WHERE path = ?', gone)
+                counts['removed'] += len(gone)
+            self.conn.execute('INSERT OR REPLACE INTO watermarks (collection, read_time, synced_at) VALUES (?, ?, ?)',
+                              (collection, read_time, time.time()))
+        return counts
+
+    def analyze(self):
+        # Without statistics SQLite prefers the collection index over the ordered field indexes
+        with self.conn:
+            self.conn.execute('ANALYZE')
+
+    def heartbeat(self, collections):
+        """Vouch that the listeners of `collections` are live and caught up"""
+        now = str(time.time())
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                  [(f'heartbeat:{collection}', now) for collection in collections])
+
+    def age(self, collection):
+        """Seconds since the daemon last confirmed the collection's listener live, None if never"""
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (f'heartbeat:{collection}',)).fetchone()
+        return time.time() - float(row[0]) if row else None
+
+    def synced(self, collection):
+        """Whether a first snapshot of the collection was ever applied"""
+        return self.conn.execute('SELECT 1 FROM watermarks WHERE collection = ?', (collection,)).fetchone() is not None
+
+    def status(self):
+        """[(collection, documents, read_time, synced_at, heartbeat age)] for every mirrored collection"""
+        counts = dict(self.conn.execute('SELECT collection, COUNT(*) FROM documents GROUP BY collection'))
+        marks = {row[0]: row[1:] for row in self.conn.execute('SELECT collection, read_time, synced_at FROM watermarks')}
+        return [(collection, counts.get(collection, 0), *marks.get(collection, (None, None)), self.age(collection))
+                for collection in MIRRORED]
+
+    def docs(self, collection, where=None, params=(), order_by=None, limit=None):
+        """
+        MirrorDocs of a collection; where/order_by are SQL over field() expressions
+
+        e.g. mirror.docs('sales', f"{field('paymentMethod')} = ?", ['efectivo'])
+        """
+        sql = f"SELECT path, data FROM documents WHERE collection = '{checked_collection(collection)}'"
+        if where:
+            sql += f' AND ({where})'
+        if order_by:
+            sql += f' ORDER BY {order_by}'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return [MirrorDoc(path, decode_value(json.loads(data))) for path, data in self.conn.execute(sql, list(params))]
+
+    def get(self, collection, doc_ids):
+        """{doc_id: MirrorDoc} for the ids of a top-level collection that are mirrored"""
+        paths = [f'{checked_collection(collection)}/{doc_id}' for doc_id in doc_ids]
+        found = {}
+        for i in range(0, len(paths), LOOKUP_CHUNK):
+            chunk = paths[i:i + LOOKUP_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT path, data FROM documents WHERE path IN ({', '.join('?' * len(chunk))})", chunk)
+            for path, data in rows:
+                doc = MirrorDoc(path, decode_value(json.loads(data)))
+                found[doc.id] = doc
+        return found
+
+    def pairs(self, collection):
+        """(path, data) pairs, the shape pending_cash.summarize() takes"""
+        return [(doc.path, doc.data) for doc in self.docs(collection)]
+
+def open_mirror(path, collections, max_age=MAX_READ_AGE):
+    """
+    Read-only Mirror for reading `collections`; RuntimeError if any of them
+    was never synced or its heartbeat is older than max_age
+    """
+    if not os.path.exists(path):
+        raise RuntimeError(f'{path} not found (run mirror_firestore.py)')
+    mirror = Mirror(path, readonly=True)
+    oldest = 0
+    for collection in collections:
+        checked_collection(collection)
+        if not mirror.synced(collection):
+            raise RuntimeError(f'{path} has never mirrored {collection} (run mirror_firestore.py without --only)')
+        age = mirror.age(collection)
+        if age is None:
+            raise RuntimeError(f'{path} has not finished its first sync of {collection} (run mirror_firestore.py)')
+        if age > max_age:
+            raise RuntimeError(f'{path} is {age:.0f}s old for {collection} (max {max_age}s); is mirror_firestore.py running?')
+        oldest = max(oldest, age)
+    print(f"🪞 Reading {path} (heartbeat {oldest:.0f}s ago)")
+    return mirror
+
+def mirror_pending_cash(mirror):
+    """pending_cash.summarize() of the mirrored layout"""
+    return summarize(*(mirror.pairs(collection) for collection in PENDING_CASH_COLLECTIONS))
+
+class FirestoreSource:
+    """Change events from on_snapshot listeners"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def listen(self, collection, callback):
+        """
+        Call callback(changes, read_time, initial) on every snapshot, from the
+        listener's thread; returns the Watch (unsubscribe(), is_active)
+        """
+        query = (self.db.collection_group(collection) if MIRRORED[collection].get('group')
+                 else self.db.collection(collection))
+        first = [True]
+
+        def on_snapshot(_, changes, read_time):
+            events = []
+            for change in changes:
+                snapshot = change.document
+                if change.type.name == 'REMOVED':
+                    events.append(Change('REMOVED', snapshot.reference.path, None, ''))
+                else:
+                    events.append(Change(change.type.name, snapshot.reference.path,
+                                         snapshot.to_dict(), timestamp_key(snapshot.update_time)))
+            callback(events, timestamp_key(read_time), first[0])
+            first[0] = False
+
+        return query.on_snapshot(on_snapshot)
+
+class MemorySource:
+    """
+    In-process stand-in for FirestoreSource: set()/delete() emit the change
+    events a listener on that document's collection would get
+    """
+
+    class Handle:
+        def __init__(self, source, collection, callback):
+            self.source, self.collection, self.callback = source, collection, callback
+            self.is_active = True
+
+        def unsubscribe(self):
+            self.is_active = False
+            if self in self.source.listeners[self.collection]:
+                self.source.listeners[self.collection].remove(self)
+
+    def __init__(self, docs=None):
+        self.docs = {}
+        self.listeners = {collection: [] for collection in MIRRORED}
+        self.lock = threading.Lock()
+        for path, data in (docs or {}).items():
+            self.docs[path] = (data, self.now())
+
+    @staticmethod
+    def now():
+        return timestamp_key(datetime.now(timezone.utc))
+
+    def listen(self, collection, callback):
+        handle = self.Handle(self, collection, callback)
+        with self.lock:
+            self.listeners[collection].append(handle)
+            initial = [Change('ADDED', path, data, update_time)
+                       for path, (data, update_time) in self.docs.items() if collection_of(path) == collection]
+        callback(initial, self.now(), True)
+        return handle
+
+    def emit(self, path, change):
+        for handle in list(self.listeners.get(collection_of(path), [])):
+            handle.callback([change], change.update_time or self.now(), False)
+
+    def set(self, path, data):
+        with self.lock:
+            kind = 'MODIFIED' if path in self.docs else 'ADDED'
+            self.docs[path] = (data, self.now())
+        self.emit(path, Change(kind, path, data, self.docs[path][1]))
+
+    def delete(self, path):
+        with self.lock:
+            existed = self.docs.pop(path, None) is not None
+        if existed:
+            self.emit(path, Change('REMOVED', path, None, ''))
+
+def print_counts(collection, counts, initial):
+    if initial:
+        print(f"   🔄 {collection}: {counts['upserted']:,} changed, {counts['removed']:,} removed, "
+              f"{counts['unchanged']:,} unchanged since the watermark")
+    elif counts['upserted'] or counts['removed']:
+        print(f"   {collection}: +{counts['upserted']} -{counts['removed']}")
+
+def mirror_forever(mirror, source, collections=None, stop=None, once=False, heartbeat=HEARTBEAT_SECONDS):
+    """
+    Apply the sources' change events to the mirror until stop is set (or, with
+    once, until every listener's first snapshot is applied). Listeners that
+    stop streaming are reopened; their first snapshot resyncs the collection.
+    """
+    collections = list(collections or MIRRORED)
+    events = queue.Queue()
+    handles = {}
+    unsynced = set(collections)
+    analyzed = False
+
+    def start(collection):
+        handles[collection] = source.listen(
+            collection, lambda changes, read_time, initial: events.put((collection, changes, read_time, initial)))
+
+    try:
+        for collection in collections:
+            start(collection)
+        next_beat = 0
+        while not (stop and stop.is_set()):
+            try:
+                collection, changes, read_time, initial = events.get(timeout=heartbeat)
+            except queue.Empty:
+                pass
+            else:
+                print_counts(collection, mirror.apply(collection, changes, read_time, initial), initial)
+                if initial:
+                    unsynced.discard(collection)
+                    if not unsynced and not analyzed:
+                        mirror.analyze()
+                        analyzed = True
+                if once and not unsynced:
+                    mirror.heartbeat(collections)
+                    break
+            if time.monotonic() < next_beat:
+                continue
+            for collection, handle in handles.items():
+                if not handle.is_active:
+                    print(f"   ⚠️  {collection} listener stopped, reopening")
+                    handle.unsubscribe()
+                    unsynced.add(collection)
+                    start(collection)
+            # Only vouch for the collections whose listener has caught up
+            mirror.heartbeat([collection for collection in collections if collection not in unsynced])
+            next_beat = time.monotonic() + heartbeat
+    finally:
+        for handle in handles.values():
+            handle.unsubscribe()
+
+def print_status(mirror):
+    print(f"🪞 {mirror.path}\n")
+    for collection, count, read_time, synced_at, age in mirror.status():
+        synced = datetime.fromtimestamp(synced_at).strftime('%Y-%m-%d %H:%M:%S') if synced_at else 'never'
+        beat = 'never' if age is None else f'{age:.0f}s ago'
+        print(f"   {collection:<20} {count:>9,} docs   watermark {read_time or '-'}   applied {synced}   heartbeat {beat}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mirror the cash collections into a local SQLite database')
+    parser.add_argument('--db', default=DEFAULT_DB, help=f'SQLite file (default {DEFAULT_DB})')
+    parser.add_argument('--only', nargs='+', choices=list(MIRRORED), help='Mirror only these collections')
+    parser.add_argument('--once', action='store_true', help='Catch up once and exit (e.g. from cron)')
+    parser.add_argument('--status', action='store_true', help='Show the watermarks and document counts and exit')
+    parser.add_argument('--emulator', metavar='HOST:PORT', help='Listen to a local Firestore emulator instead')
+    parser.add_argument('--project-id', default='demo-xepi', help='Emulator project ID (default demo-xepi)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    mirror = Mirror(args.db)
+    if args.status:
+        print_status(mirror)
+    else:
+        db = get_emulator_db(args.emulator, args.project_id) if args.emulator else get_db(args.key)
+        print(f"🪞 Mirroring {', '.join(args.only or MIRRORED)} into {args.db}\n")
+        try:
+            mirror_forever(mirror, FirestoreSource(db), args.only, once=args.once)
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Interrupted by user")
+        print(f"\n{'='*60}")
+        print_status(mirror)
+        print(f"{'='*60}")
+    mirror.close()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Set long-lived cache headers and the right content type on product images
+Usage:
+  python3 patch_image_metadata.py --dry-run    # count blobs that need patching
+  python3 patch_image_metadata.py
+
+Product image names are unique per upload (barcode_timestamp_name), so a
+blob never changes once written: it can be cached for a year and marked
+immutable, and browsers/the Flutter image cache never need to revalidate.
+upload_images.py and the app set these headers on new uploads; this tool
+patches the blobs uploaded before that, in parallel batches of 100.
+
+Only products/{barcode}/ folders are patched; category covers and legacy
+folders reuse names (cover.jpg) and must stay revalidatable.
+"""
+
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from firebase_app import get_bucket
+from gc_product_images import list_product_blobs, thread_bucket
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif',
+}
+
+# Max calls in one Storage JSON batch request
+BATCH_PATCH_SIZE = 100
+
+def content_type_for(name):
+    """Content type from the file extension, None if unknown"""
+    return CONTENT_TYPES.get(os.path.splitext(name)[1].lower())
+
+def wanted_metadata(blob):
+    """{property: value} that differ from what the blob should have"""
+    changes = {}
+    if blob.cache_control != IMMUTABLE_CACHE_CONTROL:
+        changes['cache_control'] = IMMUTABLE_CACHE_CONTROL
+    content_type = content_type_for(blob.name)
+    # The app uploads everything as image/jpeg; fix it from the extension
+    if content_type and blob.content_type != content_type:
+        changes['content_type'] = content_type
+    return changes
+
+def patch_blob(bucket, name, changes):
+    blob = bucket.blob(name)
+    for prop, value in changes.items():
+        setattr(blob, prop, value)
+    blob.patch()
+
+def patch_chunk(local, bucket_name, items):
+    """PATCH up to BATCH_PATCH_SIZE blobs in one request; returns (patched, errors)"""
+    bucket = thread_bucket(local, bucket_name)
+    try:
+        with bucket.client.batch():
+            for name, changes in items:
+                patch_blob(bucket, name, changes)
+        return len(items), []
+    except Exception:
+        # A failed batch only reports its first error: redo it one by one
+        patched = 0
+        errors = []
+        for name, changes in items:
+            try:
+                patch_blob(bucket, name, changes)
+                patched += 1
+            except Exception as e:
+                errors.append((name, e))
+        return patched, errors
+
+def patch_image_metadata(args):
+    bucket = get_bucket(args.key, args.bucket)
+    mode = 'DRY RUN' if args.dry_run else 'LIVE'
+    print(f"🏷️  Image metadata in gs://{bucket.name}/products/ [{mode}]\n")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        blobs = list_product_blobs(bucket, executor, args.workers * 4)
+
+    todo = []
+    for blob in blobs:
+        changes = wanted_metadata(blob)
+        if changes:
+            todo.append((blob.name, changes))
+    cache_fixes = sum(1 for _, changes in todo if 'cache_control' in changes)
+    type_fixes = sum(1 for _, changes in todo if 'content_type' in changes)
+
+    print(f"📷 {len(blobs):,} blobs listed")
+    print(f"🔧 {len(todo):,} need patching ({cache_fixes:,} cache-control, {type_fixes:,} content-type)")
+
+    if args.dry_run or not todo:
+        return
+
+    chunks = [todo[i:i + BATCH_PATCH_SIZE] for i in range(0, len(todo), BATCH_PATCH_SIZE)]
+    local = threading.local()
+    patched = 0
+    errors = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for chunk_patched, chunk_errors in executor.map(lambda chunk: patch_chunk(local, bucket.name, chunk), chunks):
+            patched += chunk_patched
+            errors.extend(chunk_errors)
+
+    print(f"\n{'='*60}")
+    print(f"✅ Patched: {patched:,}")
+    if errors:
+        print(f"❌ Failed: {len(errors)}")
+        for name, error in errors[:10]:
+            print(f"   {name}: {error}")
+    print(f"{'='*60}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Patch cache-control/content-type on product images')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the blobs that need patching')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel listings/patch batches (default 8)')
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    parser.add_argument('--bucket', help='Bucket name (default: <projectId>.firebasestorage.app)')
+    args = parser.parse_args()
+
+    try:
+        patch_image_metadata(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
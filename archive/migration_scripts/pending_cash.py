@@ -0,0 +1,123 @@
+"""
+Sharded pendingCash layout (same as lib/repositories/pending_cash_repository.dart)
+Usage: from pending_cash import read_pending_cash, add_sale_writes, remove_sales_writes
+
+  pendingCash/{source}                          {source, amount, saleIds}  pre-sharding doc, still counted
+  pendingCash/{source}/pendingCashShards/{n}    {amount}                   n in 0..SHARD_COUNT-1
+  pendingCash/{source}/pendingSales/{saleId}    {total, addedAt}
+
+Pending amount = root amount + every shard's amount; pending sales = root
+saleIds + pendingSales. New cash goes to a random shard plus its own sale
+document, so writes to one source are spread over SHARD_COUNT documents and
+no array grows without bound. Removals subtract from a random shard (shards
+may go negative; only the sum means anything).
+"""
+
+import random
+from firebase_admin import firestore
+from write_executor import delete, set_doc
+
+SOURCES = ['store', 'mensajero', 'forza']
+
+SHARD_COUNT = 8
+
+SHARDS = 'pendingCashShards'
+PENDING_SALES = 'pendingSales'
+
+def root_ref(db, source):
+    return db.collection('pendingCash').document(source)
+
+def shard_ref(db, source, n=None):
+    """Shard n of a source, a random one if n is None"""
+    n = random.randrange(SHARD_COUNT) if n is None else n
+    return root_ref(db, source).collection(SHARDS).document(str(n))
+
+def pending_sale_ref(db, source, sale_id):
+    return root_ref(db, source).collection(PENDING_SALES).document(sale_id)
+
+def add_sale_writes(db, source, sale_id, total):
+    """Writes adding one sale's cash to a source"""
+    return [
+        set_doc(shard_ref(db, source), {
+            'amount': firestore.Increment(total),
+            'updatedAt': firestore.SERVER_TIMESTAMP,
+        }, merge=True),
+        set_doc(pending_sale_ref(db, source, sale_id), {
+            'total': total,
+            'addedAt': firestore.SERVER_TIMESTAMP,
+        }),
+    ]
+
+def remove_sales_writes(db, source, sale_ids, amount):
+    """Writes taking sales (and `amount` of cash) out of a source"""
+    writes = [set_doc(shard_ref(db, source), {
+        'amount': firestore.Increment(-amount),
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }, merge=True)]
+    # Sales added before sharding are listed on the root document
+    writes.append(set_doc(root_ref(db, source), {
+        'saleIds': firestore.ArrayRemove(list(sale_ids)),
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }, merge=True))
+    writes.extend(delete(pending_sale_ref(db, source, sale_id)) for sale_id in sale_ids)
+    return writes
+
+def reset_source_writes(db, source, amount, removed_sale_ids):
+    """Writes setting a source's total to `amount` and dropping stale sales (cleanup)"""
+    root = {'source': source, 'amount': amount, 'updatedAt': firestore.SERVER_TIMESTAMP}
+    if removed_sale_ids:
+        root['saleIds'] = firestore.ArrayRemove(list(removed_sale_ids))
+    writes = [set_doc(root_ref(db, source), root, merge=True)]
+    writes.extend(
+        set_doc(shard_ref(db, source, n), {'amount': 0, 'updatedAt': firestore.SERVER_TIMESTAMP}, merge=True)
+        for n in range(SHARD_COUNT)
+    )
+    writes.extend(delete(pending_sale_ref(db, source, sale_id)) for sale_id in removed_sale_ids)
+    return writes
+
+def source_of(path):
+    """'pendingCash/store/pendingSales/abc' -> 'store'"""
+    return path.split('/')[1]
+
+def summarize(root_docs, shard_docs, sale_docs):
+    """
+    {source: {'amount', 'saleIds', 'rootAmount', 'rootSaleIds'}} from
+    (path, data) pairs of the three layers; every source in SOURCES is present
+    """
+    summary = {}
+
+    def entry(path):
+        return summary.setdefault(source_of(path), {'amount': 0.0, 'saleIds': [], 'rootAmount': 0.0, 'rootSaleIds': []})
+
+    for source in SOURCES:
+        entry(f'pendingCash/{source}')
+    for path, data in root_docs:
+        source = entry(path)
+        source['rootAmount'] = float(data.get('amount') or 0)
+        source['rootSaleIds'] = list(data.get('saleIds') or [])
+        source['amount'] += source['rootAmount']
+        source['saleIds'].extend(source['rootSaleIds'])
+    for path, data in shard_docs:
+        entry(path)['amount'] += float(data.get('amount') or 0)
+    in_root = {source: set(entry['rootSaleIds']) for source, entry in summary.items()}
+    for path, _ in sale_docs:
+        sale_id = path.rsplit('/', 1)[1]
+        # A sale re-added by an old client can be in both places; count it once
+        if sale_id not in in_root.get(source_of(path), ()):
+            entry(path)['saleIds'].append(sale_id)
+    return summary
+
+def layer_queries(db):
+    """Queries for the root docs, all shards and all pending sales (sync or async client)"""
+    return (
+        db.collection('pendingCash'),
+        db.collection_group(SHARDS),
+        db.collection_group(PENDING_SALES).select(['total']),
+    )
+
+def path_pairs(snapshots):
+    return [(snapshot.reference.path, snapshot.to_dict()) for snapshot in snapshots]
+
+def read_pending_cash(db):
+    """summarize() of the live layout: three queries however many sales are pending"""
+    return summarize(*(path_pairs(query.stream()) for query in layer_queries(db)))
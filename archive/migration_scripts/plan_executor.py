@@ -0,0 +1,360 @@
+"""
+Plan/apply split for large write jobs: write the writes to a file, apply it from K processes
+Usage:
+  from plan_executor import PlanWriter
+  with PlanWriter('plans/prices.jsonl', 'materialize_prices --full') as plan:
+      plan.add(writes)                  # write_executor.Write tuples
+      plan.add(index_writes, phase=1)   # only applied once phase 0 has fully landed
+(applying and reporting: see apply_plan.py)
+
+A plan is JSON Lines: a header, one record per write ({path, kind, data,
+merge, phase}, data encoded as in firestore_json plus the write transforms)
+and a trailer with the write count and a SHA-256 of the records, so a
+truncated or edited plan is refused. Records keep the order they were added
+in and keys are sorted: the same inputs give a byte-identical plan.
+
+apply_plan() runs the phases in order. Within a phase the writes are
+sharded by a CRC32 of the document path over K worker processes, each with
+its own Firestore client (own gRPC channel) and its own bounded
+WriteExecutor, so a job is no longer held to one core and one connection.
+A plan holds at most one write per document per phase (identical repeats
+are dropped), so no two shards or concurrent batches touch the same
+document and order inside a phase doesn't matter.
+
+The plan is split once into one file per phase and shard in
+<plan>.results/, and every worker saves its shard's progress there after
+each chunk of writes: how far it got and which writes failed. The shard files are
+merged into a per-shard report, and applying again resumes, re-sending
+only unfinished and failed writes. A failed batch that holds an Increment
+and ended ambiguously (it may have been applied) is not re-sent; its
+writes are listed to be checked by hand.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from google.cloud.firestore_v1 import transforms
+from firestore_json import TYPE_KEY, decode_value, dumps_record, encode_value
+from migration_runner import RampLimiter
+from write_executor import AMBIGUOUS_ERRORS, Write, WriteExecutor, is_idempotent
+
+PLAN_FORMAT = 1
+
+# Writes a worker sends between progress saves
+CHUNK_WRITES = 5000
+
+# Batches in flight per worker process
+DEFAULT_CONCURRENCY = 8
+
+NUMERIC_TRANSFORMS = {'increment': transforms.Increment, 'maximum': transforms.Maximum, 'minimum': transforms.Minimum}
+ARRAY_TRANSFORMS = {'arrayUnion': transforms.ArrayUnion, 'arrayRemove': transforms.ArrayRemove}
+
+def encode_data(value):
+    """firestore_json.encode_value plus SERVER_TIMESTAMP, DELETE_FIELD and the numeric/array transforms"""
+    if value is transforms.SERVER_TIMESTAMP:
+        return {TYPE_KEY: 'serverTimestamp'}
+    if value is transforms.DELETE_FIELD:
+        return {TYPE_KEY: 'deleteField'}
+    for tag, cls in NUMERIC_TRANSFORMS.items():
+        if type(value) is cls:
+            return {TYPE_KEY: tag, 'value': value.value}
+    for tag, cls in ARRAY_TRANSFORMS.items():
+        if type(value) is cls:
+            return {TYPE_KEY: tag, 'values': [encode_data(item) for item in value.values]}
+    if isinstance(value, dict):
+        return {key: encode_data(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_data(item) for item in value]
+    return encode_value(value)
+
+def decode_data(value, db):
+    """Inverse of encode_data"""
+    if isinstance(value, dict):
+        tag = value.get(TYPE_KEY)
+        if tag is None:
+            return {key: decode_data(item, db) for key, item in value.items()}
+        if tag == 'serverTimestamp':
+            return transforms.SERVER_TIMESTAMP
+        if tag == 'deleteField':
+            return transforms.DELETE_FIELD
+        if tag in NUMERIC_TRANSFORMS:
+            return NUMERIC_TRANSFORMS[tag](value['value'])
+        if tag in ARRAY_TRANSFORMS:
+            return ARRAY_TRANSFORMS[tag]([decode_data(item, db) for item in value['values']])
+        return decode_value(value, db)
+    if isinstance(value, list):
+        return [decode_data(item, db) for item in value]
+    return value
+
+def decode_write(record, db):
+    data = decode_data(record['data'], db) if record['data'] is not None else None
+    return Write(record['kind'], db.document(record['path']), data, record['merge'])
+
+def shard_of(path, shards):
+    """Stable across processes and runs (unlike hash())"""
+    return zlib.crc32(path.encode('utf-8')) % shards
+
+class PlanWriter:
+    """Writes a plan file; it only appears under its name once closed without error"""
+
+    def __init__(self, path, name):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.file = open(self.tmp_path, 'w', encoding='utf-8')
+        self.digest = hashlib.sha256()
+        self.phases = Counter()
+        self.dropped = 0
+        self.seen = {}  # (phase, path) -> hash of the record
+        self.file.write(dumps_record({'plan': name, 'format': PLAN_FORMAT}) + '\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def writes(self):
+        return sum(self.phases.values())
+
+    def add(self, writes, phase=0):
+        for write in writes:
+            line = dumps_record({
+                'path': write.ref.path,
+                'kind': write.kind,
+                'data': encode_data(write.data) if write.data is not None else None,
+                'merge': write.merge,
+                'phase': phase,
+            }) + '\n'
+            key = (phase, write.ref.path)
+            if key in self.seen:
+                if self.seen[key] != hash(line):
+                    raise ValueError(f'{write.ref.path} has two different writes in phase {phase}; put one in a later phase')
+                self.dropped += 1
+                continue
+            self.seen[key] = hash(line)
+            self.digest.update(line.encode('utf-8'))
+            self.file.write(line)
+            self.phases[phase] += 1
+
+    def close(self):
+        self.file.write(dumps_record({
+            'end': True,
+            'writes': self.writes,
+            'phases': {str(phase): n for phase, n in sorted(self.phases.items())},
+            'sha256': self.digest.hexdigest(),
+        }) + '\n')
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        os.remove(self.tmp_path)
+
+def read_plan(path):
+    """(header, trailer) of a plan, after checking it is complete and unmodified"""
+    digest = hashlib.sha256()
+    count = 0
+    trailer = None
+    with open(path, encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        for line in f:
+            if line.startswith('{"end":'):
+                trailer = json.loads(line)
+                break
+            digest.update(line.encode('utf-8'))
+            count += 1
+    if header.get('format') != PLAN_FORMAT:
+        raise ValueError(f'{path}: not a plan file (format {header.get("format")})')
+    if trailer is None or trailer['writes'] != count or trailer['sha256'] != digest.hexdigest():
+        raise ValueError(f'{path} is incomplete or was modified; write the plan again')
+    return header, trailer
+
+def iter_records(path):
+    """Write records of a plan file in order"""
+    with open(path, encoding='utf-8') as f:
+        f.readline()
+        for line in f:
+            if line.startswith('{"end":'):
+                return
+            yield json.loads(line)
+
+def shard_records_path(results_dir, phase, shard, shards):
+    return os.path.join(results_dir, f'phase{phase}-shard{shard}of{shards}.jsonl')
+
+def split_plan(plan_path, results_dir, phases, shards):
+    """Write each (phase, shard)'s records to its own file, so a worker reads only its own"""
+    files = {
+        (phase, shard): open(shard_records_path(results_dir, phase, shard, shards), 'w', encoding='utf-8')
+        for phase in phases for shard in range(shards)
+    }
+    try:
+        with open(plan_path, encoding='utf-8') as f:
+            f.readline()
+            for line in f:
+                if line.startswith('{"end":'):
+                    break
+                record = json.loads(line)
+                files[(record['phase'], shard_of(record['path'], shards))].write(line)
+    finally:
+        for file in files.values():
+            file.close()
+
+def results_dir_for(plan_path):
+    return plan_path + '.results'
+
+def shard_result_path(results_dir, phase, shard, shards):
+    return os.path.join(results_dir, f'phase{phase}-shard{shard}of{shards}.json')
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+def flush_chunk(executor, chunk, state):
+    """Send {path: (index, Write)} and record what failed in state"""
+    failures_before = len(executor.failures)
+    committed_before = executor.committed
+    executor.submit(write for _, write in chunk.values())
+    executor.flush()
+    for writes, error in executor.failures[failures_before:]:
+        ambiguous = isinstance(error, AMBIGUOUS_ERRORS) and not is_idempotent(writes)
+        for write in writes:
+            state['ambiguous' if ambiguous else 'failed'].append([chunk[write.ref.path][0], write.ref.path, str(error)])
+    state['committed'] += executor.committed - committed_before
+
+def apply_shard(plan_path, phase, shard, shards, key_path, max_concurrency, max_ops):
+    """
+    Apply one shard of one phase of a plan; run in a worker process
+    Returns the shard's result dict (also saved in <plan>.results/)
+    """
+    from firebase_app import get_db
+
+    db = get_db(key_path)
+    result_path = shard_result_path(results_dir_for(plan_path), phase, shard, shards)
+    state = load_json(result_path) or {
+        'phase': phase, 'shard': shard, 'shards': shards, 'writes': None, 'done': 0,
+        'committed': 0, 'failed': [], 'ambiguous': [], 'retries': 0, 'seconds': 0.0,
+    }
+    retry = {index for index, _, _ in state['failed']}
+    state['failed'] = []
+    limiter = RampLimiter(initial_ops=max_ops / shards, max_ops=max_ops / shards) if max_ops else None
+
+    started = time.monotonic()
+    index = -1
+    chunk = {}
+    with WriteExecutor(db, max_concurrency=max_concurrency, limiter=limiter) as executor, \
+            open(shard_records_path(results_dir_for(plan_path), phase, shard, shards), encoding='utf-8') as f:
+        for index, line in enumerate(f):
+            if index >= state['done'] or index in retry:
+                record = json.loads(line)
+                chunk[record['path']] = (index, decode_write(record, db))
+            if len(chunk) >= CHUNK_WRITES:
+                flush_chunk(executor, chunk, state)
+                chunk = {}
+                state['done'] = index + 1
+                save_json(result_path, state)
+        if chunk:
+            flush_chunk(executor, chunk, state)
+        state['writes'] = state['done'] = index + 1
+        state['retries'] += executor.retries
+    state['seconds'] += time.monotonic() - started
+    save_json(result_path, state)
+    return state
+
+def merge_results(results_dir):
+    """{phase: [shard result, ...]} from the shard files of a results directory"""
+    merged = {}
+    for name in sorted(os.listdir(results_dir)) if os.path.isdir(results_dir) else []:
+        if name.startswith('phase') and name.endswith('.json'):
+            state = load_json(os.path.join(results_dir, name))
+            merged.setdefault(state['phase'], []).append(state)
+    for states in merged.values():
+        states.sort(key=lambda state: state['shard'])
+    return merged
+
+def print_report(merged, limit=10):
+    """Per-shard table per phase, then the failed writes"""
+    for phase, states in sorted(merged.items()):
+        committed = sum(state['committed'] for state in states)
+        # Shards run side by side: the slowest one is the phase's wall time
+        seconds = max(state['seconds'] for state in states) or 1e-9
+        print(f"\n📋 Phase {phase}: {committed:,} writes committed by {len(states)} workers "
+              f"in {seconds:.1f}s ({committed / seconds:,.0f} writes/s)")
+        print(f"   {'shard':>5} {'writes':>10} {'committed':>10} {'failed':>7} {'unsure':>7} {'retries':>8} {'secs':>7} {'writes/s':>9}")
+        for state in states:
+            rate = f"{state['committed'] / (state['seconds'] or 1e-9):>9,.0f}" if state['writes'] is not None else '  running'
+            writes = state['writes'] if state['writes'] is not None else state['done']
+            print(f"   {state['shard']:>5} {writes:>10,} {state['committed']:>10,} {len(state['failed']):>7,} "
+                  f"{len(state['ambiguous']):>7,} {state['retries']:>8,} {state['seconds']:>7.1f} {rate}")
+        failed = [item for state in states for item in state['failed']]
+        ambiguous = [item for state in states for item in state['ambiguous']]
+        for _, path, error in failed[:limit]:
+            print(f"   ❌ {path}: {error}")
+        for _, path, error in ambiguous[:limit]:
+            print(f"   ⚠️  {path}: {error} (may have been applied; not re-sent, check by hand)")
+
+def phase_ok(states, shards):
+    return len(states) == shards and all(state['writes'] is not None and not state['failed'] for state in states)
+
+def apply_plan(plan_path, workers, key_path=None, max_concurrency=DEFAULT_CONCURRENCY, max_ops=None, restart=False):
+    """
+    Apply (or resume) a plan with `workers` processes, phase by phase
+    Returns: {phase: [shard result, ...]} merged from <plan>.results/
+    Raises ValueError if the plan is damaged or was started with another worker count.
+    """
+    from firebase_app import default_key_path
+
+    key_path = key_path or default_key_path()
+    header, trailer = read_plan(plan_path)
+    results_dir = results_dir_for(plan_path)
+    if restart and os.path.isdir(results_dir):
+        shutil.rmtree(results_dir)
+    os.makedirs(results_dir, exist_ok=True)
+
+    # Results belong to one plan and one shard count
+    run_path = os.path.join(results_dir, 'run.json')
+    run = load_json(run_path)
+    if run and run['sha256'] != trailer['sha256']:
+        raise ValueError(f'{results_dir} belongs to another version of the plan; pass --restart')
+    if run and run['workers'] != workers:
+        raise ValueError(f"{plan_path} was started with {run['workers']} workers; use the same --workers or --restart")
+    if not run:
+        split_plan(plan_path, results_dir, [int(phase) for phase in trailer['phases']], workers)
+        save_json(run_path, {'plan': header['plan'], 'sha256': trailer['sha256'], 'workers': workers})
+
+    # Workers must not inherit a forked gRPC channel; each one starts its own client
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for phase in sorted(int(phase) for phase in trailer['phases']):
+            states = merge_results(results_dir).get(phase, [])
+            if phase_ok(states, workers):
+                print(f"⏭️  Phase {phase}: already applied")
+                continue
+            print(f"🚀 Phase {phase}: {trailer['phases'][str(phase)]:,} writes over {workers} workers")
+            futures = [
+                pool.submit(apply_shard, plan_path, phase, shard, workers, key_path, max_concurrency, max_ops)
+                for shard in range(workers)
+            ]
+            states = [future.result() for future in futures]
+            if not phase_ok(states, workers):
+                print(f"❌ Phase {phase} has failed writes; later phases were not applied")
+                break
+    return merge_results(results_dir)
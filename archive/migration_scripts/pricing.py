@@ -0,0 +1,63 @@
+"""
+Price rules shared by the scripts (mirrors register_sale_screen.dart)
+Usage: from pricing import base_price, bulk_unit_price, sale_subtotal
+
+- Base price: product.priceOverride, else the subcategory's defaultPrice
+- Bulk pricing: only for BULK_ELIGIBLE_CODES, using the subcategory's
+  bulkPricing tiers and the TOTAL quantity of bulk-eligible items in the sale
+- Discount: global per sale, total = subtotal - discount
+"""
+
+# Same list as _isBulkEligible() in register_sale_screen.dart (cuadros 20x30 and 15x30)
+BULK_ELIGIBLE_CODES = {'CUA-2030', 'CUA-1530'}
+
+# (minimum bulk quantity, bulkPricing key), checked from the highest tier down;
+# the same two tiers _getEffectiveUnitPrice() applies. The qty3Plus key that
+# import_categories.py seeds is ignored by the app, so it is ignored here too.
+BULK_TIERS = [(5, 'qty5Plus'), (2, 'qty2')]
+
+def base_price(product, subcategory):
+    """priceOverride falling back to the subcategory's defaultPrice (None if neither)"""
+    price_override = product.get('priceOverride')
+    if price_override is not None:
+        return float(price_override)
+    if subcategory and subcategory.get('defaultPrice') is not None:
+        return float(subcategory['defaultPrice'])
+    return None
+
+def is_bulk_eligible(category_code, bulk_pricing):
+    return category_code in BULK_ELIGIBLE_CODES and bool(bulk_pricing)
+
+def bulk_unit_price(bulk_pricing, bulk_qty, base):
+    """Unit price for a bulk-eligible item when the sale has `bulk_qty` eligible units"""
+    if not bulk_pricing:
+        return base
+    for min_qty, key in BULK_TIERS:
+        if bulk_qty >= min_qty and bulk_pricing.get(key) is not None:
+            return float(bulk_pricing[key])
+    return base
+
+def price_tiers(bulk_pricing):
+    """bulkPricing as a sorted list of {minQty, unitPrice} (empty if none)"""
+    if not bulk_pricing:
+        return []
+    return [
+        {'minQty': min_qty, 'unitPrice': float(bulk_pricing[key])}
+        for min_qty, key in sorted(BULK_TIERS)
+        if bulk_pricing.get(key) is not None
+    ]
+
+def sale_subtotal(lines):
+    """
+    Subtotal for a cart the way the app computes it
+
+    lines: iterable of (quantity, unit_price, category_code, bulk_pricing)
+    """
+    lines = list(lines)
+    bulk_qty = sum(qty for qty, _, code, bulk in lines if is_bulk_eligible(code, bulk))
+    subtotal = 0.0
+    for qty, unit_price, code, bulk in lines:
+        if is_bulk_eligible(code, bulk):
+            unit_price = bulk_unit_price(bulk, bulk_qty, unit_price)
+        subtotal += qty * unit_price
+    return subtotal
@@ -0,0 +1,187 @@
+"""
+Per-phase timing and stack capture for --profile
+Usage:
+  from profiling import Profiler, add_profile_argument
+  add_profile_argument(parser)
+  profiler = Profiler.from_args('import_products', args)   # does nothing without --profile
+  with profiler.phase('parse'):
+      ...
+  profiler.finish()
+
+--profile writes, in profiles/:
+  <script>-<time>.json       wall time and every phase's time, calls and
+                             share of the wall time (nested phases are
+                             keyed 'outer/inner')
+  <script>-<time>.collapsed  stacks sampled every 5 ms from every busy
+                             thread, rooted at thread;phase, one 'a;b;c count'
+                             line each: flamegraph.pl or speedscope read it
+                             as is
+--profile cprofile also saves a cProfile dump (<script>-<time>.pstats) of
+the main thread; cProfile slows Python-heavy code down, the sampler doesn't.
+
+Phases are timed with perf_counter_ns. Without --profile, phase() returns
+one shared no-op context manager, so leaving the hooks in costs nothing.
+"""
+
+import contextlib
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+PROFILE_DIR = 'profiles'
+
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.005
+
+# Innermost frame of a pool thread waiting for work: not worth a sample
+IDLE_FRAMES = {'thread.py:_worker'}
+
+_NO_PHASE = contextlib.nullcontext()
+
+def add_profile_argument(parser):
+    parser.add_argument('--profile', nargs='?', const='sample', choices=['sample', 'cprofile'],
+                        help=f"Time each phase and sample stacks into {PROFILE_DIR}/ ('cprofile': also a cProfile dump)")
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class StackSampler(threading.Thread):
+    """Counts collapsed stacks of every other thread, prefixed with its current phase"""
+
+    def __init__(self, phases, interval=SAMPLE_INTERVAL):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.phases = phases  # thread id -> phase stack (lists owned by Profiler)
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stopping = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self.stopping.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    thread = threading._active.get(ident)
+                    names[ident] = thread.name if thread else str(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame))
+                    frame = frame.f_back
+                if stack[0] in IDLE_FRAMES:
+                    continue
+                phase = '/'.join(self.phases.get(ident) or []) or '-'
+                self.stacks[';'.join([names[ident], phase] + stack[::-1])] += 1
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+class Profiler:
+    def __init__(self, script, mode=None, out_dir=PROFILE_DIR):
+        self.script = script
+        self.mode = mode
+        self.enabled = mode is not None
+        self.out_dir = out_dir
+        self.totals = Counter()   # phase path -> ns
+        self.calls = Counter()
+        self.counts = Counter()
+        self.phases = {}          # thread id -> [phase, ...]
+        self.lock = threading.Lock()
+        self.started_at = datetime.now()
+        self.started = time.perf_counter_ns()
+        self.sampler = None
+        self.cprofile = None
+        if self.enabled:
+            self.sampler = StackSampler(self.phases)
+            self.sampler.start()
+            if mode == 'cprofile':
+                self.cprofile = cProfile.Profile()
+                self.cprofile.enable()
+
+    @classmethod
+    def from_args(cls, script, args):
+        return cls(script, getattr(args, 'profile', None))
+
+    def phase(self, name):
+        """Context manager timing `name` (nested inside the current phase of this thread)"""
+        if not self.enabled:
+            return _NO_PHASE
+        return self._phase(name)
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        stack = self.phases.setdefault(threading.get_ident(), [])
+        stack.append(name)
+        path = '/'.join(stack)
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - started
+            stack.pop()
+            with self.lock:
+                self.totals[path] += elapsed
+                self.calls[path] += 1
+
+    def count(self, name, n=1):
+        """Count something (rows, images, bytes) for the report"""
+        if self.enabled:
+            with self.lock:
+                self.counts[name] += n
+
+    def breakdown(self):
+        wall = time.perf_counter_ns() - self.started
+        top_level = sum(ns for path, ns in self.totals.items() if '/' not in path)
+        return {
+            'script': self.script,
+            'startedAt': self.started_at.isoformat(timespec='seconds'),
+            'wallSeconds': wall / 1e9,
+            'phases': {
+                path: {'seconds': ns / 1e9, 'calls': self.calls[path], 'share': ns / wall if wall else 0.0}
+                for path, ns in sorted(self.totals.items())
+            },
+            'outsidePhasesSeconds': max(wall - top_level, 0) / 1e9,
+            'counts': dict(self.counts),
+            'samples': self.sampler.samples if self.sampler else 0,
+            'sampleInterval': SAMPLE_INTERVAL,
+        }
+
+    def finish(self):
+        """Stop capturing, write the files and print the phase table; returns the file prefix or None"""
+        if not self.enabled:
+            return None
+        self.sampler.stop()
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        report = self.breakdown()
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        prefix = os.path.join(self.out_dir, f"{self.script}-{self.started_at:%Y%m%d-%H%M%S}")
+        with open(prefix + '.json', 'w') as f:
+            json.dump(report, f, indent=2)
+        with open(prefix + '.collapsed', 'w') as f:
+            for stack, n in self.sampler.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        if self.cprofile is not None:
+            self.cprofile.dump_stats(prefix + '.pstats')
+
+        print(f"\n⏱️  Profile ({report['wallSeconds']:.2f}s wall):")
+        for path, phase in report['phases'].items():
+            indent = '   ' * path.count('/')
+            print(f"   {indent}{path.rsplit('/', 1)[-1]:<{20 - len(indent)}} {phase['seconds']:>9.3f}s "
+                  f"{phase['share']:>6.1%} {phase['calls']:>9,} calls")
+        print(f"   {'(outside phases)':<20} {report['outsidePhasesSeconds']:>9.3f}s")
+        for name, n in report['counts'].items():
+            print(f"   {name}: {n:,}")
+        print(f"   Files: {prefix}.json, {prefix}.collapsed" + (f", {prefix}.pstats" if self.cprofile else ''))
+        return prefix
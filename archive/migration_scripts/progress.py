@@ -0,0 +1,87 @@
+"""
+Rate-limited progress bar for the ops scripts
+Usage:
+  from progress import ProgressBar
+  with ProgressBar(len(rows), 'Sheet 3') as bar:
+      for row in rows:
+          ...
+          bar.update()
+          bar.write('   ❌ ...')   # a message above the bar
+
+On a terminal one line is redrawn in place at most every `interval`
+seconds, so the cost no longer grows with the rows printed. When output
+goes to a file or pipe, a plain line is printed every `log_interval`
+seconds instead (no carriage returns in logs).
+"""
+
+import shutil
+import sys
+import time
+
+BAR_WIDTH = 24
+
+class ProgressBar:
+    def __init__(self, total, label, unit='rows', interval=0.2, log_interval=10.0, stream=None):
+        self.total = total
+        self.label = label
+        self.unit = unit
+        self.stream = stream or sys.stdout
+        self.tty = self.stream.isatty()
+        self.interval = interval if self.tty else log_interval
+        self.count = 0
+        self.started = time.perf_counter()
+        self._last_draw = self.started
+        self._drawn = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def update(self, n=1):
+        self.count += n
+        now = time.perf_counter()
+        if now - self._last_draw >= self.interval:
+            self._last_draw = now
+            self._draw(now)
+
+    def write(self, message):
+        """Print a line without mangling the bar"""
+        self._clear()
+        print(message, file=self.stream)
+        if self.tty and self._drawn:
+            self._draw(time.perf_counter())
+
+    def close(self):
+        self._clear()
+        elapsed = time.perf_counter() - self.started
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        print(f"   {self.label}: {self.count:,} {self.unit} in {elapsed:.1f}s ({rate:,.0f}/s)", file=self.stream)
+
+    def _line(self, now):
+        elapsed = now - self.started
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        if not self.total:
+            return f"   {self.label}: {self.count:,} {self.unit} ({rate:,.0f}/s)"
+        done = min(self.count / self.total, 1.0)
+        filled = int(done * BAR_WIDTH)
+        eta = (self.total - self.count) / rate if rate > 0 else 0.0
+        return (f"   {self.label} [{'█' * filled}{'·' * (BAR_WIDTH - filled)}] "
+                f"{self.count:,}/{self.total:,} {self.unit} ({rate:,.0f}/s, {eta:.0f}s left)")
+
+    def _draw(self, now):
+        line = self._line(now)
+        if self.tty:
+            width = shutil.get_terminal_size().columns - 1
+            self.stream.write('\r' + line[:width].ljust(width))
+            self.stream.flush()
+            self._drawn = True
+        else:
+            print(line, file=self.stream)
+
+    def _clear(self):
+        if self.tty and self._drawn:
+            self.stream.write('\r' + ' ' * (shutil.get_terminal_size().columns - 1) + '\r')
+            self.stream.flush()
+            self._drawn = False
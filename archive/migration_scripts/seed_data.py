@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic seed data for a staging project or load tests
+Usage: python3 seed_data.py --key stagingServiceAccountKey.json --sales 100000 --seed 42
+
+Creates, reproducibly from --seed:
+- categories/{primary} + subcategories (incl. bulk-pricing codes LAT-2030, CUA-2030, ...)
+- products with stock in both locations
+- sales covering every saleType/paymentMethod/deliveryMethod combination
+- deposits + (sharded) pendingCash for the cash sales, linked both ways
+- shipments and movements whose quantities add up to the stock counters:
+  stockWarehouse = shipped - moved - sold from warehouse
+  stockStore     = moved - sold from store
+
+All writes go through a parallel BulkWriter. Refuses to write to the
+production project unless --allow-prod is given.
+"""
+
+import argparse
+import random
+import string
+from datetime import datetime, timedelta, timezone
+from pending_cash import PENDING_SALES, SHARD_COUNT, SHARDS, SOURCES
+from pricing import BULK_ELIGIBLE_CODES, base_price, sale_subtotal
+
+# primary category -> (primaryCode, [(code, subcategoryName, defaultPrice, bulkPricing)])
+SEED_CATEGORIES = {
+    'Latas': ('LAT', [
+        ('LAT-2030', '20x30', 35, {'normal': 35, 'qty2': 30, 'qty3Plus': 25}),
+        ('LAT-1530', '15x30', 35, {'normal': 35, 'qty2': 30, 'qty3Plus': 25}),
+        ('LAT-3040', '30x40', 60, None),
+    ]),
+    'Cuadros': ('CUA', [
+        ('CUA-2030', '20x30', 40, {'qty2': 35, 'qty5Plus': 30}),
+        ('CUA-1530', '15x30', 40, {'qty2': 35, 'qty5Plus': 30}),
+    ]),
+    'Rótulos': ('ROT', [
+        ('ROT-4060', '40x60', 85, None),
+        ('ROT-2060', '20x60', 65, None),
+    ]),
+    'Llaveros': ('LLA', [
+        ('LLA', None, 15, None),
+    ]),
+}
+
+TEMAS = ['Café', 'Cocina', 'Cerveza', 'Autos', 'Música', 'Frases', 'Vintage', 'Guatemala']
+
+# Every sale shape the app can produce: (saleType, paymentMethod, deliveryMethod)
+SALE_COMBOS = [
+    ('kiosko', payment, None) for payment in ('efectivo', 'transferencia', 'tarjeta')
+] + [
+    ('delivery', payment, method)
+    for payment in ('efectivo', 'transferencia', 'tarjeta')
+    for method in ('mensajero', 'forza')
+]
+
+BANK_ACCOUNTS = {
+    'seed-qtz': {'bankName': 'Banco Industrial', 'accountName': 'XEPI', 'accountType': 'monetaria',
+                 'currency': 'QTZ', 'currentBalance': 0, 'isActive': True, 'last4Digits': '1234'},
+    'seed-usd': {'bankName': 'Banco Industrial', 'accountName': 'XEPI USD', 'accountType': 'monetaria',
+                 'currency': 'USD', 'currentBalance': 0, 'isActive': True, 'last4Digits': '5678'},
+}
+
+EXPENSE_CATEGORIES = {
+    'seed-transporte': {'name': 'Transporte', 'type': 'operativo'},
+    'seed-alquiler': {'name': 'Alquiler', 'type': 'no_operativo'},
+}
+
+SEED_USER = 'seed-user'
+SEED_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+ID_ALPHABET = string.ascii_letters + string.digits
+
+# Cash sales newer than this stay in pendingCash; older ones are deposited
+PENDING_WINDOW = timedelta(days=3)
+
+def auto_id(rng):
+    """20-char id shaped like a Firestore auto-ID, but reproducible"""
+    return ''.join(rng.choices(ID_ALPHABET, k=20))
+
+def money(value):
+    return round(value, 2)
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class SeedGenerator:
+    """Yields (document_path, data) pairs; keeps only counters and ids in memory"""
+
+    def __init__(self, seed, num_sales, num_products, days):
+        self.rng = random.Random(seed)
+        self.num_sales = num_sales
+        self.num_products = num_products
+        self.start = SEED_START
+        self.end = SEED_START + timedelta(days=days)
+
+        self.subcategories = {}   # code -> subcategory doc
+        self.products = []        # product docs (stock filled in at the end)
+        self.sold = {}            # barcode -> {'store': qty, 'warehouse': qty}
+        self.pending_cash = {source: {'totals': {}} for source in SOURCES}
+        self.open_deposits = {}   # source -> open deposit being filled
+
+    # ----- catalog -----
+
+    def categories(self):
+        for order, (primary, (primary_code, subs)) in enumerate(SEED_CATEGORIES.items(), start=1):
+            yield f'categories/{primary}', {
+                'name': primary,
+                'primaryCode': primary_code,
+                'coverImageUrl': None,
+                'isActive': True,
+                'displayOrder': order,
+                'createdAt': self.start,
+                'updatedAt': self.start,
+            }
+            for sub_order, (code, sub_name, price, bulk) in enumerate(subs, start=1):
+                sub = {
+                    'code': code,
+                    'name': f'{primary} {sub_name}' if sub_name else primary,
+                    'subcategoryName': sub_name,
+                    'defaultPrice': price,
+                    'coverImageUrl': None,
+                    'bulkPricing': bulk,
+                    'hasSubcategories': sub_name is not None,
+                    'isActive': True,
+                    'displayOrder': sub_order,
+                    'createdAt': self.start,
+                    'updatedAt': self.start,
+                    'notes': None,
+                }
+                self.subcategories[code] = dict(sub, primaryCategory=primary)
+                yield f'categories/{primary}/subcategories/{code}', sub
+
+    def build_products(self):
+        codes = list(self.subcategories)
+        for i in range(self.num_products):
+            code = codes[i % len(codes)]
+            sub = self.subcategories[code]
+            barcode = f'999{i:010d}'
+            self.products.append({
+                'barcode': barcode,
+                'name': f"{sub['name']} {self.rng.choice(TEMAS)} #{i + 1}",
+                'warehouseCode': f'COD-{i + 1}',
+                'categoryCode': code,
+                'primaryCategory': sub['primaryCategory'],
+                'subcategory': sub['subcategoryName'],
+                'size': sub['subcategoryName'],
+                'sizeFormatted': None,
+                'temas': self.rng.sample(TEMAS, k=self.rng.randint(1, 2)),
+                'color': None,
+                'images': [],
+                'primaryImageUrl': None,
+                # ~1 in 10 products has its own price
+                'priceOverride': money(sub['defaultPrice'] * 1.2) if self.rng.random() < 0.1 else None,
+                'costPrice': money(sub['defaultPrice'] * 0.45),
+                'inStock': True,
+                'stockWarehouse': 0,
+                'stockStore': 0,
+                'isActive': True,
+                'displayOrder': 0,
+                'createdAt': self.start,
+                'updatedAt': self.start,
+                'notes': None,
+                'importSource': 'seed_data.py',
+                'sheetNumber': None,
+            })
+            self.sold[barcode] = {'store': 0, 'warehouse': 0}
+
+    # ----- sales, deposits, pending cash -----
+
+    def sale_state(self, sale_type, payment_method):
+        """(status, stockStatus, deliveryStatus) for a new sale"""
+        requires_approval = payment_method != 'efectivo'
+        status = 'pending_approval' if requires_approval and self.rng.random() < 0.15 else 'approved'
+        if sale_type == 'kiosko':
+            return status, 'completed', None
+        delivery_states = ['pending', 'picked_up', 'delivered']
+        if payment_method == 'efectivo':
+            delivery_states.append('cash_received')
+        delivery_status = self.rng.choice(delivery_states)
+        stock_status = 'completed' if delivery_status in ('delivered', 'cash_received') else 'in_transit'
+        return status, stock_status, delivery_status
+
+    def sale_items(self):
+        lines = []
+        for product in self.rng.sample(self.products, k=min(len(self.products), self.rng.randint(1, 4))):
+            sub = self.subcategories[product['categoryCode']]
+            max_qty = 6 if product['categoryCode'] in BULK_ELIGIBLE_CODES else 3
+            lines.append((product, sub, self.rng.randint(1, max_qty)))
+        return lines
+
+    def sales(self):
+        span = (self.end - self.start).total_seconds()
+        for i in range(self.num_sales):
+            sale_type, payment_method, delivery_method = SALE_COMBOS[i % len(SALE_COMBOS)]
+            created_at = self.start + timedelta(seconds=span * (i + self.rng.random()) / self.num_sales)
+            sale_id = auto_id(self.rng)
+            status, stock_status, delivery_status = self.sale_state(sale_type, payment_method)
+            deduct_from = 'store' if sale_type == 'kiosko' else self.rng.choice(['store', 'warehouse'])
+
+            lines = self.sale_items()
+            items = []
+            for product, sub, qty in lines:
+                unit_price = base_price(product, sub)
+                items.append({
+                    'barcode': product['barcode'],
+                    'name': product['name'],
+                    'quantity': qty,
+                    'unitPrice': unit_price,
+                    'subtotal': money(qty * unit_price),
+                })
+            subtotal = money(sale_subtotal(
+                (qty, base_price(product, sub), product['categoryCode'], sub['bulkPricing'])
+                for product, sub, qty in lines
+            ))
+            discount = money(self.rng.choice([5, 10])) if self.rng.random() < 0.1 else 0.0
+            total = money(subtotal - discount)
+
+            if status == 'approved' and stock_status == 'completed':
+                for product, _, qty in lines:
+                    self.sold[product['barcode']][deduct_from] += qty
+
+            sale = {
+                'saleType': sale_type,
+                'deliveryMethod': delivery_method,
+                'paymentMethod': payment_method,
+                'destinationAccount': 'seed-qtz' if payment_method != 'efectivo' else None,
+                'items': items,
+                'subtotal': subtotal,
+                'discount': discount,
+                'total': total,
+                'nit': 'CF',
+                'customerName': f'Cliente {i + 1}' if sale_type == 'delivery' else None,
+                'customerPhone': f'5{i % 10000000:07d}' if sale_type == 'delivery' else None,
+                'deliveryAddress': 'Zona 13, Ciudad de Guatemala' if sale_type == 'delivery' else None,
+                'deductFrom': deduct_from,
+                'stockStatus': stock_status,
+                'paymentVerified': status == 'approved',
+                'status': status,
+                'depositId': None,
+                'deliveryStatus': delivery_status,
+                'pickedUpAt': created_at + timedelta(hours=2) if delivery_status not in (None, 'pending') else None,
+                'pickedUpBy': SEED_USER if delivery_status not in (None, 'pending') else None,
+                'deliveredAt': created_at + timedelta(hours=6) if stock_status == 'completed' and sale_type == 'delivery' else None,
+                'createdBy': SEED_USER,
+                'createdAt': created_at,
+            }
+
+            # Cash that reached a pool: kiosko on sale, delivery once delivered
+            cash_source = None
+            if payment_method == 'efectivo' and status == 'approved':
+                if sale_type == 'kiosko':
+                    cash_source = 'store'
+                elif delivery_status in ('delivered', 'cash_received'):
+                    cash_source = delivery_method
+
+            if cash_source and created_at < self.end - PENDING_WINDOW:
+                deposit = self.open_deposits.get(cash_source)
+                if deposit is None:
+                    deposit = self.open_deposits[cash_source] = {
+                        'id': auto_id(self.rng), 'saleIds': [], 'cashReceived': 0.0,
+                        'size': self.rng.randint(5, 30),
+                    }
+                deposit['saleIds'].append(sale_id)
+                deposit['cashReceived'] += total
+                deposit['lastSaleAt'] = created_at
+                sale['depositId'] = deposit['id']
+                # Same side effect as deposits_screen.dart
+                if delivery_status == 'delivered':
+                    sale['deliveryStatus'] = 'completed'
+                    sale['completedAt'] = created_at + timedelta(days=1)
+                yield f'sales/{sale_id}', sale
+                if len(deposit['saleIds']) >= deposit['size']:
+                    del self.open_deposits[cash_source]
+                    yield self.deposit_doc(cash_source, deposit)
+                continue
+
+            if cash_source:
+                pool = self.pending_cash[cash_source]
+                pool['totals'][sale_id] = total
+            yield f'sales/{sale_id}', sale
+
+        for source, deposit in list(self.open_deposits.items()):
+            yield self.deposit_doc(source, deposit)
+        self.open_deposits.clear()
+
+    def deposit_doc(self, source, deposit):
+        cash_received = money(deposit['cashReceived'])
+        expenses = money(self.rng.choice([0, 0, 0, 25, 50]))
+        expenses = min(expenses, cash_received)
+        deposited_at = deposit['lastSaleAt'] + timedelta(days=1)
+        return f"deposits/{deposit['id']}", {
+            'source': source,
+            'amount': money(cash_received - expenses),
+            'cashReceived': cash_received,
+            'expenses': expenses,
+            'expenseIds': [],
+            'saleIds': deposit['saleIds'],
+            'comprobanteUrl': None,
+            'destinationAccount': 'seed-qtz',
+            'notes': 'seed',
+            'depositedBy': SEED_USER,
+            'depositedAt': deposited_at,
+            'createdAt': deposited_at,
+        }
+
+    def pending_cash_docs(self):
+        """Sharded layout (pending_cash.py): empty root, amount spread over the shards"""
+        for source, pool in self.pending_cash.items():
+            yield f'pendingCash/{source}', {
+                'source': source,
+                'amount': 0,
+                'saleIds': [],
+                'updatedAt': self.end,
+            }
+            shards = [0.0] * SHARD_COUNT
+            for n, (sale_id, total) in enumerate(pool['totals'].items()):
+                shards[n % SHARD_COUNT] += total
+                yield f'pendingCash/{source}/{PENDING_SALES}/{sale_id}', {
+                    'total': total,
+                    'addedAt': self.end,
+                }
+            for n, amount in enumerate(shards):
+                yield f'pendingCash/{source}/{SHARDS}/{n}', {
+                    'amount': money(amount),
+                    'updatedAt': self.end,
+                }
+
+    # ----- stock ledger -----
+
+    def stock_docs(self):
+        """Products with final stock, plus the shipments/movements that explain it"""
+        received_at = self.start - timedelta(days=7)
+        shipped = []
+        moved = []
+        for product in self.products:
+            sold = self.sold[product['barcode']]
+            product['stockStore'] = self.rng.randint(0, 20)
+            product['stockWarehouse'] = self.rng.randint(0, 50)
+            to_store = sold['store'] + product['stockStore']
+            from_supplier = to_store + sold['warehouse'] + product['stockWarehouse']
+            if from_supplier:
+                shipped.append((product, from_supplier))
+            if to_store:
+                moved.append((product, to_store))
+            yield f"products/{product['barcode']}", product
+
+        for group in chunks(shipped, 50):
+            yield f'shipments/{auto_id(self.rng)}', {
+                'status': 'completed',
+                'items': [{
+                    'barcode': product['barcode'],
+                    'productName': product['name'],
+                    'quantity': qty,
+                    'categoryCode': product['categoryCode'],
+                } for product, qty in group],
+                'supplierId': None,
+                'receivedBy': SEED_USER,
+                'receivedByName': 'Seed',
+                'createdAt': received_at,
+                'updatedAt': received_at,
+            }
+
+        moved_at = received_at + timedelta(days=1)
+        for group in chunks(moved, 50):
+            yield f'movements/{auto_id(self.rng)}', {
+                'status': 'received',
+                'origin': 'warehouse',
+                'destination': 'store',
+                'items': [{'barcode': product['barcode'], 'qty': qty} for product, qty in group],
+                'createdBy': SEED_USER,
+                'createdAt': moved_at,
+                'sentAt': moved_at,
+                'receivedAt': moved_at,
+                'updatedAt': moved_at,
+            }
+
+    def documents(self):
+        yield from self.categories()
+        for doc_id, data in BANK_ACCOUNTS.items():
+            yield f'bankAccounts/{doc_id}', data
+        for doc_id, data in EXPENSE_CATEGORIES.items():
+            yield f'expense_categories/{doc_id}', data
+        self.build_products()
+        yield from self.sales()
+        yield from self.pending_cash_docs()
+        yield from self.stock_docs()
+
+def seed(args):
+    generator = SeedGenerator(args.seed, args.sales, args.products, args.days)
+
+    if args.dry_run:
+        counts = {}
+        for path, _ in generator.documents():
+            collection = path.split('/')[-2]
+            counts[collection] = counts.get(collection, 0) + 1
+        print("🧪 DRY RUN - nothing written\n")
+        for collection, count in counts.items():
+            print(f"   {collection}: {count:,}")
+        print(f"\n📊 Total: {sum(counts.values()):,} documents")
+        return
+
+    # Imported here so --dry-run works without Firebase credentials
+    from firebase_app import PROD_PROJECT_ID, get_app, get_db
+    from bulk_writes import RateReporter, open_bulk_writer
+
+    project_id = get_app(args.key).project_id
+    if project_id == PROD_PROJECT_ID and not args.allow_prod:
+        print(f"❌ Refusing to seed production project '{project_id}'")
+        print("   Pass --key with a staging service account, or --allow-prod to override")
+        return
+
+    db = get_db(args.key)
+    bulk_writer, failures = open_bulk_writer(db, max_ops_per_second=args.max_ops)
+    reporter = RateReporter('seeded')
+
+    print(f"🌱 Seeding project '{project_id}' (seed={args.seed}, sales={args.sales:,}, products={args.products:,})\n")
+    for path, data in generator.documents():
+        bulk_writer.set(db.document(path), data)
+        reporter.add()
+
+    bulk_writer.close()
+
+    print(f"\n{'='*60}")
+    print(f"✅ Seeded {reporter.summary()}")
+    if failures:
+        print(f"❌ Failed writes: {len(failures)}")
+        for path, message in failures[:10]:
+            print(f"   {path}: {message}")
+    print(f"{'='*60}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate synthetic XEPI data for staging/load tests')
+    parser.add_argument('--key', help='Service account JSON for the target project (default: serviceAccountKey.json)')
+    parser.add_argument('--sales', type=int, default=200, help='Number of sales to generate (default 200)')
+    parser.add_argument('--products', type=int, help='Number of products (default: sales/100, min 20, max 2000)')
+    parser.add_argument('--days', type=int, default=365, help='Days of history the sales span (default 365)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed; same seed + args = same data')
+    parser.add_argument('--max-ops', type=int, default=5000, help='Max writes/sec after ramp-up (default 5000)')
+    parser.add_argument('--dry-run', action='store_true', help='Only count the documents that would be written')
+    parser.add_argument('--allow-prod', action='store_true', help='Allow writing to the production project')
+    args = parser.parse_args()
+
+    if args.products is None:
+        args.products = max(20, min(2000, args.sales // 100))
+
+    try:
+        seed(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Seeding interrupted by user")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Move pendingCash/{source} documents into the sharded layout (see pending_cash.py)
+Usage:
+  python3 shard_pending_cash.py --dry-run
+  python3 shard_pending_cash.py
+
+Each source's root saleIds are moved to pendingSales/{saleId} in chunks.
+A chunk is one atomic batch that creates the sale documents, removes them
+from the root array (ArrayRemove) and moves their totals from the root
+amount to a shard (Increment), so the pending total never changes and the
+app can keep registering sales while this runs. An interrupted run is
+simply run again.
+
+Sale IDs whose sale no longer exists stay on the root document for
+cleanup_pending_cash.py, as does any amount no listed sale explains: the
+root is still counted by every reader.
+"""
+
+import argparse
+from firebase_admin import firestore
+from firebase_app import get_db
+from pending_cash import SHARD_COUNT, SOURCES, pending_sale_ref, root_ref, shard_ref
+from write_executor import WriteExecutor, print_failures, set_doc
+
+# Sales moved per batch (2 writes each + root + shard stay under 500)
+CHUNK = 200
+
+# IDs per get_all call
+GET_ALL_CHUNK = 300
+
+def sale_totals(db, sale_ids):
+    """{sale_id: total} for the sales that exist"""
+    totals = {}
+    refs = [db.collection('sales').document(sale_id) for sale_id in sale_ids]
+    for i in range(0, len(refs), GET_ALL_CHUNK):
+        for snapshot in db.get_all(refs[i:i + GET_ALL_CHUNK], field_paths=['total']):
+            if snapshot.exists:
+                totals[snapshot.id] = float(snapshot.to_dict().get('total') or 0)
+    return totals
+
+def chunk_writes(db, source, n, chunk, totals):
+    """One atomic batch moving `chunk` (sale IDs) from the root to shard n"""
+    moved = sum(totals[sale_id] for sale_id in chunk)
+    writes = [
+        set_doc(pending_sale_ref(db, source, sale_id), {
+            'total': totals[sale_id],
+            'addedAt': firestore.SERVER_TIMESTAMP,
+        })
+        for sale_id in chunk
+    ]
+    writes.append(set_doc(root_ref(db, source), {
+        'amount': firestore.Increment(-moved),
+        'saleIds': firestore.ArrayRemove(chunk),
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }, merge=True))
+    writes.append(set_doc(shard_ref(db, source, n % SHARD_COUNT), {
+        'amount': firestore.Increment(moved),
+        'updatedAt': firestore.SERVER_TIMESTAMP,
+    }, merge=True))
+    return writes
+
+def shard_pending_cash(args):
+    db = get_db(args.key)
+    mode = 'DRY RUN' if args.dry_run else 'LIVE'
+    print(f"🧮 Sharding pendingCash [{mode}]\n")
+
+    totals_moved = {'sales': 0, 'amount': 0.0, 'stale': 0}
+    with WriteExecutor(db) as executor:
+        for source in SOURCES:
+            snapshot = root_ref(db, source).get()
+            data = snapshot.to_dict() if snapshot.exists else {}
+            sale_ids = list(dict.fromkeys(data.get('saleIds') or []))
+            if not sale_ids:
+                print(f"   {source}: nothing listed on the root document")
+                continue
+
+            totals = sale_totals(db, sale_ids)
+            movable = [sale_id for sale_id in sale_ids if sale_id in totals]
+            stale = len(sale_ids) - len(movable)
+            amount = sum(totals.values())
+            print(f"   {source}: {len(movable)} sales (Q{amount:.2f}) to move, {stale} stale IDs left on the root")
+
+            totals_moved['sales'] += len(movable)
+            totals_moved['amount'] += amount
+            totals_moved['stale'] += stale
+            if args.dry_run:
+                continue
+            # Each submit of <= 500 writes is committed as one batch
+            for n, i in enumerate(range(0, len(movable), CHUNK)):
+                executor.submit(chunk_writes(db, source, n, movable[i:i + CHUNK], totals))
+    failures = executor.failures
+
+    print(f"\n{'='*60}")
+    print(f"🧾 Sales {'to move' if args.dry_run else 'moved'}: {totals_moved['sales']:,} (Q{totals_moved['amount']:.2f})")
+    if totals_moved['stale']:
+        print(f"⚠️  Stale sale IDs left for cleanup_pending_cash.py: {totals_moved['stale']}")
+    print_failures(failures)
+    print(f"{'='*60}")
+    if failures:
+        print("Run again to retry the failed chunks")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move pendingCash saleIds/amounts into shards and pendingSales')
+    parser.add_argument('--dry-run', action='store_true', help="Show what would move but don't write")
+    parser.add_argument('--key', help='Service account JSON for the project (default: serviceAccountKey.json)')
+    args = parser.parse_args()
+
+    try:
+        shard_pending_cash(args)
+    except KeyboardInterrupt:
+        print("\n\n⚠️  Interrupted by user")
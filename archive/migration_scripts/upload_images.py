@@ -7,26 +7,26 @@ Multiple images per product: 1003023000018_1.jpg, 1003023000018_2.jpg, etc.
 Main image will be the one with lowest suffix or the only image.
 
 Supported formats: .jpg, .jpeg, .png, .webp, .gif
+
+--link-existing: before uploading, compare each image (perceptual hash, see
+find_duplicate_images.py) with the images products already use; a
+near-duplicate reuses that URL instead of uploading another copy. The
+hashing modules (numpy, PIL) are only imported with --link-existing.
+
+Progress is one progress bar over the images; only errors are printed per
+image. --profile times the read/hash/upload/write phases (see profiling.py).
 """
 
+import argparse
 import os
 import re
-import firebase_admin
-from firebase_admin import credentials, firestore, storage
+from firebase_admin import firestore
 from datetime import datetime
 from pathlib import Path
-
-# Initialize Firebase (reuse existing app if already initialized)
-try:
-    db = firestore.client()
-    bucket = storage.bucket()
-except ValueError:
-    cred = credentials.Certificate('serviceAccountKey.json')
-    firebase_admin.initialize_app(cred, {
-        'storageBucket': 'xepi-f5c22.firebasestorage.app'
-    })
-    db = firestore.client()
-    bucket = storage.bucket()
+from firebase_app import get_bucket, get_db
+from patch_image_metadata import IMMUTABLE_CACHE_CONTROL, content_type_for
+from profiling import Profiler, add_profile_argument
+from progress import ProgressBar
 
 # Supported image formats
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif'}
@@ -91,7 +91,7 @@ def get_images_by_barcode(images_folder):
     
     return images_by_barcode
 
-def upload_image_to_storage(filepath, barcode, filename):
+def upload_image_to_storage(bucket, filepath, barcode, filename, log=print):
     """
     Upload image to Firebase Storage
     
@@ -102,8 +102,11 @@ def upload_image_to_storage(filepath, barcode, filename):
         blob_path = f'products/{barcode}/{filename}'
         blob = bucket.blob(blob_path)
         
+        # Names are unique per upload, so the content never changes: cache it for a year
+        blob.cache_control = IMMUTABLE_CACHE_CONTROL
+        
         # Upload file
-        blob.upload_from_filename(filepath)
+        blob.upload_from_filename(filepath, content_type=content_type_for(filename))
         
         # Make publicly accessible
         blob.make_public()
@@ -111,10 +114,10 @@ def upload_image_to_storage(filepath, barcode, filename):
         return blob.public_url
     
     except Exception as e:
-        print(f"❌ Error uploading {filename}: {e}")
+        log(f"❌ Error uploading {filename}: {e}")
         return None
 
-def update_product_images(barcode, image_urls):
+def update_product_images(db, barcode, image_urls, log=print):
     """
     Update product in Firestore with new image URLs
     Replaces existing images array
@@ -126,23 +129,49 @@ def update_product_images(barcode, image_urls):
         product_doc = product_ref.get()
         
         if not product_doc.exists:
-            print(f"❌ Product not found in Firestore: {barcode}")
+            log(f"❌ Product not found in Firestore: {barcode}")
             return False
         
         # Update with new images (replaces old ones)
         product_ref.update({
             'images': image_urls,
+            'primaryImageUrl': image_urls[0],
             'updatedAt': firestore.SERVER_TIMESTAMP,
         })
         
         return True
     
     except Exception as e:
-        print(f"❌ Error updating Firestore for {barcode}: {e}")
+        log(f"❌ Error updating Firestore for {barcode}: {e}")
         return False
 
-def upload_product_images():
+def build_existing_index(db, bucket, image_paths, max_distance=None):
+    """
+    (index, local_hashes, match) for --link-existing: a BK-tree of (hashes, url)
+    for images products already use, the local files' hashes, and
+    match(hashes) -> closest indexed (hashes, url) within max_distance or None
+    """
+    from find_duplicate_images import DEFAULT_MAX_DISTANCE, load_uploaded_images
+    from image_hashes import BKTree, HashCache, find_match, hash_local_files
+
+    if max_distance is None:
+        max_distance = DEFAULT_MAX_DISTANCE
+    cache = HashCache()
+    index = BKTree()
+    entries = load_uploaded_images(db, bucket, cache)
+    for entry in entries:
+        if entry['hashes'] is not None:
+            index.add(entry['hashes']['phash'], (entry['hashes'], entry['url']))
+    skipped = sum(1 for entry in entries if entry['hashes'] is None)
+    if skipped:
+        print(f"⚠️  {skipped} existing image(s) unreadable or not downloaded, not indexed")
+    local_hashes = hash_local_files(image_paths, cache)
+    cache.save()
+    return index, local_hashes, lambda hashes: find_match(index, hashes, max_distance)
+
+def upload_product_images(link_existing=False, max_distance=None, profiler=None):
     """Main function to upload images and update Firestore"""
+    profiler = profiler or Profiler('upload_images')
     
     images_folder = 'data/images'
     
@@ -151,7 +180,8 @@ def upload_product_images():
         return
     
     print("📷 Scanning images folder...")
-    images_by_barcode = get_images_by_barcode(images_folder)
+    with profiler.phase('read'):
+        images_by_barcode = get_images_by_barcode(images_folder)
     
     if not images_by_barcode:
         print("⚠️  No valid images found in folder")
@@ -164,48 +194,73 @@ def upload_product_images():
     total_images = sum(len(imgs) for imgs in images_by_barcode.values())
     success_count = 0
     error_count = 0
+    uploaded_count = 0
+    linked_count = 0
     
     print(f"📊 Total: {total_products} products, {total_images} images\n")
+    
+    db = get_db()
+    bucket = get_bucket()
+    
+    index = None
+    if link_existing:
+        print("🔗 Indexing images already used by products...")
+        with profiler.phase('hash'):
+            index, local_hashes, find_match = build_existing_index(
+                db,
+                bucket,
+                [filepath for image_files in images_by_barcode.values() for filepath, _, _ in image_files],
+                max_distance
+            )
+        print(f"✅ {index.size} existing images indexed\n")
     print("🚀 Starting upload...\n")
     
+    bar = ProgressBar(total_images, 'Uploading', unit='images')
     for barcode, image_files in images_by_barcode.items():
-        print(f"📦 Processing product: {barcode}")
-        print(f"   Images: {len(image_files)}")
-        
         uploaded_urls = []
         
         # Upload all images for this product
-        for i, (filepath, suffix, ext) in enumerate(image_files):
+        for filepath, suffix, ext in image_files:
+            bar.update()
             filename = os.path.basename(filepath)
-            print(f"   ↗️  Uploading {filename}...", end=' ')
+            hashes = local_hashes[filepath][1] if index is not None else None
+            
+            # Reuse an already-uploaded near-duplicate instead of uploading a copy
+            match = find_match(hashes) if hashes else None
+            if match:
+                _, existing_url = match
+                if existing_url not in uploaded_urls:
+                    uploaded_urls.append(existing_url)
+                    linked_count += 1
+                continue
             
             # Generate unique filename with timestamp
             timestamp = int(datetime.now().timestamp() * 1000)
             new_filename = f"{barcode}_{timestamp}_{filename}"
             
-            url = upload_image_to_storage(filepath, barcode, new_filename)
+            with profiler.phase('upload'):
+                url = upload_image_to_storage(bucket, filepath, barcode, new_filename, log=bar.write)
             
             if url:
                 uploaded_urls.append(url)
-                main_marker = " (MAIN)" if i == 0 else ""
-                print(f"✅{main_marker}")
-            else:
-                print(f"❌")
+                uploaded_count += 1
+                profiler.count('bytes uploaded', os.path.getsize(filepath))
+                if hashes:
+                    index.add(hashes['phash'], (hashes, url))
         
         # Update Firestore if at least one image uploaded successfully
         if uploaded_urls:
-            print(f"   💾 Updating Firestore...", end=' ')
-            if update_product_images(barcode, uploaded_urls):
-                print(f"✅")
+            with profiler.phase('write'):
+                updated = update_product_images(db, barcode, uploaded_urls, log=bar.write)
+            if updated:
                 success_count += 1
             else:
-                print(f"❌")
                 error_count += 1
         else:
-            print(f"   ❌ No images uploaded for {barcode}")
+            bar.write(f"   ❌ No images uploaded for {barcode}")
             error_count += 1
-        
-        print()  # Blank line between products
+    bar.close()
+    profiler.count('images', total_images)
     
     # Summary
     print("=" * 50)
@@ -213,17 +268,29 @@ def upload_product_images():
     print("=" * 50)
     print(f"✅ Success: {success_count} products")
     print(f"❌ Errors: {error_count} products")
-    print(f"📷 Total images uploaded: {sum(len(imgs) for imgs in images_by_barcode.values())}")
+    print(f"📷 Total images uploaded: {uploaded_count}")
+    if link_existing:
+        print(f"🔗 Linked to existing images: {linked_count}")
     print("=" * 50)
     
     if error_count == 0:
         print("\n🎉 All images uploaded successfully!")
     else:
         print(f"\n⚠️  {error_count} product(s) had errors. Check logs above.")
+    profiler.finish()
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Upload product images and link them in Firestore')
+    parser.add_argument('--link-existing', action='store_true',
+                        help='Reuse the URL of an already-uploaded near-duplicate instead of uploading')
+    parser.add_argument('--max-distance', type=int,
+                        help="Max differing bits for --link-existing (default: find_duplicate_images.py's)")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    
     try:
-        upload_product_images()
+        upload_product_images(link_existing=args.link_existing, max_distance=args.max_distance,
+                              profiler=Profiler.from_args('upload_images', args))
     except KeyboardInterrupt:
         print("\n\n⚠️  Upload interrupted by user")
     except Exception as e:
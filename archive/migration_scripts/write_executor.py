@@ -0,0 +1,211 @@
+"""
+Shared write-execution layer: batched writes with adaptive concurrency and retry
+Usage:
+  from write_executor import WriteExecutor, set_doc, update
+  with WriteExecutor(db) as executor:
+      executor.submit([set_doc(ref, data), update(ref2, {...})])
+  print(executor.failures)
+
+- Writes are grouped into batches of up to 500 and committed from a thread pool
+- Concurrency is AIMD: +1 in-flight batch after a window of clean commits,
+  halved whenever Firestore pushes back (RESOURCE_EXHAUSTED, ABORTED, ...),
+  so throughput settles just below what the backend accepts
+- Failed batches are rebuilt and retried with jittered exponential backoff
+- A batch commit is atomic, so retrying one that was rejected is safe. For
+  ambiguous failures (DEADLINE_EXCEEDED, UNAVAILABLE) the batch may have been
+  applied; those are retried only if the batch has no Increment, which is
+  the one write that isn't idempotent
+"""
+
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from google.api_core import exceptions
+from google.cloud.firestore_v1.transforms import _NumericValue
+
+# Firestore limit on writes per batch
+MAX_BATCH_WRITES = 500
+
+# Rejected before being applied: always safe to retry
+THROTTLE_ERRORS = (exceptions.ResourceExhausted, exceptions.Aborted, exceptions.TooManyRequests)
+
+# Outcome unknown: the commit may or may not have been applied
+AMBIGUOUS_ERRORS = (exceptions.DeadlineExceeded, exceptions.ServiceUnavailable, exceptions.InternalServerError)
+
+# A single write: kind is 'set', 'update' or 'delete'
+Write = namedtuple('Write', ['kind', 'ref', 'data', 'merge'])
+
+def update(ref, data):
+    return Write('update', ref, data, False)
+
+def set_doc(ref, data, merge=False):
+    return Write('set', ref, data, merge)
+
+def delete(ref):
+    return Write('delete', ref, None, False)
+
+def add_write(batch, write):
+    if write.kind == 'update':
+        batch.update(write.ref, write.data)
+    elif write.kind == 'set':
+        batch.set(write.ref, write.data, merge=write.merge)
+    elif write.kind == 'delete':
+        batch.delete(write.ref)
+    else:
+        raise ValueError(f'Unknown write kind: {write.kind}')
+
+def has_increment(value):
+    if isinstance(value, _NumericValue):
+        return True
+    if isinstance(value, dict):
+        return any(has_increment(item) for item in value.values())
+    return False
+
+def is_idempotent(writes):
+    return not any(write.data and has_increment(write.data) for write in writes)
+
+class AdaptiveLimit:
+    """AIMD cap on in-flight batches"""
+
+    def __init__(self, initial, minimum, maximum):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.successes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= self.limit:
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        with self.condition:
+            self.successes += 1
+            # Additive increase: one more slot per window of `limit` clean commits
+            if self.successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self.successes = 0
+                self.condition.notify_all()
+
+    def on_throttle(self):
+        with self.condition:
+            self.limit = max(self.minimum, self.limit // 2)
+            self.successes = 0
+
+class WriteExecutor:
+    """Commits batches of writes concurrently; see module docstring"""
+
+    def __init__(self, db, initial_concurrency=4, min_concurrency=1, max_concurrency=32,
+                 max_attempts=8, base_delay=0.5, max_delay=30.0, limiter=None):
+        """
+        limiter: optional object with acquire(ops) (e.g. migration_runner.RampLimiter)
+        consulted before each commit attempt
+        """
+        self.db = db
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter
+        self.concurrency = AdaptiveLimit(initial_concurrency, min_concurrency, max_concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.futures = []
+        self.lock = threading.Lock()
+        self.failures = []      # (writes, error) for batches that could not be committed
+        self.committed = 0      # writes committed
+        self.retries = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, writes):
+        """Queue writes; returns the futures of the batches created"""
+        writes = list(writes)
+        futures = [
+            self.pool.submit(self._commit_with_retry, writes[i:i + MAX_BATCH_WRITES])
+            for i in range(0, len(writes), MAX_BATCH_WRITES)
+        ]
+        with self.lock:
+            self.futures.extend(futures)
+        return futures
+
+    def flush(self):
+        """Wait for every queued batch"""
+        with self.lock:
+            futures, self.futures = self.futures, []
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.flush()
+        self.pool.shutdown()
+
+    def current_concurrency(self):
+        return self.concurrency.limit
+
+    def backoff(self, attempt):
+        """Full jitter: uniform in [0, min(max_delay, base * 2^attempt)]"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _commit_with_retry(self, writes):
+        idempotent = is_idempotent(writes)
+        for attempt in range(self.max_attempts):
+            if self.limiter is not None:
+                self.limiter.acquire(len(writes))
+            self.concurrency.acquire()
+            try:
+                # Rebuild the batch every attempt; a committed batch can't be reused
+                batch = self.db.batch()
+                for write in writes:
+                    add_write(batch, write)
+                batch.commit()
+            except THROTTLE_ERRORS as e:
+                self.concurrency.on_throttle()
+                error = e
+            except AMBIGUOUS_ERRORS as e:
+                self.concurrency.on_throttle()
+                if not idempotent:
+                    self._fail(writes, e)
+                    return
+                error = e
+            except Exception as e:
+                self._fail(writes, e)
+                return
+            else:
+                self.concurrency.on_success()
+                with self.lock:
+                    self.committed += len(writes)
+                return
+            finally:
+                self.concurrency.release()
+
+            with self.lock:
+                self.retries += 1
+            time.sleep(self.backoff(attempt))
+
+        self._fail(writes, error)
+
+    def _fail(self, writes, error):
+        with self.lock:
+            self.failures.append((writes, error))
+
+def print_failures(failures, limit=10):
+    """Summarize WriteExecutor.failures"""
+    if not failures:
+        return
+    failed_writes = sum(len(writes) for writes, _ in failures)
+    print(f"❌ {len(failures)} batch(es) failed ({failed_writes} writes):")
+    for writes, error in failures[:limit]:
+        print(f"   {writes[0].ref.path}{' (+%d more)' % (len(writes) - 1) if len(writes) > 1 else ''}: {error}")
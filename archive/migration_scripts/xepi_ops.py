@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the operations scripts
+Usage:
+  python3 xepi_ops.py                                   # list every command
+  python3 xepi_ops.py check                             # list one group
+  python3 xepi_ops.py check cash-links --report cash_links.jsonl
+  python3 xepi_ops.py --project staging migrate run add_display_order --dry-run
+  python3 xepi_ops.py fix pending-cash --help
+
+Every command is an existing script run as if called directly, so its own
+flags and help are unchanged. Listing commands imports nothing but this
+file; only the chosen script is imported (pandas, Pillow and firebase_admin
+load only for the commands that use them), and all Firestore/Storage access
+in the process goes through firebase_app's single app. --project picks the
+service account key (firebase_app.PROJECT_KEYS); a script's own --key
+still wins.
+"""
+
+import argparse
+import runpy
+import sys
+from firebase_app import PROJECT_KEYS, use_project
+
+# group -> command -> ('module [leading args]', help)
+COMMANDS = {
+    'import': {
+        'products': ('import_products', 'Import products from data/productos.xlsx'),
+        'categories': ('import_categories', 'Import categories from data/categorias.xlsx'),
+        'shipment': ('import_shipment', 'Post a shipment workbook to warehouse stock'),
+    },
+    'upload': {
+        'images': ('upload_images', 'Upload data/images and link them to products'),
+        'patch-image-metadata': ('patch_image_metadata', 'Set cache headers and content types on product images'),
+    },
+    'migrate': {
+        'list': ('migrate list', 'List the registered, resumable migrations (migrations.py)'),
+        'run': ('migrate run', 'Run or resume a registered migration'),
+        'status': ('migrate status', 'Show the checkpoint of a registered migration'),
+        'shard-pending-cash': ('shard_pending_cash', 'Move pendingCash saleIds/amounts into shards'),
+        'materialize-prices': ('materialize_prices', 'Write effective price and bulk tiers onto products'),
+        'build-catalog': ('build_catalog', 'Rebuild the per-subcategory catalog read model'),
+        'display-order': ('add_display_order', 'Add displayOrder to every product'),
+        'temas': ('migrate_temas', 'Move product temas to their own collection'),
+        'nested-categories': ('migrate_to_nested_categories', 'Move flat categories to nested subcollections'),
+        'legacy-images': ('migrate_legacy_images', 'Copy legacy dashboard images into products/{barcode}/'),
+        'orders': ('convert_orders', 'Convert the legacy orders collection into sales'),
+    },
+    'check': {
+        'deposits-flow': ('check_deposits_flow', 'Latest sales, deposits and pending cash'),
+        'cash-links': ('check_cash_links', 'Every deposit/sale/pendingCash link over the full history'),
+        'references': ('check_references', 'Dangling product, bank account and deposit references'),
+        'sales-pricing': ('audit_sales_pricing', 'Sale subtotals, bulk tiers and discounts'),
+        'duplicate-images': ('find_duplicate_images', 'Duplicate and near-duplicate product images'),
+        'diff': ('diff_snapshots', 'Compare two backup dumps'),
+    },
+    'fix': {
+        'pending-cash': ('cleanup_pending_cash', 'Drop stale pendingCash sales and fix the amounts'),
+        'orphaned-sales': ('fix_orphaned_sales', 'Add untracked efectivo sales to pending cash'),
+        'completed-sales': ('fix_completed_sales', 'Add completed deliveries missing from pending cash'),
+        'product-images': ('gc_product_images', 'Delete product images no product references'),
+    },
+    'data': {
+        'backup': ('backup_firestore', 'Export or restore the whole database locally'),
+        'export-products': ('export_products', 'Export the catalog to Excel in the productos.xlsx layout'),
+        'edit-products': ('edit_products', 'Bulk-edit names, prices, costs and temas from a spreadsheet'),
+        'seed': ('seed_data', 'Generate synthetic data for staging or load tests'),
+        'init-pending-cash': ('init_pending_cash', 'Create the pendingCash source documents'),
+        'setup-locations': ('setup_locations', 'Create the locations collection'),
+        'mirror': ('mirror_firestore', 'Keep a local SQLite mirror of the cash collections'),
+        'plan': ('apply_plan', 'Show, apply (sharded over processes) or report a --plan file'),
+    },
+}
+
+def print_commands(groups):
+    for group in groups:
+        print(f"{group}:")
+        for name, (_, help_text) in COMMANDS[group].items():
+            print(f"   {name:<22} {help_text}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='xepi_ops.py',
+        description='Run an operations script: xepi_ops.py [--project P] <group> <command> [args...]',
+        epilog="Run with no arguments to list the commands; '<group> <command> --help' for a command's flags.",
+    )
+    parser.add_argument('--project', choices=sorted(PROJECT_KEYS),
+                        help='Project whose service account key to use (default: serviceAccountKey.json)')
+    parser.add_argument('group', nargs='?', choices=list(COMMANDS))
+    parser.add_argument('command', nargs='?')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    if args.group is None or args.command is None:
+        print_commands([args.group] if args.group else COMMANDS)
+        return
+    commands = COMMANDS[args.group]
+    if args.command not in commands:
+        parser.error(f"{args.group} needs one of: {', '.join(commands)}")
+
+    if args.project:
+        use_project(args.project)
+
+    module, *leading = commands[args.command][0].split()
+    # The script parses sys.argv itself, as when run directly
+    prog = f'xepi_ops.py {args.group}' if leading else f'xepi_ops.py {args.group} {args.command}'
+    sys.argv = [prog] + leading + args.args
+    runpy.run_module(module, run_name='__main__')
+
+if __name__ == '__main__':
+    main()
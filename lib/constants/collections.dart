@@ -12,6 +12,8 @@ abstract final class Collections {
   static const String expenseCategories = 'expense_categories';
   static const String deposits = 'deposits';
   static const String pendingCash = 'pendingCash';
+  static const String pendingCashShards = 'pendingCashShards'; // under pendingCash/{source}
+  static const String pendingSales = 'pendingSales'; // under pendingCash/{source}
   static const String bankAccounts = 'bankAccounts';
   static const String users = 'users';
   static const String locations = 'locations';
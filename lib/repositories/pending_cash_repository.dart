@@ -0,0 +1,297 @@
+import 'dart:async';
+import 'dart:math';
+
+import 'package:cloud_firestore/cloud_firestore.dart';
+import 'package:xepi_imgadmin/constants/constants.dart';
+
+/// Pending (undeposited) cash of one source, summed over the sharded layout.
+class PendingCashSummary {
+  const PendingCashSummary({
+    required this.source,
+    required this.amount,
+    required this.saleIds,
+  });
+
+  final String source;
+  final double amount;
+  final List<String> saleIds;
+}
+
+/// One write of the sharded layout. [data] null means delete.
+///
+/// Returned instead of applied so callers can add it to their own
+/// transaction or batch next to the sale/deposit writes.
+class PendingCashWrite {
+  const PendingCashWrite(this.ref, this.data);
+
+  final DocumentReference<Map<String, dynamic>> ref;
+  final Map<String, dynamic>? data;
+
+  /// A pendingSales doc (one per sale) rather than a root/shard counter.
+  bool get isPendingSaleWrite => ref.parent.id == Collections.pendingSales;
+
+  void applyToTransaction(Transaction txn) {
+    final data = this.data;
+    if (data == null) {
+      txn.delete(ref);
+    } else {
+      txn.set(ref, data, SetOptions(merge: true));
+    }
+  }
+
+  void applyToBatch(WriteBatch batch) {
+    final data = this.data;
+    if (data == null) {
+      batch.delete(ref);
+    } else {
+      batch.set(ref, data, SetOptions(merge: true));
+    }
+  }
+}
+
+/// Sharded pendingCash counters (see docs/DATA_MODEL.md).
+///
+///   pendingCash/{source}                          root doc, pre-sharding amount/saleIds
+///   pendingCash/{source}/pendingCashShards/{n}    {amount}
+///   pendingCash/{source}/pendingSales/{saleId}    {total, addedAt}
+///
+/// Amount = root + every shard; sales = root saleIds + pendingSales. Cash is
+/// added to and taken from a random shard, so concurrent sales of one
+/// source no longer contend on a single document. Same layout as
+/// archive/migration_scripts/pending_cash.py.
+class PendingCashRepository {
+  static final PendingCashRepository instance = PendingCashRepository._();
+  PendingCashRepository._();
+
+  static const int shardCount = 8;
+
+  /// Firestore's limit on writes per batch.
+  static const int maxBatchWrites = 500;
+
+  /// Most counter (non-pendingSales) writes [removeSales] or [resetSource]
+  /// return: the root doc plus every shard.
+  static const int maxCounterWrites = shardCount + 1;
+
+  final FirebaseFirestore _db = FirebaseFirestore.instance;
+  final Random _random = Random();
+
+  DocumentReference<Map<String, dynamic>> _root(String source) =>
+      _db.collection(Collections.pendingCash).doc(source);
+
+  DocumentReference<Map<String, dynamic>> _shard(String source, [int? n]) =>
+      _root(source)
+          .collection(Collections.pendingCashShards)
+          .doc('${n ?? _random.nextInt(shardCount)}');
+
+  DocumentReference<Map<String, dynamic>> _pendingSale(
+          String source, String saleId) =>
+      _root(source).collection(Collections.pendingSales).doc(saleId);
+
+  // ---------------------------------------------------------------------------
+  // Writes
+  // ---------------------------------------------------------------------------
+
+  /// Adds one sale's cash to [source].
+  List<PendingCashWrite> addSale(String source, String saleId, double total) {
+    return [
+      PendingCashWrite(_shard(source), {
+        'amount': FieldValue.increment(total),
+        'updatedAt': FieldValue.serverTimestamp(),
+      }),
+      PendingCashWrite(_pendingSale(source, saleId), {
+        'total': total,
+        'addedAt': FieldValue.serverTimestamp(),
+      }),
+    ];
+  }
+
+  /// Adds several sales at once with a single shard increment
+  /// (e.g. restoring the sales of a deleted deposit).
+  List<PendingCashWrite> addSales(String source, Map<String, double> totals) {
+    final amount = totals.values.fold<double>(0.0, (sum, t) => sum + t);
+    return [
+      PendingCashWrite(_shard(source), {
+        'amount': FieldValue.increment(amount),
+        'updatedAt': FieldValue.serverTimestamp(),
+      }),
+      for (final entry in totals.entries)
+        PendingCashWrite(_pendingSale(source, entry.key), {
+          'total': entry.value,
+          'addedAt': FieldValue.serverTimestamp(),
+        }),
+    ];
+  }
+
+  /// Takes [saleIds] and [amount] of cash out of [source].
+  List<PendingCashWrite> removeSales(
+      String source, List<String> saleIds, double amount) {
+    return [
+      PendingCashWrite(_shard(source), {
+        'amount': FieldValue.increment(-amount),
+        'updatedAt': FieldValue.serverTimestamp(),
+      }),
+      // Sales added before sharding are listed on the root document
+      PendingCashWrite(_root(source), {
+        'saleIds': FieldValue.arrayRemove(saleIds),
+        'updatedAt': FieldValue.serverTimestamp(),
+      }),
+      for (final saleId in saleIds)
+        PendingCashWrite(_pendingSale(source, saleId), null),
+    ];
+  }
+
+  /// Sets [source]'s total to [amount] and drops [removedSaleIds].
+  /// Only for cleanup: it overwrites concurrent increments.
+  List<PendingCashWrite> resetSource(
+      String source, double amount, List<String> removedSaleIds) {
+    return [
+      PendingCashWrite(_root(source), {
+        'source': source,
+        'amount': amount,
+        if (removedSaleIds.isNotEmpty)
+          'saleIds': FieldValue.arrayRemove(removedSaleIds),
+        'updatedAt': FieldValue.serverTimestamp(),
+      }),
+      for (var n = 0; n < shardCount; n++)
+        PendingCashWrite(_shard(source, n), {
+          'amount': 0,
+          'updatedAt': FieldValue.serverTimestamp(),
+        }),
+      for (final saleId in removedSaleIds)
+        PendingCashWrite(_pendingSale(source, saleId), null),
+    ];
+  }
+
+  /// Commits the pendingSales writes among [writes] (see
+  /// [PendingCashWrite.isPendingSaleWrite]) in batches of up to
+  /// [maxBatchWrites].
+  ///
+  /// For callers that commit the counters and their own sale/deposit writes
+  /// first, so those don't share a batch with one write per sale. If this
+  /// fails, the amounts are already right and cleanup_pending_cash.py
+  /// reconciles the pendingSales docs.
+  Future<void> commitPendingSaleWrites(List<PendingCashWrite> writes) async {
+    final saleWrites = writes.where((w) => w.isPendingSaleWrite).toList();
+    for (var i = 0; i < saleWrites.length; i += maxBatchWrites) {
+      final batch = _db.batch();
+      for (final write in saleWrites.skip(i).take(maxBatchWrites)) {
+        write.applyToBatch(batch);
+      }
+      await batch.commit();
+    }
+  }
+
+  // ---------------------------------------------------------------------------
+  // Reads
+  // ---------------------------------------------------------------------------
+
+  Future<PendingCashSummary> fetchSource(String source) async {
+    final results = await Future.wait([
+      _root(source).get(),
+      _root(source).collection(Collections.pendingCashShards).get(),
+      _root(source).collection(Collections.pendingSales).get(),
+    ]);
+    final root = results[0] as DocumentSnapshot<Map<String, dynamic>>;
+    final shards = results[1] as QuerySnapshot<Map<String, dynamic>>;
+    final sales = results[2] as QuerySnapshot<Map<String, dynamic>>;
+    return _summarize(
+      root.exists ? [root] : const [],
+      shards.docs,
+      sales.docs,
+    )[source]!;
+  }
+
+  /// Every source (present even when empty), keyed by source.
+  Future<Map<String, PendingCashSummary>> fetchAll() async {
+    final results = await Future.wait([
+      _db.collection(Collections.pendingCash).get(),
+      _db.collectionGroup(Collections.pendingCashShards).get(),
+      _db.collectionGroup(Collections.pendingSales).get(),
+    ]);
+    return _summarize(results[0].docs, results[1].docs, results[2].docs);
+  }
+
+  /// Amount per source only (skips pendingSales), for totals and dashboards.
+  Future<Map<String, double>> fetchAmounts() async {
+    final results = await Future.wait([
+      _db.collection(Collections.pendingCash).get(),
+      _db.collectionGroup(Collections.pendingCashShards).get(),
+    ]);
+    return _summarize(results[0].docs, results[1].docs, const [])
+        .map((source, pending) => MapEntry(source, pending.amount));
+  }
+
+  /// Live [fetchAll]; emits once all three layers have loaded.
+  Stream<Map<String, PendingCashSummary>> watchAll() {
+    final streams = [
+      _db.collection(Collections.pendingCash).snapshots(),
+      _db.collectionGroup(Collections.pendingCashShards).snapshots(),
+      _db.collectionGroup(Collections.pendingSales).snapshots(),
+    ];
+    final latest = List<List<DocumentSnapshot<Map<String, dynamic>>>?>.filled(
+        streams.length, null);
+    final subscriptions = <StreamSubscription>[];
+    late final StreamController<Map<String, PendingCashSummary>> controller;
+
+    controller = StreamController(
+      onListen: () {
+        for (var i = 0; i < streams.length; i++) {
+          subscriptions.add(streams[i].listen(
+            (snapshot) {
+              latest[i] = snapshot.docs;
+              if (latest.every((docs) => docs != null)) {
+                controller.add(_summarize(latest[0]!, latest[1]!, latest[2]!));
+              }
+            },
+            onError: controller.addError,
+          ));
+        }
+      },
+      onCancel: () async {
+        for (final subscription in subscriptions) {
+          await subscription.cancel();
+        }
+        subscriptions.clear();
+      },
+    );
+    return controller.stream;
+  }
+
+  Map<String, PendingCashSummary> _summarize(
+    List<DocumentSnapshot<Map<String, dynamic>>> roots,
+    List<DocumentSnapshot<Map<String, dynamic>>> shards,
+    List<DocumentSnapshot<Map<String, dynamic>>> sales,
+  ) {
+    final amounts = {for (final s in CashSource.values) s.value: 0.0};
+    final saleIds = {for (final s in CashSource.values) s.value: <String>[]};
+
+    for (final doc in roots) {
+      final data = doc.data() ?? const {};
+      amounts[doc.id] =
+          (amounts[doc.id] ?? 0.0) + ((data['amount'] as num?)?.toDouble() ?? 0.0);
+      (saleIds[doc.id] ??= []).addAll(List<String>.from(data['saleIds'] ?? []));
+    }
+    final inRoot = {for (final e in saleIds.entries) e.key: e.value.toSet()};
+
+    for (final doc in shards) {
+      final source = doc.reference.parent.parent!.id;
+      amounts[source] = (amounts[source] ?? 0.0) +
+          ((doc.data()?['amount'] as num?)?.toDouble() ?? 0.0);
+    }
+    for (final doc in sales) {
+      final source = doc.reference.parent.parent!.id;
+      // A sale can be on the root and in pendingSales mid-migration
+      if (inRoot[source]?.contains(doc.id) ?? false) continue;
+      (saleIds[source] ??= []).add(doc.id);
+    }
+
+    return {
+      for (final source in amounts.keys)
+        source: PendingCashSummary(
+          source: source,
+          amount: amounts[source]!,
+          saleIds: saleIds[source] ?? const [],
+        ),
+    };
+  }
+}
@@ -1,4 +1,5 @@
 export 'finance_repository.dart';
 export 'inventory_repository.dart';
+export 'pending_cash_repository.dart';
 export 'products_repository.dart';
 export 'sales_repository.dart';
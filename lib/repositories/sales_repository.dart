@@ -1,12 +1,14 @@
 import 'package:cloud_firestore/cloud_firestore.dart';
 import 'package:xepi_imgadmin/constants/constants.dart';
 import 'package:xepi_imgadmin/models/models.dart';
+import 'package:xepi_imgadmin/repositories/pending_cash_repository.dart';
 
 class SalesRepository {
   static final SalesRepository instance = SalesRepository._();
   SalesRepository._();
 
   final FirebaseFirestore _db = FirebaseFirestore.instance;
+  final PendingCashRepository _pendingCash = PendingCashRepository.instance;
 
   // ---------------------------------------------------------------------------
   // Queries
@@ -162,29 +164,17 @@ class SalesRepository {
 
   void _addToPendingCash(Transaction txn, String saleId, Sale sale) {
     final source = _cashSourceFor(sale.deliveryMethod);
-    txn.set(
-      _db.collection(Collections.pendingCash).doc(source),
-      {
-        'source': source,
-        'amount': FieldValue.increment(sale.total),
-        'saleIds': FieldValue.arrayUnion([saleId]),
-        'updatedAt': FieldValue.serverTimestamp(),
-      },
-      SetOptions(merge: true),
-    );
+    for (final write in _pendingCash.addSale(source, saleId, sale.total)) {
+      write.applyToTransaction(txn);
+    }
   }
 
   void _removeFromPendingCash(Transaction txn, String saleId, Sale sale) {
     final source = _cashSourceFor(sale.deliveryMethod);
-    txn.set(
-      _db.collection(Collections.pendingCash).doc(source),
-      {
-        'amount': FieldValue.increment(-sale.total),
-        'saleIds': FieldValue.arrayRemove([saleId]),
-        'updatedAt': FieldValue.serverTimestamp(),
-      },
-      SetOptions(merge: true),
-    );
+    for (final write
+        in _pendingCash.removeSales(source, [saleId], sale.total)) {
+      write.applyToTransaction(txn);
+    }
   }
 
   String _cashSourceFor(DeliveryMethod? method) {
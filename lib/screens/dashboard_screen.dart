@@ -1,6 +1,7 @@
 import 'package:flutter/material.dart';
 import 'package:cloud_firestore/cloud_firestore.dart';
 import 'package:xepi_imgadmin/config/app_theme.dart';
+import 'package:xepi_imgadmin/repositories/pending_cash_repository.dart';
 import 'package:xepi_imgadmin/screens/finances/deposits_screen.dart';
 import 'package:xepi_imgadmin/screens/sales/sales_history_screen.dart';
 import 'package:xepi_imgadmin/screens/inventory/shipment_history_screen.dart';
@@ -130,17 +131,15 @@ class _DashboardScreenState extends State<DashboardScreen> {
   }
 
   Future<void> _loadPendingCash() async {
-    final pendingSnap =
-        await FirebaseFirestore.instance.collection('pendingCash').get();
+    final amounts = await PendingCashRepository.instance.fetchAmounts();
 
     final Map<String, double> pending = {};
-    for (var doc in pendingSnap.docs) {
-      final amount = (doc.data()['amount'] as num?)?.toDouble() ?? 0;
+    amounts.forEach((source, amount) {
       // Only include sources with pending amounts > 0
       if (amount > 0) {
-        pending[doc.id] = amount;
+        pending[source] = amount;
       }
-    }
+    });
 
     _pendingCashBySource = pending;
   }
@@ -4,6 +4,7 @@ import 'package:firebase_auth/firebase_auth.dart';
 import 'package:firebase_storage/firebase_storage.dart';
 import 'package:image_picker/image_picker.dart';
 import 'package:xepi_imgadmin/config/app_theme.dart';
+import 'package:xepi_imgadmin/repositories/pending_cash_repository.dart';
 import 'package:xepi_imgadmin/services/bank_accounts_service.dart';
 import 'package:intl/intl.dart';
 import 'dart:typed_data';
@@ -21,6 +22,9 @@ class _DepositsScreenState extends State<DepositsScreen> {
   final FirebaseStorage _storage = FirebaseStorage.instance;
   final ImagePicker _imagePicker = ImagePicker();
   final BankAccountsService _bankAccountsService = BankAccountsService();
+  final PendingCashRepository _pendingCash = PendingCashRepository.instance;
+  late final Stream<Map<String, PendingCashSummary>> _pendingCashStream =
+      _pendingCash.watchAll();
 
   final _amountController = TextEditingController();
   final _notesController = TextEditingController();
@@ -78,41 +82,44 @@ class _DepositsScreenState extends State<DepositsScreen> {
 
   Future<void> _cleanupPendingCash() async {
     try {
-      final pendingCashDocs = await _firestore.collection('pendingCash').get();
+      final pendingCash = await _pendingCash.fetchAll();
       final batch = _firestore.batch();
+      final pendingSaleWrites = <PendingCashWrite>[];
       int cleanedCount = 0;
 
-      for (final doc in pendingCashDocs.docs) {
-        final data = doc.data();
-        final saleIds = List<String>.from(data['saleIds'] ?? []);
+      for (final pending in pendingCash.values) {
+        final saleIds = pending.saleIds;
         
         if (saleIds.isEmpty) continue;
 
         // Check which sales still exist
-        final validSaleIds = <String>[];
+        final removedSaleIds = <String>[];
         double correctTotal = 0.0;
 
         for (final saleId in saleIds) {
           final saleDoc = await _firestore.collection('sales').doc(saleId).get();
           if (saleDoc.exists) {
-            validSaleIds.add(saleId);
             correctTotal += (saleDoc.data()?['total'] as num?)?.toDouble() ?? 0.0;
+          } else {
+            removedSaleIds.add(saleId);
           }
         }
 
         // Update if different
-        if (validSaleIds.length != saleIds.length) {
+        if (removedSaleIds.isNotEmpty) {
           cleanedCount++;
-          batch.update(doc.reference, {
-            'saleIds': validSaleIds,
-            'amount': correctTotal,
-            'updatedAt': FieldValue.serverTimestamp(),
-          });
+          final writes = _pendingCash.resetSource(
+              pending.source, correctTotal, removedSaleIds);
+          for (final write in writes.where((w) => !w.isPendingSaleWrite)) {
+            write.applyToBatch(batch);
+          }
+          pendingSaleWrites.addAll(writes.where((w) => w.isPendingSaleWrite));
         }
       }
 
       if (cleanedCount > 0) {
         await batch.commit();
+        await _pendingCash.commitPendingSaleWrites(pendingSaleWrites);
         if (mounted) {
           ScaffoldMessenger.of(context).showSnackBar(
             SnackBar(
@@ -239,11 +246,10 @@ class _DepositsScreenState extends State<DepositsScreen> {
       final user = FirebaseAuth.instance.currentUser;
       if (user == null) throw Exception('Usuario no autenticado');
 
-      // Get pending cash data for this source
-      final pendingCashDoc =
-          await _firestore.collection('pendingCash').doc(_selectedSource).get();
+      // Get pending cash data for this source (root + shards + pendingSales)
+      final pending = await _pendingCash.fetchSource(_selectedSource);
 
-      if (!pendingCashDoc.exists) {
+      if (pending.saleIds.isEmpty && pending.amount.abs() < 0.01) {
         if (mounted) {
           ScaffoldMessenger.of(context).showSnackBar(
             const SnackBar(
@@ -256,9 +262,8 @@ class _DepositsScreenState extends State<DepositsScreen> {
         return;
       }
 
-      final pendingData = pendingCashDoc.data()!;
-      final pendingAmount = (pendingData['amount'] as num?)?.toDouble() ?? 0.0;
-      final pendingSaleIds = List<String>.from(pendingData['saleIds'] ?? []);
+      final pendingAmount = pending.amount;
+      final pendingSaleIds = pending.saleIds;
 
       List<String> selectedSaleIds;
 
@@ -403,6 +408,43 @@ class _DepositsScreenState extends State<DepositsScreen> {
         }
       }
 
+      // The expenses, the deposit, every sale and the pending cash counters
+      // are committed in one batch (the pendingSales deletes go after it)
+      final batchWrites = _expenses.length +
+          1 +
+          selectedSaleIds.length +
+          PendingCashRepository.maxCounterWrites;
+      if (batchWrites > PendingCashRepository.maxBatchWrites) {
+        final maxSales = PendingCashRepository.maxBatchWrites -
+            PendingCashRepository.maxCounterWrites -
+            1 -
+            _expenses.length;
+        setState(() => _isProcessing = false);
+        if (!mounted) return;
+
+        ScaffoldMessenger.of(context).showSnackBar(
+          SnackBar(
+            content: Row(
+              children: [
+                const Icon(Icons.error_outline_rounded,
+                    color: AppTheme.white),
+                const SizedBox(width: AppTheme.spacingM),
+                Expanded(
+                  child: Text(
+                    'Error: Un depósito puede vincular como máximo $maxSales ventas (${selectedSaleIds.length} seleccionadas). Registra el efectivo en dos depósitos.',
+                    style: AppTheme.bodySmall.copyWith(color: AppTheme.white),
+                  ),
+                ),
+              ],
+            ),
+            backgroundColor: AppTheme.danger,
+            behavior: SnackBarBehavior.floating,
+            duration: const Duration(seconds: 5),
+          ),
+        );
+        return;
+      }
+
       // Create deposit document
       final depositRef = _firestore.collection('deposits').doc();
       final depositId = depositRef.id;
@@ -470,6 +512,7 @@ class _DepositsScreenState extends State<DepositsScreen> {
           final saleData = saleDoc.data()!;
           final updates = <String, dynamic>{
             'depositId': depositId,
+            'updatedAt': FieldValue.serverTimestamp(),
           };
 
           // If delivery and delivered, mark as completed
@@ -489,23 +532,23 @@ class _DepositsScreenState extends State<DepositsScreen> {
 
       final remainingAmount = pendingAmount - cashReceived;
 
-      if (remainingSaleIds.isEmpty || remainingAmount <= 0.01) {
-        // Clear pending cash completely
-        batch.delete(_firestore.collection('pendingCash').doc(_selectedSource));
-      } else {
-        // Update with remaining sales and amount
-        batch.update(
-          _firestore.collection('pendingCash').doc(_selectedSource),
-          {
-            'amount': remainingAmount,
-            'saleIds': remainingSaleIds,
-            'updatedAt': FieldValue.serverTimestamp(),
-          },
-        );
+      // Both are increments, so a sale registered since fetchSource keeps
+      // its cash and its pendingSales doc
+      final pendingCashWrites = remainingSaleIds.isEmpty || remainingAmount <= 0.01
+          // Clear pending cash completely: everything that was read
+          ? _pendingCash.removeSales(_selectedSource, pendingSaleIds, pendingAmount)
+          // Leave the remaining sales and amount
+          : _pendingCash.removeSales(_selectedSource, selectedSaleIds, cashReceived);
+      for (final write in pendingCashWrites.where((w) => !w.isPendingSaleWrite)) {
+        write.applyToBatch(batch);
       }
 
       await batch.commit();
 
+      // One delete per sale: in their own batches, so they don't count
+      // against the deposit's 500-write limit
+      await _pendingCash.commitPendingSaleWrites(pendingCashWrites);
+
       if (mounted) {
         ScaffoldMessenger.of(context).showSnackBar(
           SnackBar(
@@ -1022,17 +1065,19 @@ class _DepositsScreenState extends State<DepositsScreen> {
   }
 
   Widget _buildPendingCashCard() {
-    return StreamBuilder<QuerySnapshot>(
-      stream: _firestore.collection('pendingCash').snapshots(),
+    return StreamBuilder<Map<String, PendingCashSummary>>(
+      stream: _pendingCashStream,
       builder: (context, snapshot) {
         if (!snapshot.hasData) {
           return const Center(child: CircularProgressIndicator());
         }
 
-        final pendingDocs = snapshot.data!.docs;
-        final totalPending = pendingDocs.fold<double>(
+        final pendingSources = snapshot.data!.values
+            .where((p) => p.amount.abs() >= 0.01 || p.saleIds.isNotEmpty)
+            .toList();
+        final totalPending = pendingSources.fold<double>(
           0.0,
-          (sum, doc) => sum + ((doc.data() as Map)['amount'] ?? 0.0),
+          (sum, pending) => sum + pending.amount,
         );
 
         return Container(
@@ -1053,7 +1098,7 @@ class _DepositsScreenState extends State<DepositsScreen> {
                   Text('Efectivo Pendiente', style: AppTheme.heading3),
                   const Spacer(),
                   // Add cleanup button for admins
-                  if (totalPending == 0 && pendingDocs.any((doc) => (doc.data() as Map)['saleIds']?.isNotEmpty == true))
+                  if (totalPending == 0 && pendingSources.any((p) => p.saleIds.isNotEmpty))
                     Tooltip(
                       message: 'Limpiar referencias obsoletas',
                       child: IconButton(
@@ -1090,7 +1135,7 @@ class _DepositsScreenState extends State<DepositsScreen> {
               const SizedBox(height: AppTheme.spacingL),
 
               // Breakdown by source
-              if (pendingDocs.isEmpty)
+              if (pendingSources.isEmpty)
                 Center(
                   child: Padding(
                     padding: const EdgeInsets.all(AppTheme.spacingL),
@@ -1109,16 +1154,11 @@ class _DepositsScreenState extends State<DepositsScreen> {
                   ),
                 )
               else
-                ...pendingDocs.map((doc) {
-                  final data = doc.data() as Map<String, dynamic>;
-                  final source = doc.id;
-                  final amount = data['amount'] ?? 0.0;
-                  final saleIds = List<String>.from(data['saleIds'] ?? []);
-
+                ...pendingSources.map((pending) {
                   return _PendingCashSourceCard(
-                    source: source,
-                    amount: amount,
-                    saleIds: saleIds,
+                    source: pending.source,
+                    amount: pending.amount,
+                    saleIds: pending.saleIds,
                   );
                 }),
             ],
@@ -1658,13 +1698,12 @@ class _DepositsScreenState extends State<DepositsScreen> {
 
       final depositData = depositDoc.data()!;
       final source = depositData['source'] as String;
-      final amount = depositData['amount'] as double;
       final linkedSaleIds = List<String>.from(depositData['saleIds'] ?? []);
 
       final batch = _firestore.batch();
 
       // Remove depositId from all linked sales (only if they exist)
-      final existingSaleIds = <String>[];
+      final restoredTotals = <String, double>{};
       for (final saleId in linkedSaleIds) {
         final saleRef = _firestore.collection('sales').doc(saleId);
         final saleDoc = await saleRef.get();
@@ -1673,35 +1712,16 @@ class _DepositsScreenState extends State<DepositsScreen> {
             'depositId': FieldValue.delete(),
             'updatedAt': FieldValue.serverTimestamp(),
           });
-          existingSaleIds.add(saleId);
+          restoredTotals[saleId] =
+              (saleDoc.data()?['total'] as num?)?.toDouble() ?? 0.0;
         }
       }
 
-      // Restore or create pending cash (only for sales that still exist)
-      final pendingCashRef = _firestore.collection('pendingCash').doc(source);
-      final pendingCashDoc = await pendingCashRef.get();
-
-      if (pendingCashDoc.exists) {
-        // Add amount back to existing pending cash
-        final existingData = pendingCashDoc.data()!;
-        final existingAmount = existingData['amount'] as double;
-        final existingPendingSaleIds =
-            List<String>.from(existingData['saleIds'] ?? []);
-
-        batch.update(pendingCashRef, {
-          'amount': existingAmount + amount,
-          'saleIds': [...existingPendingSaleIds, ...existingSaleIds],
-          'updatedAt': FieldValue.serverTimestamp(),
-        });
-      } else {
-        // Create new pending cash entry
-        batch.set(pendingCashRef, {
-          'source': source,
-          'amount': amount,
-          'saleIds': existingSaleIds,
-          'createdAt': FieldValue.serverTimestamp(),
-          'updatedAt': FieldValue.serverTimestamp(),
-        });
+      // Restore pending cash by the cash received for the sales that still
+      // exist (their totals), not by the net deposit amount
+      final pendingCashWrites = _pendingCash.addSales(source, restoredTotals);
+      for (final write in pendingCashWrites.where((w) => !w.isPendingSaleWrite)) {
+        write.applyToBatch(batch);
       }
 
       // Delete the deposit
@@ -1709,6 +1729,9 @@ class _DepositsScreenState extends State<DepositsScreen> {
 
       await batch.commit();
 
+      // One pendingSales doc per sale, in batches of their own
+      await _pendingCash.commitPendingSaleWrites(pendingCashWrites);
+
       if (mounted) {
         ScaffoldMessenger.of(context).showSnackBar(
           const SnackBar(
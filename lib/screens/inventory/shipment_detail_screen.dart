@@ -178,13 +178,17 @@ class _ShipmentDetailScreenState extends State<ShipmentDetailScreen> {
                     ),
                   ),
                 ],
-                const SizedBox(width: AppTheme.spacingM),
-                IconButton(
-                  icon: const Icon(Icons.delete_outline_rounded),
-                  onPressed: _isProcessing ? null : () => _deleteShipment(),
-                  color: AppTheme.danger,
-                  tooltip: 'Eliminar recepción',
-                ),
+                // import_shipment.py is still posting its stock; deleting it
+                // here would leave the posted batches without a shipment
+                if (status != 'importing') ...[
+                  const SizedBox(width: AppTheme.spacingM),
+                  IconButton(
+                    icon: const Icon(Icons.delete_outline_rounded),
+                    onPressed: _isProcessing ? null : () => _deleteShipment(),
+                    color: AppTheme.danger,
+                    tooltip: 'Eliminar recepción',
+                  ),
+                ],
               ],
             ),
           ),
@@ -564,6 +564,9 @@ class _OrderDetailScreenState extends State<OrderDetailScreen> {
 
   Widget _buildActionsCard() {
     final status = _orderData!['status'] as String;
+    // Set by convert_orders.py (and _convertToSale): the sale carries the
+    // delivery, stock and cash from here, so the order takes no more actions
+    final saleId = (_orderData!['saleId'] ?? _orderData!['convertedSaleId']) as String?;
 
     return Container(
       padding: const EdgeInsets.all(AppTheme.spacingL),
@@ -602,6 +605,30 @@ class _OrderDetailScreenState extends State<OrderDetailScreen> {
                 ],
               ),
             ),
+          ] else if (saleId != null) ...[
+            Container(
+              padding: const EdgeInsets.all(AppTheme.spacingL),
+              decoration: BoxDecoration(
+                color: AppTheme.blue.withValues(alpha: 0.1),
+                borderRadius: AppTheme.borderRadiusSmall,
+                border: Border.all(color: AppTheme.blue),
+              ),
+              child: Row(
+                children: [
+                  const Icon(Icons.receipt_long_rounded, color: AppTheme.blue),
+                  const SizedBox(width: AppTheme.spacingM),
+                  Expanded(
+                    child: Text(
+                      'Pedido convertido en la venta $saleId - Gestiona la entrega desde Envíos',
+                      style: AppTheme.bodyMedium.copyWith(
+                        color: AppTheme.blue,
+                        fontWeight: FontWeight.w600,
+                      ),
+                    ),
+                  ),
+                ],
+              ),
+            ),
           ] else if (status == 'cancelled') ...[
             Container(
               padding: const EdgeInsets.all(AppTheme.spacingL),
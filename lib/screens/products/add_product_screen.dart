@@ -846,7 +846,10 @@ class _AddProductScreenState extends State<AddProductScreen> {
           try {
             await ref.putData(
               bytes,
-              firebase_storage.SettableMetadata(contentType: 'image/jpeg'),
+              firebase_storage.SettableMetadata(
+                contentType: 'image/jpeg',
+                cacheControl: 'public, max-age=31536000, immutable',
+              ),
             );
             downloadUrl = await ref.getDownloadURL();
             uploadedUrls.add(downloadUrl);
@@ -2020,7 +2020,10 @@ class _ProductDetailScreenState extends State<ProductDetailScreen> {
           try {
             await ref.putData(
               bytes,
-              firebase_storage.SettableMetadata(contentType: 'image/jpeg'),
+              firebase_storage.SettableMetadata(
+                contentType: 'image/jpeg',
+                cacheControl: 'public, max-age=31536000, immutable',
+              ),
             );
             downloadUrl = await ref.getDownloadURL();
             uploadedUrls.add(downloadUrl);
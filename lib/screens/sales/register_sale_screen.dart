@@ -3,6 +3,7 @@ import 'package:flutter/services.dart';
 import 'package:cloud_firestore/cloud_firestore.dart';
 import 'package:firebase_auth/firebase_auth.dart';
 import 'package:xepi_imgadmin/config/app_theme.dart';
+import 'package:xepi_imgadmin/repositories/pending_cash_repository.dart';
 import 'package:xepi_imgadmin/widgets/product_search_dialog.dart';
 import 'package:xepi_imgadmin/services/bank_accounts_service.dart';
 
@@ -562,18 +563,10 @@ class _RegisterSaleScreenState extends State<RegisterSaleScreen> {
         if (_paymentMethod == 'efectivo' &&
             status == 'approved' &&
             _saleType == 'kiosko') {
-          final pendingCashRef =
-              _firestore.collection('pendingCash').doc('store');
-          txn.set(
-            pendingCashRef,
-            {
-              'source': 'store',
-              'amount': FieldValue.increment(_total),
-              'saleIds': FieldValue.arrayUnion([saleRef.id]),
-              'updatedAt': FieldValue.serverTimestamp(),
-            },
-            SetOptions(merge: true),
-          );
+          for (final write in PendingCashRepository.instance
+              .addSale('store', saleRef.id, _total)) {
+            write.applyToTransaction(txn);
+          }
         }
 
         // Deduct stock atomically.
@@ -3,6 +3,7 @@ import 'package:cloud_firestore/cloud_firestore.dart';
 import 'package:xepi_imgadmin/config/app_theme.dart';
 import 'package:xepi_imgadmin/utils/date_formatter.dart';
 import 'package:xepi_imgadmin/constants/constants.dart';
+import 'package:xepi_imgadmin/repositories/pending_cash_repository.dart';
 import 'package:xepi_imgadmin/repositories/sales_repository.dart';
 import 'package:xepi_imgadmin/services/auth_service.dart';
 
@@ -142,6 +143,7 @@ class _SaleDetailScreenState extends State<SaleDetailScreen> {
         'paymentVerified': true,
         'status': 'approved',
         'approvedAt': FieldValue.serverTimestamp(),
+        'updatedAt': FieldValue.serverTimestamp(),
       });
 
       if (mounted) {
@@ -248,15 +250,12 @@ class _SaleDetailScreenState extends State<SaleDetailScreen> {
           cashSource = 'forza';
         }
 
-        final pendingCashRef =
-            _firestore.collection('pendingCash').doc(cashSource);
-        final total = _saleData!['total'] ?? 0.0;
+        final total = (_saleData!['total'] as num?)?.toDouble() ?? 0.0;
 
-        batch.update(pendingCashRef, {
-          'amount': FieldValue.increment(-total),
-          'saleIds': FieldValue.arrayRemove([widget.saleId]),
-          'updatedAt': FieldValue.serverTimestamp(),
-        });
+        for (final write in PendingCashRepository.instance
+            .removeSales(cashSource, [widget.saleId], total)) {
+          write.applyToBatch(batch);
+        }
       }
 
       // Delete the sale
@@ -1,5 +1,6 @@
 import 'package:cloud_firestore/cloud_firestore.dart';
 import 'package:intl/intl.dart';
+import 'package:xepi_imgadmin/repositories/pending_cash_repository.dart';
 
 class ReportsService {
   final FirebaseFirestore _firestore = FirebaseFirestore.instance;
@@ -89,21 +90,18 @@ class ReportsService {
 
   // Get pending cash by source
   Future<Map<String, double>> getPendingCash() async {
-    final snapshot = await _firestore.collection('pendingCash').get();
+    final amounts = await PendingCashRepository.instance.fetchAmounts();
     Map<String, double> pendingCash = {
       'store': 0,
       'mensajero': 0,
       'forza': 0,
     };
 
-    for (var doc in snapshot.docs) {
-      final data = doc.data();
-      final source = data['source'] as String?;
-      final amount = (data['amount'] as num?)?.toDouble() ?? 0;
-      if (source != null && pendingCash.containsKey(source)) {
+    amounts.forEach((source, amount) {
+      if (pendingCash.containsKey(source)) {
         pendingCash[source] = amount;
       }
-    }
+    });
 
     return pendingCash;
   }
@@ -48,6 +48,8 @@ class StatusHelper {
         return 'En progreso';
       case 'cancelled':
         return 'Cancelado';
+      case 'importing':
+        return 'Importando';
       default:
         return status;
     }
@@ -62,6 +64,8 @@ class StatusHelper {
         return AppTheme.warning;
       case 'cancelled':
         return AppTheme.danger;
+      case 'importing':
+        return AppTheme.blue;
       default:
         return AppTheme.mediumGray;
     }